@@ -1,8 +1,20 @@
 from django.contrib import admin
-from .models import Portfolio
+from .models import LeaderboardEntry, Portfolio, PortfolioSnapshot
 
 @admin.register(Portfolio)
 class PortfolioAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "stock_symbol", "quantity", "average_buy_price")
     search_fields = ("stock_symbol",)
     list_filter = ("stock_symbol",)
+
+
+@admin.register(PortfolioSnapshot)
+class PortfolioSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "date", "value", "cost_basis")
+    list_filter = ("date",)
+
+
+@admin.register(LeaderboardEntry)
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = ("rank", "user", "value", "p_l", "p_l_pct", "updated_at")
+    search_fields = ("user__username",)
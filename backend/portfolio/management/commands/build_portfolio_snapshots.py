@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from portfolio.models import PortfolioSnapshot
+from trading.services.ledger_service import LedgerService, close_frame, ledger_values
+
+WRITE_BATCH = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Materialize every user's end-of-day portfolio value and cost basis into "
+        "PortfolioSnapshot, from the transaction ledger and stored daily bars. "
+        "Idempotent (upserts by user and date); run nightly after the close."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', default='1y',
+                            help="How far back to (re)build, as a bar-store period (default 1y).")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        ledgers = LedgerService.load_ledgers()
+        symbols = sorted(set().union(*(ledger.symbols for ledger in ledgers.values())))
+        # One daily close matrix for the union of symbols, shared by every user
+        close_df = close_frame(symbols, options['period'], '1d') if symbols else None
+        if close_df is None or close_df.empty:
+            self.stdout.write("No holdings or no bars; nothing to snapshot")
+            return
+
+        dates = [ts.date() for ts in close_df.index]
+        users = written = 0
+        batch = []
+        for user_id, ledger in ledgers.items():
+            values, cost_basis = ledger_values(ledger, close_df, '1d')
+            for day, value, cost in zip(dates, values.tolist(), cost_basis.tolist()):
+                if value or cost:
+                    batch.append(PortfolioSnapshot(user_id=user_id, date=day,
+                                                   value=round(value, 2), cost_basis=round(cost, 2)))
+            if len(batch) >= WRITE_BATCH:
+                written += self.write(batch)
+                batch = []
+            users += 1
+        written += self.write(batch)
+        self.stdout.write(f"Wrote {written} snapshots for {users} users in {time.monotonic() - started:.1f}s")
+
+    def write(self, batch):
+        PortfolioSnapshot.objects.bulk_create(
+            batch, batch_size=WRITE_BATCH, update_conflicts=True,
+            unique_fields=['user', 'date'], update_fields=['value', 'cost_basis'],
+        )
+        return len(batch)
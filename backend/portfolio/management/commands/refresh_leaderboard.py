@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from trading.services.leaderboard_service import LeaderboardService
+
+
+class Command(BaseCommand):
+    help = (
+        "Rank every user's portfolio by P/L from one holdings query and one batched "
+        "price fetch, replacing the stored leaderboard. Run from cron."
+    )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = LeaderboardService.refresh()
+        self.stdout.write(f"Leaderboard rebuilt for {count} users in {time.monotonic() - started:.1f}s")
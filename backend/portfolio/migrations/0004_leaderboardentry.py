@@ -0,0 +1,32 @@
+# Generated by Django 6.0.2 on 2026-10-17 02:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0003_portfoliosnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField(db_index=True)),
+                ('value', models.FloatField()),
+                ('cost_basis', models.FloatField()),
+                ('p_l', models.FloatField()),
+                ('p_l_pct', models.FloatField()),
+                ('updated_at', models.DateTimeField()),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entry', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+    ]
@@ -36,3 +36,42 @@ class Transaction(models.Model):
 
     def __str__(self):
         return f"{self.user.username} {self.transaction_type} {self.stock_symbol}"
+
+
+class PortfolioSnapshot(models.Model):
+    """End-of-day portfolio value per user, materialized by build_portfolio_snapshots."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="portfolio_snapshots"
+    )
+    date = models.DateField()
+    value = models.FloatField()
+    cost_basis = models.FloatField()
+
+    class Meta:
+        unique_together = ('user', 'date')
+
+    def __str__(self):
+        return f"{self.user.username} {self.date}: {self.value}"
+
+
+class LeaderboardEntry(models.Model):
+    """One ranked row per user with holdings, rebuilt by refresh_leaderboard."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="leaderboard_entry"
+    )
+    rank = models.PositiveIntegerField(db_index=True)
+    value = models.FloatField()
+    cost_basis = models.FloatField()
+    p_l = models.FloatField()
+    p_l_pct = models.FloatField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['rank']
+
+    def __str__(self):
+        return f"#{self.rank} {self.user.username}"
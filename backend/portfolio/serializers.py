@@ -1,4 +1,4 @@
-from .models import Portfolio, Transaction
+from .models import LeaderboardEntry, Portfolio, Transaction
 from rest_framework import serializers
 
 class TransactionSerializer(serializers.ModelSerializer):
@@ -13,4 +13,12 @@ class PortfolioSerializer(serializers.ModelSerializer):
     class Meta:
         model = Portfolio
         fields = ['id', 'username', 'stock_symbol', 'quantity', 'average_buy_price']
-        read_only_fields = ['user', 'quantity', 'average_buy_price']
\ No newline at end of file
+        read_only_fields = ['user', 'quantity', 'average_buy_price']
+
+
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+
+    class Meta:
+        model = LeaderboardEntry
+        fields = ['rank', 'username', 'value', 'cost_basis', 'p_l', 'p_l_pct', 'updated_at']
@@ -1,3 +1,176 @@
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from rest_framework.test import APIClient
+from trading.services.ledger_service import LedgerService
+from trading.services.market_service import MarketService
+from users.models import User
+from portfolio.models import Portfolio, PortfolioSnapshot, Transaction
+
+NEW_YORK = ZoneInfo("America/New_York")
+
+
+def daily_bars(closes, start="2024-01-02"):
+    index = pd.date_range(start, periods=len(closes), freq="B", tz="America/New_York")
+    return pd.DataFrame({"Open": closes, "High": closes, "Low": closes, "Close": closes,
+                         "Volume": [1000] * len(closes)}, index=index)
+
+
+class LedgerPerformanceTest(TestCase):
+    """Portfolio value history follows the transaction ledger, not today's holdings."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="ledger", email="l@example.com", password="StrongPass123!")
+        self.frames = {"AAPL": daily_bars([100.0 + i for i in range(10)]), "MSFT": daily_bars([10.0] * 10)}
+
+    def trade(self, symbol, kind, quantity, when, price=1.0):
+        tx = Transaction.objects.create(user=self.user, stock_symbol=symbol, transaction_type=kind,
+                                        quantity=quantity, price=price)
+        Transaction.objects.filter(pk=tx.pk).update(timestamp=when)
+
+    def test_positions_count_from_the_bar_they_were_traded_in(self):
+        # Bought 2 AAPL during the 4th session, sold 1 during the 8th; MSFT predates the ledger
+        self.trade("AAPL", "BUY", 2, datetime(2024, 1, 5, 15, 0, tzinfo=NEW_YORK))
+        self.trade("AAPL", "SELL", 1, datetime(2024, 1, 11, 10, 0, tzinfo=NEW_YORK))
+        Portfolio.objects.create(user=self.user, stock_symbol="AAPL", quantity=1)
+        Portfolio.objects.create(user=self.user, stock_symbol="MSFT", quantity=5)
+
+        with patch.object(MarketService, "get_bars", side_effect=lambda s, period, interval: self.frames[s].copy()), \
+                self.assertNumQueries(2):
+            values = LedgerService.value_history(self.user, "1mo", "1d")
+
+        aapl = [0, 0, 0, 2, 2, 2, 2, 1, 1, 1]
+        expected = [q * (100.0 + i) + 5 * 10.0 for i, q in enumerate(aapl)]
+        self.assertEqual(values.tolist(), expected)
+
+    def test_after_hours_trade_counts_from_the_next_close(self):
+        self.trade("AAPL", "BUY", 1, datetime(2024, 1, 5, 17, 30, tzinfo=NEW_YORK))  # after the 4th close
+        Portfolio.objects.create(user=self.user, stock_symbol="AAPL", quantity=1)
+
+        with patch.object(MarketService, "get_bars", side_effect=lambda s, period, interval: self.frames[s].copy()):
+            values = LedgerService.value_history(self.user, "1mo", "1d")
+
+        self.assertEqual(values.tolist(), [0, 0, 0, 0] + [100.0 + i for i in range(4, 10)])
+
+    def test_endpoint_uses_ledger(self):
+        self.trade("AAPL", "BUY", 3, datetime(2024, 1, 9, 12, 0, tzinfo=NEW_YORK))
+        Portfolio.objects.create(user=self.user, stock_symbol="AAPL", quantity=3)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with patch.object(MarketService, "get_bars", side_effect=lambda s, period, interval: self.frames[s].copy()):
+            response = client.get("/portfolio/portfolio_performance/?period=1M")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["values"], [3 * 105.0, 3 * 106.0, 3 * 107.0, 3 * 108.0, 3 * 109.0])
+
+    def test_snapshot_builder_values_and_cost_basis(self):
+        self.trade("AAPL", "BUY", 2, datetime(2024, 1, 5, 15, 0, tzinfo=NEW_YORK), price=103.0)
+        self.trade("AAPL", "SELL", 1, datetime(2024, 1, 11, 10, 0, tzinfo=NEW_YORK), price=107.0)
+        Portfolio.objects.create(user=self.user, stock_symbol="AAPL", quantity=1, average_buy_price=103.0)
+        Portfolio.objects.create(user=self.user, stock_symbol="MSFT", quantity=5, average_buy_price=8.0)
+
+        with patch.object(MarketService, "get_bars", side_effect=lambda s, period, interval: self.frames[s].copy()):
+            call_command("build_portfolio_snapshots", stdout=StringIO())
+            call_command("build_portfolio_snapshots", stdout=StringIO())  # idempotent
+
+        rows = list(PortfolioSnapshot.objects.filter(user=self.user).order_by("date").values_list("value", "cost_basis"))
+        aapl = [0, 0, 0, 2, 2, 2, 2, 1, 1, 1]
+        self.assertEqual([v for v, _ in rows], [q * (100.0 + i) + 50.0 for i, q in enumerate(aapl)])
+        self.assertEqual([c for _, c in rows], [40.0] * 3 + [246.0] * 4 + [143.0] * 3)
+
+    def test_endpoint_reads_snapshots_and_appends_live_point(self):
+        Portfolio.objects.create(user=self.user, stock_symbol="AAPL", quantity=3)
+        today = pd.Timestamp.now(tz="America/New_York").date()
+        for days_ago, value in ((3, 300.0), (2, 310.0), (1, 320.0), (0, 999.0)):
+            PortfolioSnapshot.objects.create(user=self.user, date=today - timedelta(days=days_ago),
+                                             value=value, cost_basis=250.0)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with patch.object(MarketService, "get_price_batch", return_value={"AAPL": {"price": 110.0}}), \
+                patch.object(LedgerService, "value_history") as value_history:
+            response = client.get("/portfolio/portfolio_performance/?period=1Y")
+
+        value_history.assert_not_called()
+        self.assertEqual(response.data["values"], [300.0, 310.0, 320.0, 330.0])  # today's row replaced by live
+
+
+class RiskAPITest(TestCase):
+    """/portfolio/risk/ metrics from one returns matrix, shared across users with the same holdings."""
+
+    def setUp(self):
+        cache.clear()
+        rng = np.random.default_rng(7)
+        self.frames = {s: daily_bars((100 * np.cumprod(1 + rng.normal(0, 0.01, 60))).tolist())
+                       for s in ("AAPL", "MSFT", "SPY")}
+
+    def client_for(self, username):
+        user = User.objects.create_user(username=username, email=f"{username}@example.com", password="StrongPass123!")
+        Portfolio.objects.create(user=user, stock_symbol="AAPL", quantity=3)
+        Portfolio.objects.create(user=user, stock_symbol="MSFT", quantity=2)
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_metrics_match_direct_computation_and_are_shared(self):
+        with patch.object(MarketService, "get_bars", side_effect=lambda s, period, interval: self.frames[s]) as bars:
+            data = self.client_for("risk1").get("/portfolio/risk/").data
+            again = self.client_for("risk2").get("/portfolio/risk/").data
+        self.assertEqual(bars.call_count, 3)  # second user hit the cache
+        self.assertEqual(again, data)
+
+        closes = pd.DataFrame({s: df["Close"] for s, df in self.frames.items()})
+        values = closes.iloc[-1][["AAPL", "MSFT"]] * [3, 2]
+        weights = values / values.sum()
+        returns = closes.pct_change().dropna()
+        portfolio = returns[["AAPL", "MSFT"]] @ weights
+        wealth = (1 + portfolio).cumprod()
+
+        self.assertAlmostEqual(data["beta"], portfolio.cov(returns["SPY"]) / returns["SPY"].var(), places=4)
+        self.assertAlmostEqual(data["volatility"], portfolio.std() * 252 ** 0.5, places=4)
+        self.assertAlmostEqual(data["historical_var"], -np.quantile(portfolio, 0.05), places=4)
+        self.assertAlmostEqual(data["max_drawdown"], (1 - wealth / wealth.cummax().clip(lower=1)).max(), places=4)
+        self.assertEqual(data["correlation"]["symbols"], ["AAPL", "MSFT"])
+        self.assertEqual(data["observations"], 59)
+
+
+class LeaderboardTest(TestCase):
+    """refresh_leaderboard prices the distinct symbols once and ranks every user by P/L %."""
+
+    def setUp(self):
+        cache.clear()
+        for name, holdings in {
+            "alice": [("AAPL", 10, 100.0)],                    # +10%
+            "bob": [("AAPL", 1, 100.0), ("MSFT", 4, 50.0)],    # (110 + 160 - 300) / 300 = -10%
+            "carol": [("MSFT", 2, 25.0), ("NOQT", 5, 10.0)],   # (80 + 50 - 100) / 100 = +30%
+            "dave": [],
+        }.items():
+            user = User.objects.create_user(username=name, email=f"{name}@example.com", password="StrongPass123!")
+            for symbol, quantity, price in holdings:
+                Portfolio.objects.create(user=user, stock_symbol=symbol, quantity=quantity, average_buy_price=price)
+
+    def test_refresh_and_paginated_endpoint(self):
+        quotes = {"AAPL": {"price": 110.0}, "MSFT": {"price": 40.0}}
+        with patch.object(MarketService, "get_price_batch", return_value=quotes) as batch:
+            call_command("refresh_leaderboard", stdout=StringIO())
+        batch.assert_called_once()
+        self.assertEqual(sorted(batch.call_args[0][0]), ["AAPL", "MSFT", "NOQT"])
+
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username="dave"))
+        response = client.get("/portfolio/leaderboard/?page_size=2")
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual([(r["rank"], r["username"], r["p_l_pct"]) for r in response.data["results"]],
+                         [(1, "carol", 30.0), (2, "alice", 10.0)])
+        self.assertEqual(client.get("/portfolio/leaderboard/?page=2&page_size=2").data["results"][0]["p_l"], -30.0)
@@ -2,8 +2,8 @@ from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Portfolio, Transaction
-from .serializers import PortfolioSerializer, TransactionSerializer
+from .models import LeaderboardEntry, Portfolio, Transaction
+from .serializers import LeaderboardEntrySerializer, PortfolioSerializer, TransactionSerializer
 from trading.services import get_live_price
 from trading.services.market_service import MarketService
 from django.db import transaction
@@ -113,18 +113,32 @@ class PortfolioViewSet(viewsets.ModelViewSet):
         serializer = TransactionSerializer(transactions, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def leaderboard(self, request):
+        """Ranked portfolios by P/L %, as stored by the refresh_leaderboard job."""
+        entries = LeaderboardEntry.objects.select_related('user').order_by('rank')
+        page = self.paginate_queryset(entries)
+        if page is not None:
+            serializer = LeaderboardEntrySerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = LeaderboardEntrySerializer(entries, many=True)
+        return Response(serializer.data)
+
     @action(detail=False, methods=['get'])
     def portfolio_performance(self, request):
         """
         Returns aggregated portfolio value over time for 1D / 1W / 1M / 1Y.
-        Maps UI period labels → yfinance (period, interval) pairs.
+        Maps UI period labels → yfinance (period, interval) pairs. Each point
+        values what the transaction ledger says was held at that bar's close.
+        1M / 1Y read the nightly PortfolioSnapshot rows plus a live point.
         """
-        import yfinance as yf
         import pandas as pd
         from django.core.cache import cache
+        from trading.services.ledger_service import LedgerService
 
         PERIOD_MAP = {
-            '1D':  ('5d',  '15m'),   # intraday 15-min bars for the last 5 days (yf needs ≥5d for intraday)
+            '1D':  ('5d',  '15m'),   # intraday 15-min bars for the last 5 days, keep today's below
             '1W':  ('5d',  '1h'),
             '1M':  ('1mo', '1d'),
             '1Y':  ('1y',  '1d'),
@@ -133,71 +147,36 @@ class PortfolioViewSet(viewsets.ModelViewSet):
         ui_period = request.query_params.get('period', '1M').upper()
         yf_period, interval = PERIOD_MAP.get(ui_period, ('1mo', '1d'))
 
-        holdings = list(self.get_queryset().filter(quantity__gt=0))
-        if not holdings:
-            return Response({'labels': [], 'values': []})
-
         cache_key = f"portperf_{request.user.id}_{ui_period}"
         cached = cache.get(cache_key)
         if cached:
             return Response(cached)
 
-        # Fetch historical close prices for every holding symbol
-        symbols = [h.stock_symbol for h in holdings]
-        qty_map = {h.stock_symbol: h.quantity for h in holdings}
-
         try:
-            # Download all at once for efficiency
-            kwargs = {
-                'period': yf_period,
-                'interval': interval,
-                'progress': False,
-            }
-            # For newer yfinance, auto_adjust might not be supported. Use kwargs.
-            try:
-                raw = yf.download(symbols if len(symbols) > 1 else symbols[0], threads=False, auto_adjust=True, **kwargs)
-            except TypeError:
-                raw = yf.download(symbols if len(symbols) > 1 else symbols[0], threads=False, **kwargs)
-
-            if raw.empty:
+            portfolio_values = None
+            if interval == '1d':
+                portfolio_values = LedgerService.snapshot_history(request.user, period=yf_period)
+            if portfolio_values is None:
+                # Bars come from the bar store (15m and 1h are both resampled from one 5m series)
+                portfolio_values = LedgerService.value_history(request.user, period=yf_period, interval=interval)
+            if portfolio_values is None:
                 return Response({'labels': [], 'values': []})
 
-            # Normalise to a DataFrame of close prices per symbol
-            if len(symbols) == 1:
-                close_df = raw[['Close']].rename(columns={'Close': symbols[0]})
-            else:
-                # Multi-ticker download → MultiIndex columns; grab 'Close' level
-                if isinstance(raw.columns, pd.MultiIndex):
-                    close_df = raw['Close']
-                else:
-                    close_df = raw[['Close']].rename(columns={'Close': symbols[0]})
-
-            # Forward-fill gaps (weekends / holidays)
-            close_df = close_df.ffill().dropna(how='all')
-
             # For 1D: keep only today's bars
             if ui_period == '1D':
                 today = pd.Timestamp.now(tz='UTC').normalize()
-                mask = close_df.index.normalize() >= today
+                mask = portfolio_values.index.normalize() >= today
                 if mask.any():
-                    close_df = close_df[mask]
+                    portfolio_values = portfolio_values[mask]
                 else:
                     # Fallback: last calendar day in data
-                    last_day = close_df.index.normalize().max()
-                    close_df = close_df[close_df.index.normalize() == last_day]
-
-            # Aggregate: sum(qty * close) per timestamp
-            portfolio_values = pd.Series(0.0, index=close_df.index)
-            for sym, qty in qty_map.items():
-                if sym in close_df.columns:
-                    portfolio_values += close_df[sym].fillna(0) * qty
-                elif len(symbols) == 1 and symbols[0] == sym:
-                    portfolio_values += close_df.iloc[:, 0].fillna(0) * qty
+                    last_day = portfolio_values.index.normalize().max()
+                    portfolio_values = portfolio_values[portfolio_values.index.normalize() == last_day]
 
             portfolio_values = portfolio_values[portfolio_values > 0]
 
             # Build response: Always use millisecond timestamps for reliability
-            labels = [int(ts.timestamp() * 1000) for ts in portfolio_values.index]
+            labels = (portfolio_values.index.asi8 // 1_000_000).tolist()
 
             result = {
                 'labels': labels,
@@ -210,6 +189,20 @@ class PortfolioViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'labels': [], 'values': [], 'error': str(e)})
 
+    @action(detail=False, methods=['get'])
+    def risk(self, request):
+        """
+        VaR/CVaR (historical and parametric, 95%, one day), beta vs the benchmark,
+        Sharpe/Sortino, max drawdown and correlations over the last year of daily bars.
+        """
+        from trading.services.risk_service import RiskService
+
+        holdings = list(self.get_queryset().filter(quantity__gt=0).values_list('stock_symbol', 'quantity'))
+        data = RiskService.get_portfolio_risk(holdings)
+        if data is None:
+            return Response({"message": "No portfolio history available"})
+        return Response(data)
+
     @action(detail=False, methods=['get'])
     def analytics(self, request):
         holdings = list(self.get_queryset().filter(quantity__gt=0))
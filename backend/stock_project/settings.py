@@ -115,6 +115,36 @@ else:
         }
     }
 
+# Market data — stale cache entries are refreshed on this many background threads per process
+MARKET_REFRESH_WORKERS = env.int('MARKET_REFRESH_WORKERS', default=4)
+# Per-process LRU in front of the Django cache for hot market keys
+MARKET_L1_MAXSIZE = env.int('MARKET_L1_MAXSIZE', default=1024)
+MARKET_L1_TTL = env.int('MARKET_L1_TTL', default=5)
+# Per-process LRU of intervals resampled from a finer stored series (15m/1h from 5m, 1wk/1mo from 1d)
+MARKET_DERIVED_MAXSIZE = env.int('MARKET_DERIVED_MAXSIZE', default=256)
+# Local per-symbol OHLCV bar store (memory-mapped .npy columns)
+BAR_STORE_DIR = env('BAR_STORE_DIR', default=str(BASE_DIR / 'market_data' / 'bars'))
+# Trained model artifacts (train_trend_model) and the latest.json pointer the API loads
+ML_MODEL_DIR = env('ML_MODEL_DIR', default=str(BASE_DIR / 'market_data' / 'models'))
+# Upstream data source. For offline benchmarks / load tests use
+# 'trading.services.providers.ReplayProvider' with e.g.
+# MARKET_DATA_PROVIDER_OPTIONS='{"fixtures_dir": "market_data/fixtures", "latency_ms": 150}'
+MARKET_DATA_PROVIDER = env('MARKET_DATA_PROVIDER', default='trading.services.providers.YFinanceProvider')
+MARKET_DATA_PROVIDER_OPTIONS = env.json('MARKET_DATA_PROVIDER_OPTIONS', default={})
+# Cluster-wide budget per upstream host (token bucket in the cache) and its circuit breaker
+UPSTREAM_RATE = env.float('UPSTREAM_RATE', default=10.0)        # requests/s
+UPSTREAM_BURST = env.int('UPSTREAM_BURST', default=30)
+UPSTREAM_MAX_WAIT = env.float('UPSTREAM_MAX_WAIT', default=2.0)  # seconds a caller waits for a token
+UPSTREAM_BREAKER_FAILURES = env.int('UPSTREAM_BREAKER_FAILURES', default=5)
+UPSTREAM_BREAKER_RESET = env.int('UPSTREAM_BREAKER_RESET', default=30)  # seconds open before a probe
+# Orders may execute on a last-known-good (stale) quote at most this many seconds old
+ORDER_MAX_QUOTE_AGE = env.int('ORDER_MAX_QUOTE_AGE', default=900)
+# /portfolio/risk/: beta benchmark and the annual risk-free rate used by Sharpe/Sortino
+RISK_BENCHMARK = env('RISK_BENCHMARK', default='SPY')
+RISK_FREE_RATE = env.float('RISK_FREE_RATE', default=0.0)
+
+# Symbols the technical screener always covers, on top of every held or watched symbol
+SCREENER_UNIVERSE = env.list('SCREENER_UNIVERSE', default=[])
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Watchlist, Order
+from .models import Watchlist, Order, MarketSnapshot
 
 @admin.register(Watchlist)
 class WatchlistAdmin(admin.ModelAdmin):
@@ -11,3 +11,8 @@ class OrderAdmin(admin.ModelAdmin):
     list_display = ('user', 'symbol', 'order_type', 'quantity', 'price', 'status', 'timestamp')
     list_filter = ('order_type', 'status')
     search_fields = ('symbol', 'user__username')
+
+@admin.register(MarketSnapshot)
+class MarketSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('symbol', 'quote_at', 'sparkline_at')
+    search_fields = ('symbol',)
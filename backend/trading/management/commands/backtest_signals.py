@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from trading.services.backtest_service import MODES, STRATEGIES, BacktestService
+from trading.services.bar_store import BarStore
+from trading.services.market_service import MarketService
+
+
+class Command(BaseCommand):
+    help = "Backtest the built-in signal rules (or the trained trend model) over stored daily history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*',
+                            help="Symbols to test (default: every symbol in the bar store).")
+        parser.add_argument('--strategy', choices=STRATEGIES, default='signals')
+        parser.add_argument('--mode', choices=MODES, default='long')
+        parser.add_argument('--period', default='5y', help="Trailing period to test (default 5y).")
+        parser.add_argument('--cost-bps', type=float, default=5.0,
+                            help="Cost per unit of position change, in basis points (default 5).")
+        parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count).")
+        parser.add_argument('--sync', action='store_true',
+                            help="Fetch/refresh the symbols' history upstream first.")
+
+    def handle(self, *args, **options):
+        symbols = [s.upper() for s in options['symbols']] or BarStore().symbols('1d')
+        if not symbols:
+            raise CommandError("No stored daily history – pass symbols with --sync or warm the bar store first.")
+        if options['sync']:
+            MarketService.get_bars_many(symbols, period=options['period'])
+
+        try:
+            report = BacktestService.run(
+                symbols, strategy=options['strategy'], period=options['period'], mode=options['mode'],
+                cost_bps=options['cost_bps'], max_workers=options['workers'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        def pct(value):
+            return f"{value * 100:8.2f}%" if value is not None else "      n/a"
+
+        self.stdout.write(f"{'symbol':<8}{'CAGR':>10}{'max DD':>10}{'hit rate':>10}{'trades':>8}{'turnover':>10}{'B&H CAGR':>10}")
+        for symbol, r in sorted(report['results'].items()):
+            turnover = f"{r['turnover']:10.2f}" if r['turnover'] is not None else "       n/a"
+            self.stdout.write(
+                f"{symbol:<8}{pct(r['cagr']):>10}{pct(r['max_drawdown']):>10}{pct(r['hit_rate']):>10}"
+                f"{r['trades']:>8}{turnover}{pct(r['buy_and_hold_cagr']):>10}"
+            )
+        summary = report['summary']
+        self.stdout.write(
+            f"{summary['symbols']} symbols in {summary['elapsed_s']}s – median CAGR {pct(summary['median_cagr']).strip()}, "
+            f"median max DD {pct(summary['median_max_drawdown']).strip()}, "
+            f"median hit rate {pct(summary['median_hit_rate']).strip()}"
+        )
+        if summary['skipped']:
+            self.stdout.write(f"Skipped (not enough history): {', '.join(summary['skipped'])}")
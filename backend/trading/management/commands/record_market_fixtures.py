@@ -0,0 +1,45 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from trading.services.providers import YFinanceProvider
+
+
+class Command(BaseCommand):
+    help = (
+        "Record live yfinance history/info/news responses as fixtures for "
+        "trading.services.providers.ReplayProvider."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='+', help="Symbols to record, e.g. AAPL MSFT")
+        parser.add_argument('--dir', default=str(Path(settings.BASE_DIR) / 'market_data' / 'fixtures'),
+                            help="Fixture directory (default market_data/fixtures).")
+        parser.add_argument('--period', default='2y', help="History period to record (default 2y).")
+        parser.add_argument('--intervals', default='1d', help="Comma-separated intervals (default 1d).")
+
+    def handle(self, *args, **options):
+        provider = YFinanceProvider()
+        root = Path(options['dir'])
+
+        for symbol in (s.upper() for s in options['symbols']):
+            target = root / symbol
+            target.mkdir(parents=True, exist_ok=True)
+
+            for interval in options['intervals'].split(','):
+                df = provider.history(symbol, period=options['period'], interval=interval.strip())
+                if not df.empty:
+                    df[['Open', 'High', 'Low', 'Close', 'Volume']].to_csv(target / f'history_{interval.strip()}.csv')
+
+            for name, fetch in (('info', provider.info), ('news', provider.news), ('rss', provider.rss_news)):
+                try:
+                    payload = fetch(symbol)
+                except Exception as exc:
+                    self.stderr.write(f"{symbol} {name}: {exc}")
+                    continue
+                with open(target / f'{name}.json', 'w') as fh:
+                    json.dump(payload, fh, default=str)
+
+            self.stdout.write(f"Recorded {symbol} → {target}")
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from trading.services.screener_service import ScreenerService
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the technical screener's indicator table for the whole universe "
+        "(SCREENER_UNIVERSE plus held and watched symbols). Run from cron: the "
+        "screener endpoint only reads this table and answers 503 until it exists."
+    )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        table = ScreenerService.refresh_table()
+        count = len(table["symbols"])
+        self.stdout.write(f"Screener table rebuilt for {count} symbols in {time.monotonic() - started:.1f}s")
@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dt_time
+from zoneinfo import ZoneInfo
+
+from django.core.management.base import BaseCommand
+
+from trading.services.market_service import MarketService
+
+MARKET_TZ = ZoneInfo('America/New_York')
+MARKET_OPEN = dt_time(9, 30)
+MARKET_CLOSE = dt_time(16, 0)
+
+
+def market_is_open(now=None):
+    """Regular NYSE/Nasdaq session, Mon–Fri 09:30–16:00 New York time (holidays ignored)."""
+    now = now or datetime.now(MARKET_TZ)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+class Command(BaseCommand):
+    help = (
+        "Keep quotes, sparklines and branding warm for every held or watched symbol, "
+        "so user requests are served from cache instead of yfinance."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run a single refresh cycle and exit.")
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help="Parallel upstream fetches for sparklines/branding (default 4).")
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help="Symbols per multi-ticker quote download (default 50).")
+        parser.add_argument('--open-interval', type=int, default=60,
+                            help="Seconds between cycles while the market is open (default 60).")
+        parser.add_argument('--closed-interval', type=int, default=900,
+                            help="Seconds between cycles while the market is closed (default 900).")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            count = self.warm(options['concurrency'], options['batch_size'])
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"Warmed {count} symbols in {elapsed:.1f}s")
+
+            if options['once']:
+                return
+            interval = options['open_interval'] if market_is_open() else options['closed_interval']
+            time.sleep(max(0, interval - elapsed))
+
+    def warm(self, concurrency, batch_size):
+        symbols = MarketService.tracked_symbols()
+        if not symbols:
+            return 0
+
+        # Quotes: one multi-ticker download per batch
+        for i in range(0, len(symbols), batch_size):
+            MarketService.get_price_batch(symbols[i:i + batch_size], refresh=True)
+
+        def warm_symbol(symbol):
+            MarketService.get_sparkline_with_age(symbol, period="1mo", refresh=True)
+            MarketService.get_branding(symbol)  # 24h TTL – only fetched when missing
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            for symbol, future in [(s, executor.submit(warm_symbol, s)) for s in symbols]:
+                try:
+                    future.result()
+                except Exception as exc:
+                    self.stderr.write(f"{symbol}: {exc}")
+        return len(symbols)
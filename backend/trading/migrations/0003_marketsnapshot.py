@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-17 01:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0002_order_watchlist_delete_transaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=20, unique=True)),
+                ('quote', models.JSONField(blank=True, null=True)),
+                ('quote_at', models.DateTimeField(blank=True, null=True)),
+                ('sparkline', models.JSONField(blank=True, default=list)),
+                ('sparkline_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
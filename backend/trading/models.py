@@ -40,4 +40,15 @@ class Order(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.user.username} {self.order_type} {self.symbol}"
\ No newline at end of file
+        return f"{self.user.username} {self.order_type} {self.symbol}"
+
+class MarketSnapshot(models.Model):
+    """Last successfully fetched quote and 1mo sparkline per symbol, served while upstream is down."""
+    symbol = models.CharField(max_length=20, unique=True)
+    quote = models.JSONField(null=True, blank=True)
+    quote_at = models.DateTimeField(null=True, blank=True)
+    sparkline = models.JSONField(default=list, blank=True)
+    sparkline_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Snapshot {self.symbol}"
@@ -1,52 +1,118 @@
 from portfolio.models import Portfolio
 from .market_service import MarketService
 
+TRADING_DAYS = 252
+VOLATILITY_PERIOD = "1y"
+# Annualized volatility → label, upper bounds exclusive
+VOLATILITY_BANDS = ((0.15, "Low"), (0.30, "Medium"))
+
+
+def daily_returns(close_df):
+    """(T, S) simple daily returns of a (date × symbol) close frame, forward-filled, dropping days any column lacks."""
+    import numpy as np
+
+    closes = close_df.ffill().to_numpy(dtype='float64')
+    returns = closes[1:] / closes[:-1] - 1
+    return returns[~np.isnan(returns).any(axis=1)]
+
+
+def annualize_volatility(daily_std):
+    import numpy as np
+
+    return float(daily_std * np.sqrt(TRADING_DAYS))
+
+
+def portfolio_volatility(close_df, weights):
+    """
+    Annualized volatility of a fixed-weight portfolio: std of the weighted
+    daily returns of a (date × symbol) close frame, scaled by √252.
+    None with fewer than two return days.
+    """
+    import numpy as np
+
+    returns = daily_returns(close_df)
+    if len(returns) < 2:
+        return None
+    return annualize_volatility(np.std(returns @ np.asarray(weights, dtype='float64'), ddof=1))
+
+
+def volatility_label(volatility):
+    if volatility is None:
+        return None
+    for bound, label in VOLATILITY_BANDS:
+        if volatility < bound:
+            return label
+    return "High"
+
+
 class AnalyticsService:
     @staticmethod
     def get_performance_analytics(user):
-        holdings = Portfolio.objects.filter(user=user)
-        
-        if not holdings.exists():
+        """
+        P/L per holding from one batched price-only fetch, plus the annualized
+        volatility of the current weights over a year of stored daily bars.
+        """
+        import pandas as pd
+
+        holdings = list(Portfolio.objects.filter(user=user, quantity__gt=0).values_list(
+            'stock_symbol', 'quantity', 'average_buy_price'))
+        if not holdings:
             return {"message": "No portfolio data found"}
 
+        quotes = MarketService.get_price_batch([symbol for symbol, _, _ in holdings])
+
         best_stock = None
         worst_stock = None
         total_p_l = 0
         total_investment = 0
-        
+        values = {}
+
         stock_performances = []
-        
-        for item in holdings:
-            live_data = MarketService.get_live_data(item.stock_symbol)
-            if not live_data:
+
+        for symbol, quantity, average_buy_price in holdings:
+            quote = quotes.get(symbol.upper())
+            if not quote:
                 continue
-                
-            current_price = live_data['price']
-            investment = item.quantity * item.average_buy_price
-            current_value = item.quantity * current_price
+
+            investment = quantity * average_buy_price
+            current_value = quantity * quote['price']
             p_l = current_value - investment
             p_l_pct = (p_l / investment * 100) if investment > 0 else 0
-            
+
             perf = {
-                "symbol": item.stock_symbol,
+                "symbol": symbol,
                 "p_l": round(p_l, 2),
                 "p_l_pct": round(p_l_pct, 2)
             }
             stock_performances.append(perf)
-            
+            values[symbol.upper()] = values.get(symbol.upper(), 0) + current_value
+
             total_p_l += p_l
             total_investment += investment
-            
+
             if not best_stock or p_l_pct > best_stock['p_l_pct']:
                 best_stock = perf
             if not worst_stock or p_l_pct < worst_stock['p_l_pct']:
                 worst_stock = perf
-        
+
+        volatility = None
+        total_value = sum(values.values())
+        if total_value > 0:
+            try:
+                frames = MarketService.get_bars_many(list(values), period=VOLATILITY_PERIOD, interval="1d")
+                close_df = pd.DataFrame({s: df['Close'] for s, df in frames.items() if df is not None and not df.empty})
+                if not close_df.empty:
+                    weights = [values[s] / total_value for s in close_df.columns]
+                    volatility = portfolio_volatility(close_df, weights)
+            except Exception:
+                pass  # volatility is optional; P/L still stands
+
         return {
             "total_net_gain": round(total_p_l, 2),
             "total_net_gain_pct": round((total_p_l / total_investment * 100), 2) if total_investment > 0 else 0,
             "best_performing": best_stock,
             "worst_performing": worst_stock,
-            "volatility": "Medium", # Mock constant or calculated from hist data
-            "diversification_count": holdings.count()
+            "volatility": volatility_label(volatility),
+            "volatility_pct": round(volatility * 100, 2) if volatility is not None else None,
+            "diversification_count": len(holdings)
         }
@@ -0,0 +1,213 @@
+"""
+Vectorized backtests of the built-in signal rules.
+
+For each symbol the whole stored daily history goes through three array
+steps: signal labels → positions (entries/exits forward-filled) → equity
+curve and metrics. There is no per-bar Python loop. Signals are computed
+over the full history and only then cut to the requested period, so the EMAs
+are warm on the first tested bar.
+
+Strategies:
+  signals – calculate_indicators() rule: long on OVERSOLD/BULLISH, exit
+            (or short) on OVERBOUGHT/BEARISH, hold through NEUTRAL.
+  model   – the trained trend model: long when P(higher) ≥ 0.55, exit/short
+            when ≤ 0.45. In-sample for whatever history the model was
+            trained on.
+
+A position is taken at a bar's close and earns the next bar's return;
+`cost_bps` is charged on every unit of position change. Symbols run in
+parallel on a process pool; workers only read the local bar store.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+PERIODS_PER_YEAR = 252
+STRATEGIES = ('signals', 'model')
+MODES = ('long', 'long_short')
+ENTRY_SIGNALS = ('OVERSOLD', 'BULLISH')
+EXIT_SIGNALS = ('OVERBOUGHT', 'BEARISH')
+POOL_MIN_SYMBOLS = 8
+
+_worker_models = {}  # artifact path → model, per worker process
+
+
+def _ffill_positions(target):
+    """Forward-fill NaN (hold) through a 1-D target position array; flat before the first signal."""
+    import numpy as np
+
+    index = np.where(np.isnan(target), 0, np.arange(len(target)))
+    np.maximum.accumulate(index, out=index)
+    filled = target[index]
+    filled[np.isnan(filled)] = 0.0
+    return filled
+
+
+def signal_positions(signals, mode='long'):
+    import numpy as np
+
+    target = np.full(len(signals), np.nan)
+    target[np.isin(signals, ENTRY_SIGNALS)] = 1.0
+    target[np.isin(signals, EXIT_SIGNALS)] = -1.0 if mode == 'long_short' else 0.0
+    return _ffill_positions(target)
+
+
+def model_positions(probability_up, mode='long'):
+    import numpy as np
+    from .ml_service import BEARISH_BELOW, BULLISH_ABOVE
+
+    target = np.full(len(probability_up), np.nan)
+    target[probability_up >= BULLISH_ABOVE] = 1.0
+    target[probability_up <= BEARISH_BELOW] = -1.0 if mode == 'long_short' else 0.0
+    return _ffill_positions(target)
+
+
+def simulate(close, position, cost=0.0, periods_per_year=PERIODS_PER_YEAR):
+    """Equity curve and metrics for a 1-D close series and the position held after each close."""
+    import numpy as np
+
+    returns = np.zeros_like(close)
+    returns[1:] = close[1:] / close[:-1] - 1
+    held = np.concatenate([[0.0], position[:-1]])          # position earning each bar's return
+    changes = np.abs(np.diff(position, prepend=0.0))       # traded at each close
+    strategy = held * returns - cost * changes
+    equity = np.cumprod(1 + strategy)
+
+    years = (len(close) - 1) / periods_per_year
+    drawdown = equity / np.maximum.accumulate(equity) - 1
+
+    # Per-trade P&L: bars in the market grouped by position run, summed in log space
+    in_market = held != 0
+    run_id = np.cumsum(np.diff(held, prepend=0.0) != 0)
+    trade_pnl = np.bincount(run_id[in_market], weights=np.log1p(strategy[in_market]))
+    trade_pnl = trade_pnl[np.unique(run_id[in_market])]
+
+    def annualized(growth):
+        return float(growth ** (1 / years) - 1) if years > 0 and growth > 0 else None
+
+    return {
+        "equity": equity,
+        "total_return": float(equity[-1] - 1),
+        "cagr": annualized(equity[-1]),
+        "max_drawdown": float(drawdown.min()),
+        "hit_rate": float((trade_pnl > 0).mean()) if len(trade_pnl) else None,
+        "trades": int(len(trade_pnl)),
+        "turnover": float(changes.sum() / years) if years > 0 else None,
+        "exposure": float(in_market.mean()),
+        "buy_and_hold_cagr": annualized(close[-1] / close[0]),
+    }
+
+
+def backtest_symbol(job):
+    """
+    Run one symbol (process-pool entry point). `job` is a plain dict, so it
+    pickles: symbol, root, period, strategy, mode, cost, curve, model_path.
+    Returns (symbol, result or None).
+    """
+    import numpy as np
+    from .bar_store import BarStore, slice_period
+    from .indicator_graph import IndicatorGraph, parse_set
+    from . import panel_indicators
+
+    symbol = job['symbol']
+    df = BarStore(job['root']).read(symbol, '1d')
+    if df is None or len(df) < 60:
+        return symbol, None
+
+    close = df['Close'].to_numpy(dtype='float64')
+    if job['strategy'] == 'model':
+        from .ml_service import build_features
+
+        model = _worker_models.get(job['model_path'])
+        if model is None:
+            import joblib
+            model = _worker_models[job['model_path']] = joblib.load(job['model_path'])
+        features = build_features(IndicatorGraph.from_frame(df))
+        up = model.predict_proba(features)[:, list(model.classes_).index(1.0)]
+        position = model_positions(up, job['mode'])
+    else:
+        # Only the nodes the signal rule reads
+        out = IndicatorGraph(close).evaluate(parse_set("rsi:14,macd:12:26:9"))
+        signals = panel_indicators.signals(np.round(out['rsi_14'], 2), np.round(out['macd_12_26_9'], 2))
+        position = signal_positions(signals, job['mode'])
+
+    start = len(df) - len(slice_period(df, job['period']))
+    if len(df) - start < 2:
+        return symbol, None
+    metrics = simulate(close[start:], position[start:], job['cost'])
+    equity = metrics.pop('equity')
+    result = {
+        "symbol": symbol,
+        "start": df.index[start].isoformat(),
+        "end": df.index[-1].isoformat(),
+        "bars": len(df) - start,
+        **{name: None if value is None else round(value, 4) if isinstance(value, float) else value
+           for name, value in metrics.items()},
+    }
+    if job['curve']:
+        result["curve"] = {
+            "t": (df.index.asi8[start:] // 1_000_000).tolist(),
+            "equity": np.round(equity, 4).tolist(),
+        }
+    return symbol, result
+
+
+class BacktestService:
+    @staticmethod
+    def run(symbols, strategy='signals', period='5y', mode='long', cost_bps=5.0, curve=False, max_workers=None):
+        """
+        Backtest `symbols` from the local bar store. Returns
+        {"results": {symbol: metrics}, "summary": {...}}; symbols without
+        enough stored history are listed under "skipped". Raises ValueError
+        for bad parameters, or for strategy='model' before a model exists.
+        """
+        import multiprocessing
+        import statistics
+
+        if strategy not in STRATEGIES:
+            raise ValueError(f"strategy must be one of {', '.join(STRATEGIES)}")
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+
+        model_path = None
+        if strategy == 'model':
+            from .ml_service import get_registry
+
+            _, manifest = get_registry().get()
+            if not manifest:
+                raise ValueError("No trained trend model – run train_trend_model first")
+            model_path = str(get_registry().root / manifest['artifact'])
+
+        started = time.monotonic()
+        root = str(settings.BAR_STORE_DIR)
+        jobs = [{
+            'symbol': s.upper(), 'root': root, 'period': period, 'strategy': strategy, 'mode': mode,
+            'cost': cost_bps / 10_000, 'curve': curve, 'model_path': model_path,
+        } for s in dict.fromkeys(symbols)]
+
+        # Spawning workers costs ~1s, so small runs stay in-process unless asked otherwise
+        workers = max_workers or ((os.cpu_count() or 1) if len(jobs) >= POOL_MIN_SYMBOLS else 1)
+        workers = min(workers, len(jobs))
+        if workers > 1:
+            # spawn: forking a process that already runs cache-refresh threads isn't safe
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                outcomes = list(pool.map(backtest_symbol, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+        else:
+            outcomes = [backtest_symbol(job) for job in jobs]
+
+        results = {symbol: result for symbol, result in outcomes if result}
+        summary = {
+            "symbols": len(results),
+            "skipped": [symbol for symbol, result in outcomes if not result],
+            "strategy": strategy,
+            "mode": mode,
+            "period": period,
+            "cost_bps": cost_bps,
+        }
+        for metric in ("cagr", "max_drawdown", "hit_rate", "turnover", "buy_and_hold_cagr"):
+            values = [r[metric] for r in results.values() if r[metric] is not None]
+            summary[f"median_{metric}"] = round(statistics.median(values), 4) if values else None
+        summary["elapsed_s"] = round(time.monotonic() - started, 3)
+        return {"results": results, "summary": summary}
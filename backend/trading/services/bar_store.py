@@ -0,0 +1,205 @@
+"""
+Local on-disk OHLCV bar store shared by every history consumer.
+
+Each (symbol, interval) series lives in its own directory under
+settings.BAR_STORE_DIR as one .npy file per column (t, open, high, low, close,
+volume), read back with np.load(mmap_mode='r') so slicing the last month out
+of ten years of bars only touches the pages it needs.
+
+Writers build a fresh generation directory and then atomically swap
+meta.json to point at it, so a reader always sees one consistent set of
+columns even while a sync is running. Only the local filesystem is needed.
+Syncs are serialized by MarketService; write() still only prunes
+generations older than the one it replaced, never a newer (in-flight) one.
+
+meta.json also records the high-water mark (`hwm`, last bar timestamp in UTC
+ns) so incremental syncs only have to fetch bars from that point on, and the
+`base` generation: the last full rewrite, kept across appends, so consumers
+holding derived state can tell re-adjusted history from merely newer bars.
+"""
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+FRAME_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')  # yfinance history() names
+
+# Approximate span of each yfinance period string, used to decide whether a
+# stored series reaches back far enough to serve a request.
+PERIOD_DAYS = {
+    '1d': 1, '5d': 5, '1mo': 31, '60d': 60, '3mo': 92, '6mo': 183, 'ytd': 366,
+    '1y': 366, '730d': 730, '2y': 731, '5y': 1827, '10y': 3653, 'max': float('inf'),
+}
+
+
+def period_days(period):
+    return PERIOD_DAYS.get(period, PERIOD_DAYS['1mo'])
+
+
+def slice_period(df, period):
+    """Trailing `period` of `df`, anchored on its last bar (so weekends/holidays don't empty it)."""
+    import pandas as pd
+
+    if df.empty or period == 'max':
+        return df
+    last = df.index[-1]
+    if period in ('1d', '5d'):
+        # yfinance counts these in trading sessions, not calendar days
+        sessions = df.index.normalize().unique()[-int(period[:-1]):]
+        return df[df.index.normalize() >= sessions[0]]
+    if period == 'ytd':
+        cutoff = last.normalize().replace(month=1, day=1)
+    elif period.endswith('mo'):
+        cutoff = last.normalize() - pd.DateOffset(months=int(period[:-2]))
+    elif period.endswith('y'):
+        cutoff = last.normalize() - pd.DateOffset(years=int(period[:-1]))
+    elif period.endswith('d'):
+        cutoff = last.normalize() - pd.DateOffset(days=int(period[:-1]))
+    else:
+        return df
+    return df[df.index >= cutoff]
+
+
+def _generation_ns(name):
+    """Creation time (ns) encoded in a generation directory name, g<time_ns>-<suffix>."""
+    try:
+        return int(name[1:].split('-', 1)[0])
+    except ValueError:
+        return float('inf')  # not a generation directory: leave it alone
+
+
+class BarStore:
+    def __init__(self, root=None):
+        self.root = Path(root or settings.BAR_STORE_DIR)
+
+    def _series_dir(self, symbol, interval):
+        return self.root / symbol.upper() / interval
+
+    def symbols(self, interval):
+        """Every symbol with a stored `interval` series."""
+        if not self.root.is_dir():
+            return []
+        return sorted(d.name for d in self.root.iterdir() if (d / interval / 'meta.json').is_file())
+
+    def read_meta(self, symbol, interval):
+        try:
+            with open(self._series_dir(symbol, interval) / 'meta.json') as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def read(self, symbol, interval, period='max', since=None):
+        """
+        Return the stored bars as a yfinance-shaped DataFrame (Open/High/Low/
+        Close/Volume, tz-aware index), trimmed to the trailing `period`, or to
+        the bars stamped at or after `since` (UTC epoch ns) when given.
+        None if nothing is stored.
+        """
+        import numpy as np
+        import pandas as pd
+
+        meta = self.read_meta(symbol, interval)
+        if not meta or not meta.get('rows'):
+            return None
+        gen_dir = self._series_dir(symbol, interval) / meta['generation']
+        try:
+            t = np.load(gen_dir / 't.npy', mmap_mode='r')
+            cols = {name: np.load(gen_dir / f'{col}.npy', mmap_mode='r')
+                    for col, name in zip(COLUMNS, FRAME_COLUMNS)}
+        except OSError:
+            return None
+
+        start = 0
+        if since is not None:
+            start = int(np.searchsorted(t, since))
+        elif period != 'max' and period not in ('1d', '5d', 'ytd'):
+            # Cheap pre-cut on the memory-mapped timestamps before building the frame;
+            # slice_period() below applies the exact calendar cutoff.
+            cutoff = int(t[-1]) - int((period_days(period) + 1) * 86400 * 1e9)
+            start = int(np.searchsorted(t, cutoff))
+        elif period in ('1d', '5d'):
+            start = max(0, len(t) - int(period[:-1]) * 1000)  # ample for 1m bars
+
+        index = pd.DatetimeIndex(np.array(t[start:], dtype='datetime64[ns]'), tz='UTC').tz_convert(meta['tz'])
+        index.name = meta['index_name']
+        df = pd.DataFrame({name: np.array(col[start:]) for name, col in cols.items()}, index=index)
+        return df if since is not None else slice_period(df, period)
+
+    def write(self, symbol, interval, df, **extra_meta):
+        """Replace the stored series with `df` (yfinance history() output)."""
+        import numpy as np
+
+        series_dir = self._series_dir(symbol, interval)
+        series_dir.mkdir(parents=True, exist_ok=True)
+        previous = self.read_meta(symbol, interval)
+
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        generation = f"g{time.time_ns()}-{uuid.uuid4().hex[:6]}"
+        gen_dir = series_dir / generation
+        gen_dir.mkdir()
+        index = df.index if df.index.tz is not None else df.index.tz_localize('UTC')
+        np.save(gen_dir / 't.npy', index.tz_convert('UTC').asi8.astype('int64'))
+        for col, name in zip(COLUMNS, FRAME_COLUMNS):
+            if col == 'volume':
+                values = df[name].fillna(0).to_numpy(dtype='int64')
+            else:
+                values = df[name].to_numpy(dtype='float64')
+            np.save(gen_dir / f'{col}.npy', values)
+
+        meta = {
+            'generation': generation,
+            'rows': len(df),
+            'hwm': int(index[-1].value) if len(df) else None,
+            'tz': str(index.tz),
+            'index_name': df.index.name or ('Date' if interval.endswith(('d', 'wk', 'mo')) else 'Datetime'),
+            'synced_at': time.time(),
+            'base': generation,
+            **extra_meta,
+        }
+        tmp = series_dir / f'meta.json.{generation}.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, series_dir / 'meta.json')
+
+        # Keep the previous generation around for readers that opened it just before the swap,
+        # and anything newer than it, which another writer may still be filling
+        if previous:
+            cutoff = _generation_ns(previous['generation'])
+            for child in series_dir.iterdir():
+                if child.is_dir() and _generation_ns(child.name) < cutoff:
+                    shutil.rmtree(child, ignore_errors=True)
+        return meta
+
+    def append(self, symbol, interval, df):
+        """
+        Merge newer bars into the stored series. Stored bars at or after the
+        first new timestamp are replaced, so a re-fetched partial (still
+        forming) bar overwrites its earlier snapshot instead of duplicating it.
+        """
+        import pandas as pd
+
+        meta = self.read_meta(symbol, interval) or {}
+        existing = self.read(symbol, interval)
+        if existing is not None and not df.empty:
+            df = pd.concat([existing[existing.index < df.index[0]], df.tz_convert(existing.index.tz)])
+            df.index.name = existing.index.name
+        return self.write(symbol, interval, df, period=meta.get('period'),
+                          base=meta.get('base', meta.get('generation')))
+
+    def touch(self, symbol, interval):
+        """Mark the series as freshly synced without rewriting any columns."""
+        meta = self.read_meta(symbol, interval)
+        if not meta:
+            return None
+        meta['synced_at'] = time.time()
+        series_dir = self._series_dir(symbol, interval)
+        tmp = series_dir / f"meta.json.{uuid.uuid4().hex[:6]}.tmp"
+        with open(tmp, 'w') as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, series_dir / 'meta.json')
+        return meta
@@ -0,0 +1,342 @@
+"""
+Cache helpers shared by the market-data services.
+
+Values are stored as {"value": ..., "fetched_at": unix_ts} envelopes that live
+for a hard TTL. Once an entry is older than its soft TTL it is still served
+immediately, and a refresh is queued on a small bounded thread pool
+(stale-while-revalidate).
+
+Entries outlive their hard TTL by LAST_GOOD_TTL as a last-known-good copy:
+past the hard TTL a read recomputes synchronously, but if that fetch fails
+(upstream down, circuit breaker open) the old value is served with its age
+instead of nothing.
+
+Misses are coalesced (single flight): a threading lock serialises workers
+inside a process and a cache.add() lock (atomic on both Redis and LocMem)
+does the same across the cluster, so only one worker recomputes a key.
+
+Reads go through a small per-process LRU (L1) before the Django cache (L2,
+Redis in production), so hot keys skip the network round trip and unpickle.
+L1 entries live for MARKET_L1_TTL seconds and are stamped with a
+cluster-wide version; invalidate() bumps it and every process drops its L1
+within one L1 TTL. Values handed out from L1 are shared – treat them as
+read-only.
+"""
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+LOCK_TIMEOUT = 30         # seconds before an abandoned recompute lock expires
+WAIT_TIMEOUT = 10         # seconds a waiter polls for another worker's result
+POLL_INTERVAL = 0.1
+VERSION_KEY = "market_cache_version"
+LAST_GOOD_TTL = 86400     # seconds an expired entry is kept as a fallback for failed fetches
+
+_process_locks = weakref.WeakValueDictionary()  # a key's lock lives while someone holds or waits on it
+_process_locks_guard = threading.Lock()
+_refresh_pool = None
+_l1 = None
+_stats = Counter()
+_version = {"value": 0, "checked_at": float('-inf')}
+
+
+class LocalLRU:
+    """Size-bounded, TTL-bounded in-process LRU of cache envelopes."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, item_version, entry = item
+            if item_version != version or expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, version):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, version, entry)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _KeyLock:
+    """threading.Lock that can be weakly referenced (plain locks can't)."""
+    __slots__ = ('_lock', '__weakref__')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+
+def process_lock(key):
+    """
+    Per-key lock for threads of this process. Keys include request parameters,
+    so locks are only kept while in use rather than one per key forever. (Not
+    striped: nested locks, e.g. get_cached → get_bars, could deadlock on a
+    shared stripe.)
+    """
+    with _process_locks_guard:
+        lock = _process_locks.get(key)
+        if lock is None:
+            lock = _process_locks[key] = _KeyLock()
+        return lock
+
+
+@contextmanager
+def cluster_lock(key, timeout=LOCK_TIMEOUT, wait=WAIT_TIMEOUT):
+    """
+    cache.add() lock shared by every process (and host, on Redis). Yields
+    True once held, or False if another worker still held it after `wait`
+    seconds; `timeout` bounds how long a crashed holder can block others.
+    """
+    lock_key = f"lock:{key}"
+    deadline = time.monotonic() + wait
+    acquired = cache.add(lock_key, 1, timeout)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        acquired = cache.add(lock_key, 1, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(lock_key)
+
+
+def _get_refresh_pool():
+    global _refresh_pool
+    if _refresh_pool is None:
+        with _process_locks_guard:
+            if _refresh_pool is None:
+                _refresh_pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'MARKET_REFRESH_WORKERS', 4),
+                    thread_name_prefix='market-refresh',
+                )
+    return _refresh_pool
+
+
+def _get_l1():
+    global _l1
+    if _l1 is None:
+        with _process_locks_guard:
+            if _l1 is None:
+                _l1 = LocalLRU(
+                    maxsize=getattr(settings, 'MARKET_L1_MAXSIZE', 1024),
+                    ttl=getattr(settings, 'MARKET_L1_TTL', 5),
+                )
+    return _l1
+
+
+def _current_version():
+    """Cluster-wide cache version, re-read from L2 at most once per L1 TTL."""
+    l1 = _get_l1()
+    now = time.monotonic()
+    if now - _version["checked_at"] >= l1.ttl:
+        _version["value"] = cache.get(VERSION_KEY, 0)
+        _version["checked_at"] = now
+    return _version["value"]
+
+
+def _is_envelope(entry):
+    # Ignore anything that isn't an envelope (e.g. values written before envelopes existed)
+    return isinstance(entry, dict) and "fetched_at" in entry
+
+
+def _expired(entry, now=None):
+    return (now or time.time()) >= entry.get("expires_at", float('inf'))
+
+
+def _get_entry(key):
+    version = _current_version()
+    entry = _get_l1().get(key, version)
+    if entry is not None:
+        _stats["l1_hits"] += 1
+        return entry
+    _stats["l1_misses"] += 1
+
+    entry = cache.get(key)
+    if not _is_envelope(entry):
+        _stats["l2_misses"] += 1
+        return None
+    _stats["l2_hits"] += 1
+    _get_l1().set(key, entry, version)
+    return entry
+
+
+def _store(key, value, hard_ttl):
+    """Write a fresh envelope to both levels. None (a failed fetch) is never cached."""
+    if value is not None:
+        now = time.time()
+        entry = {"value": value, "fetched_at": now, "expires_at": now + hard_ttl}
+        cache.set(key, entry, hard_ttl + LAST_GOOD_TTL)
+        _get_l1().set(key, entry, _current_version())
+    return value
+
+
+def _refresh(key, compute, hard_ttl, lock_key):
+    try:
+        _store(key, compute(), hard_ttl)
+    except Exception:
+        pass  # keep serving the stale value until the hard TTL runs out
+    finally:
+        cache.delete(lock_key)
+
+
+def get_cached(key, compute, soft_ttl, hard_ttl=None, force=False):
+    """
+    Return (value, age_seconds) for `key`, calling `compute()` on a miss.
+
+    Entries older than `soft_ttl` are returned as-is while one background
+    refresh runs; entries expire for good after `hard_ttl` (default: soft_ttl).
+    `force=True` recomputes synchronously (cache warmers) unless another
+    worker already is. When a fetch fails, an expired (last-known-good) entry
+    is returned with its age; `value` is None only if there is none either.
+    """
+    hard_ttl = hard_ttl or soft_ttl
+    lock_key = f"lock:{key}"
+
+    if force and cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            value = _store(key, compute(), hard_ttl)
+        finally:
+            cache.delete(lock_key)
+        if value is not None:
+            return value, 0.0
+
+    entry = _get_entry(key)
+    if entry and not _expired(entry):
+        age = time.time() - entry["fetched_at"]
+        if age >= soft_ttl and cache.add(lock_key, 1, LOCK_TIMEOUT):
+            _get_refresh_pool().submit(_refresh, key, compute, hard_ttl, lock_key)
+        return entry["value"], age
+    last_good = entry
+
+    with process_lock(key):
+        # Another thread in this process may have filled it while we waited
+        entry = _get_entry(key)
+        if entry and not _expired(entry):
+            return entry["value"], time.time() - entry["fetched_at"]
+
+        if cache.add(lock_key, 1, LOCK_TIMEOUT):
+            try:
+                value = _store(key, compute(), hard_ttl)
+            finally:
+                cache.delete(lock_key)
+            if value is None and last_good:
+                return last_good["value"], time.time() - last_good["fetched_at"]
+            return value, 0.0
+
+        # Another process is recomputing: wait for its result
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            entry = _get_entry(key)
+            if entry and not _expired(entry):
+                return entry["value"], time.time() - entry["fetched_at"]
+            if cache.get(lock_key) is None:
+                break  # holder finished without a result (upstream failure) – don't pile on
+        if last_good:
+            return last_good["value"], time.time() - last_good["fetched_at"]
+        return None, None
+
+
+def single_flight(key, compute, timeout):
+    """Coalesced cache lookup with a plain hard expiry; returns the value only."""
+    return get_cached(key, compute, timeout)[0]
+
+
+def peek_many(keys):
+    """Cached values for `keys` (misses omitted) without triggering any fetch."""
+    version = _current_version()
+    l1 = _get_l1()
+    found, missing = {}, []
+    for key in keys:
+        entry = l1.get(key, version)
+        if entry is not None and not _expired(entry):
+            found[key] = entry
+        else:
+            missing.append(key)
+    _stats["l1_hits"] += len(found)
+    _stats["l1_misses"] += len(missing)
+
+    if missing:
+        now = time.time()
+        entries = {k: e for k, e in cache.get_many(missing).items() if _is_envelope(e) and not _expired(e, now)}
+        _stats["l2_hits"] += len(entries)
+        _stats["l2_misses"] += len(missing) - len(entries)
+        for key, entry in entries.items():
+            l1.set(key, entry, version)
+        found.update(entries)
+    return {key: entry["value"] for key, entry in found.items()}
+
+
+def store_many(values, hard_ttl):
+    """Write several fresh envelopes in one round trip (kept as last-known-good like _store)."""
+    now = time.time()
+    entries = {key: {"value": value, "fetched_at": now, "expires_at": now + hard_ttl}
+               for key, value in values.items() if value}
+    cache.set_many(entries, hard_ttl + LAST_GOOD_TTL)
+    version = _current_version()
+    for key, entry in entries.items():
+        _get_l1().set(key, entry, version)
+
+
+def invalidate(*keys):
+    """
+    Delete `keys` from L2 and bump the cluster-wide version so every process
+    drops its L1 entries within one L1 TTL (this process drops them at once).
+    """
+    if keys:
+        cache.delete_many(keys)
+    cache.add(VERSION_KEY, 0, None)
+    try:
+        _version["value"] = cache.incr(VERSION_KEY)
+    except ValueError:  # evicted between add() and incr()
+        cache.set(VERSION_KEY, 1, None)
+        _version["value"] = 1
+    _version["checked_at"] = time.monotonic()
+
+
+def clear_local():
+    """Drop this process's L1 entries (tests, long-running commands)."""
+    _get_l1().clear()
+    _version["checked_at"] = float('-inf')
+
+
+def cache_stats():
+    """Hit/miss counters for both levels in this process."""
+    stats = {name: _stats[name] for name in ("l1_hits", "l1_misses", "l2_hits", "l2_misses")}
+    for level in ("l1", "l2"):
+        lookups = stats[f"{level}_hits"] + stats[f"{level}_misses"]
+        stats[f"{level}_hit_ratio"] = round(stats[f"{level}_hits"] / lookups, 4) if lookups else None
+    stats["l1_size"] = len(_get_l1())
+    stats["version"] = _current_version()
+    return stats
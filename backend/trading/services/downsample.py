@@ -0,0 +1,51 @@
+"""
+OHLC-preserving downsampling for chart and history payloads.
+
+Bars are split into at most `max_points` consecutive buckets of (nearly)
+equal size, and each bucket becomes one bar: first open, max high, min low,
+last close, summed volume, labelled with its first bar's timestamp, the same
+way resample_bars() builds coarser intervals. Indicator series are sampled at
+each bucket's last bar, so they line up with the bucket's close. Unlike LTTB,
+which keeps single points, no high or low falls between the candles.
+"""
+import numpy as np
+
+MIN_POINTS = 10
+MAX_POINTS = 5000
+
+
+def bucket_starts(n, max_points):
+    """First row of each bucket, or None when `n` rows already fit."""
+    if not max_points or n <= max_points:
+        return None
+    return np.unique(np.linspace(0, n, max_points, endpoint=False).astype(np.int64))
+
+
+def bucket_ends(starts, n):
+    """Last row of each bucket."""
+    return np.append(starts[1:], n) - 1
+
+
+def downsample_bars(df, max_points):
+    """`df` (OHLCV, yfinance history() shape) reduced to at most `max_points` bucket bars."""
+    import pandas as pd
+
+    starts = bucket_starts(len(df), max_points)
+    if starts is None:
+        return df
+    ends = bucket_ends(starts, len(df))
+    columns = {
+        'Open': df['Open'].to_numpy(dtype='float64')[starts],
+        'High': np.maximum.reduceat(df['High'].to_numpy(dtype='float64'), starts),
+        'Low': np.minimum.reduceat(df['Low'].to_numpy(dtype='float64'), starts),
+        'Close': df['Close'].to_numpy(dtype='float64')[ends],
+        'Volume': np.add.reduceat(df['Volume'].to_numpy(dtype='int64'), starts),
+    }
+    return pd.DataFrame(columns, index=df.index[starts])
+
+
+def sample_series(values, starts, n):
+    """A per-bar list (e.g. an indicator) taken at each bucket's last bar."""
+    if starts is None:
+        return values
+    return [values[i] for i in bucket_ends(starts, n).tolist()]
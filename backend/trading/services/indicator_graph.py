@@ -0,0 +1,245 @@
+"""
+Parameterized indicator studies served by a small memoized compute graph.
+
+A study set is requested as a string such as "ema:50,rsi:7,bb:20:2.5"
+(missing parameters take the defaults in STUDIES). IndicatorGraph evaluates
+it over one series (1-D arrays) or a whole panel ((time × symbol) arrays).
+Every intermediate is a node keyed by its parameters: the close diff,
+gains/losses, the true range, rolling means/stds and EMAs. A node is computed
+once per graph, so rsi:7 and rsi:14 share one diff, sma:20 and bb:20 share one
+rolling mean, and ema:12 is reused by macd:12:26:9.
+
+The formulas match the original pandas ones exactly: simple-mean RSI,
+adjust=False EMAs, ddof=1 Bollinger std, simple-mean ATR of the true range.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+MAX_WINDOW = 500
+MAX_STUDIES = 10
+
+# study → default parameters (their types are the parameter types)
+STUDIES = {
+    'sma': (14,),
+    'ema': (20,),
+    'rsi': (14,),
+    'macd': (12, 26, 9),
+    'bb': (20, 2.0),
+    'atr': (14,),
+}
+
+
+def rolling_mean(x, window):
+    """pandas rolling(window).mean(): NaN until `window` valid values are available."""
+    out = np.full(x.shape, np.nan)
+    if len(x) >= window:
+        out[window - 1:] = sliding_window_view(x, window, axis=0).mean(axis=-1)
+    return out
+
+
+def rolling_std(x, window):
+    """pandas rolling(window).std() (ddof=1)."""
+    out = np.full(x.shape, np.nan)
+    if len(x) >= window:
+        out[window - 1:] = sliding_window_view(x, window, axis=0).std(axis=-1, ddof=1)
+    return out
+
+
+def ewm_mean(x, span):
+    """pandas ewm(span, adjust=False).mean(); each column starts at its first valid value."""
+    alpha = 2.0 / (span + 1.0)
+    if x.ndim == 2 and x.shape[1] * 2 > x.shape[0]:
+        # Wide, short panel (screener): one vector step per bar beats one filter per column
+        out = np.empty(x.shape)
+        prev = np.full(x.shape[1:], np.nan)
+        for t in range(len(x)):
+            row = x[t]
+            prev = np.where(np.isnan(prev), row, alpha * row + (1 - alpha) * prev)
+            out[t] = prev
+        return out
+
+    from scipy.signal import lfilter
+
+    # Long series: the recursion y[t] = alpha*x[t] + (1-alpha)*y[t-1] as a C-level IIR filter,
+    # seeded with each column's first valid value (leading NaN padding is left as is).
+    columns = x.reshape(len(x), -1)
+    out = np.full(columns.shape, np.nan)
+    for j in range(columns.shape[1]):
+        valid = np.flatnonzero(~np.isnan(columns[:, j]))
+        if not len(valid):
+            continue
+        first = valid[0]
+        out[first, j] = columns[first, j]
+        if first + 1 < len(x):
+            out[first + 1:, j], _ = lfilter([alpha], [1, alpha - 1], columns[first + 1:, j],
+                                            zi=[(1 - alpha) * columns[first, j]])
+    return out.reshape(x.shape)
+
+
+def rounded_list(values, ndigits=2):
+    """Round a float array to a JSON-ready list, with NaN → None."""
+    out = np.round(values, ndigits).astype(object)
+    out[np.isnan(values)] = None
+    return out.tolist()
+
+
+def parse_set(raw):
+    """
+    "ema:50,rsi:7,bb:20:2.5" → [('ema', (50,)), ('rsi', (7,)), ('bb', (20, 2.5))],
+    de-duplicated, in request order. Raises ValueError for anything malformed.
+    """
+    studies = []
+    for item in (part.strip().lower() for part in raw.split(',')):
+        if not item:
+            continue
+        name, *args = item.split(':')
+        if name not in STUDIES:
+            raise ValueError(f"Unknown study '{name}' (expected one of {', '.join(STUDIES)})")
+        defaults = STUDIES[name]
+        if len(args) > len(defaults):
+            raise ValueError(f"Too many parameters for '{name}'")
+        try:
+            params = tuple(type(d)(a) for d, a in zip(defaults, args)) + defaults[len(args):]
+        except ValueError:
+            raise ValueError(f"Invalid parameters in '{item}'")
+        if not all(0 < p <= MAX_WINDOW for p in params):
+            raise ValueError(f"Parameters in '{item}' must be between 1 and {MAX_WINDOW}")
+        if (name, params) not in studies:
+            studies.append((name, params))
+    if len(studies) > MAX_STUDIES:
+        raise ValueError(f"At most {MAX_STUDIES} studies per request")
+    return studies
+
+
+def _fmt(param):
+    return f"{param:g}" if isinstance(param, float) else str(param)
+
+
+def study_key(study):
+    """('bb', (20, 2.5)) → "bb:20:2.5" (canonical, used in cache keys)."""
+    name, params = study
+    return ':'.join([name, *map(_fmt, params)])
+
+
+def set_key(studies):
+    return ','.join(study_key(s) for s in studies)
+
+
+def study_outputs(study):
+    """Output series names for a study, e.g. ('bb', (20, 2.0)) → bb_upper_20_2, bb_middle_20_2, bb_lower_20_2."""
+    name, params = study
+    suffix = '_'.join(map(_fmt, params))
+    if name == 'macd':
+        return [f"macd_{suffix}", f"macd_signal_{suffix}", f"macd_hist_{suffix}"]
+    if name == 'bb':
+        return [f"bb_upper_{suffix}", f"bb_middle_{suffix}", f"bb_lower_{suffix}"]
+    return [f"{name}_{suffix}"]
+
+
+class IndicatorGraph:
+    """Memoized indicator nodes over close/high/low series (1-D or time × symbol)."""
+
+    def __init__(self, close, high=None, low=None):
+        self.inputs = {
+            'close': np.asarray(close, dtype='float64'),
+            'high': None if high is None else np.asarray(high, dtype='float64'),
+            'low': None if low is None else np.asarray(low, dtype='float64'),
+        }
+        self._memo = {}
+        self.computed = []  # node keys in evaluation order
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df['Close'].to_numpy(dtype='float64'), df['High'].to_numpy(dtype='float64'),
+                   df['Low'].to_numpy(dtype='float64'))
+
+    def node(self, *key):
+        if key not in self._memo:
+            op, *args = key
+            self._memo[key] = getattr(self, f'_node_{op}')(*args)
+            self.computed.append(key)
+        return self._memo[key]
+
+    # --- intermediates -------------------------------------------------
+
+    def _node_input(self, name):
+        if self.inputs[name] is None:
+            raise ValueError(f"'{name}' series required")
+        return self.inputs[name]
+
+    def _node_prev(self, name):
+        x = self.node('input', name)
+        return np.concatenate([np.full((1,) + x.shape[1:], np.nan), x[:-1]])
+
+    def _node_diff(self, name):
+        return self.node('input', name) - self.node('prev', name)
+
+    def _node_gain(self):
+        # delta.where(delta > 0, 0): the first diff (NaN) counts as 0, like pandas;
+        # rows before a panel column's history starts stay NaN.
+        delta = self.node('diff', 'close')
+        with np.errstate(invalid='ignore'):
+            gain = np.where(delta > 0, delta, 0.0)
+        gain[np.isnan(self.node('input', 'close'))] = np.nan
+        return gain
+
+    def _node_loss(self):
+        delta = self.node('diff', 'close')
+        with np.errstate(invalid='ignore'):
+            loss = np.where(delta < 0, -delta, 0.0)
+        loss[np.isnan(self.node('input', 'close'))] = np.nan
+        return loss
+
+    def _node_tr(self):
+        # Max of the three legs, skipping NaN (first bar → high - low)
+        high, low = self.node('input', 'high'), self.node('input', 'low')
+        prev_close = self.node('prev', 'close')
+        return np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+
+    def _node_sma(self, source, window):
+        return rolling_mean(self.node(*source), window)
+
+    def _node_std(self, source, window):
+        return rolling_std(self.node(*source), window)
+
+    def _node_ema(self, source, span):
+        return ewm_mean(self.node(*source), span)
+
+    def _node_macd(self, fast, slow):
+        return self.node('ema', ('input', 'close'), fast) - self.node('ema', ('input', 'close'), slow)
+
+    def _node_rsi(self, window):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rs = self.node('sma', ('gain',), window) / self.node('sma', ('loss',), window)
+            return 100 - (100 / (1 + rs))
+
+    # --- studies -------------------------------------------------------
+
+    def study(self, study):
+        """{output name: array} for one parsed study."""
+        name, params = study
+        close = ('input', 'close')
+        if name == 'sma':
+            values = [self.node('sma', close, params[0])]
+        elif name == 'ema':
+            values = [self.node('ema', close, params[0])]
+        elif name == 'rsi':
+            values = [self.node('rsi', params[0])]
+        elif name == 'atr':
+            values = [self.node('sma', ('tr',), params[0])]
+        elif name == 'macd':
+            fast, slow, signal = params
+            macd = self.node('macd', fast, slow)
+            signal_line = self.node('ema', ('macd', fast, slow), signal)
+            values = [macd, signal_line, macd - signal_line]
+        else:  # bb
+            window, width = params
+            middle, std = self.node('sma', close, window), self.node('std', close, window)
+            values = [middle + std * width, middle, middle - std * width]
+        return dict(zip(study_outputs(study), values))
+
+    def evaluate(self, studies):
+        outputs = {}
+        for study in studies:
+            outputs.update(self.study(study))
+        return outputs
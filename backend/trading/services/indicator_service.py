@@ -1,85 +1,180 @@
+STUDY_TTL = 21600  # study results are keyed by bar-store generation, so this only bounds memory
+STREAM_INTERVALS = ('1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h', '1d')
+# Bars used to seed a fresh streaming state (same window calculate_indicators uses for daily)
+STREAM_SEED_PERIOD = {'1d': '60d'}
+
+
+def overall_signal(rsi_val, macd_val):
+    """Signal rule shared by every indicator path, on 2dp-rounded RSI/MACD."""
+    if rsi_val:
+        if rsi_val < 30:
+            return "OVERSOLD"
+        if rsi_val > 70:
+            return "OVERBOUGHT"
+        if rsi_val < 45 and macd_val and macd_val > 0:
+            return "BULLISH"
+        if rsi_val > 55 and macd_val and macd_val < 0:
+            return "BEARISH"
+    return "NEUTRAL"
+
+
 class IndicatorService:
     @staticmethod
     def calculate_indicators(symbol):
-        import pandas as pd     # lazy — avoids OpenBLAS error at startup
-        import yfinance as yf
-        # Fetch 60 days of data to calculate 14-day indicators accurately
-        ticker = yf.Ticker(symbol.upper())
-        df = ticker.history(period="60d")
-        
-        if df.empty or len(df) < 20:
+        from .market_service import MarketService
+        from . import panel_indicators
+        # 60 days of data to calculate 14-day indicators accurately (sliced from the shared bar store)
+        df = MarketService.get_bars(symbol, period="60d")
+
+        if df is None or len(df) < 20:
+            return None
+
+        # A one-column panel through the shared indicator graph
+        symbol = symbol.upper()
+        panel = panel_indicators.compute_panel(
+            *(df[[col]].to_numpy(dtype='float64') for col in ('Close', 'High', 'Low'))
+        )
+        return panel_indicators.latest_table([symbol], panel_indicators.latest_values(panel))[symbol]
+
+    @staticmethod
+    def calculate_studies(symbol, studies, period="3mo", interval="1d"):
+        """
+        {output name: rounded list} for parsed `studies` (see indicator_graph)
+        over the trailing `period` of bars. Each study is cached under its
+        parameter key and the bar-store generation, so adding a study to a
+        chart only computes that study's new graph nodes.
+        """
+        from .bar_store import BarStore
+        from .cache_service import peek_many, store_many
+        from .indicator_graph import IndicatorGraph, rounded_list, study_key
+        from .market_service import MarketService, source_interval
+
+        symbol = symbol.upper()
+        # Generation read before the bars: a cached result is never older than its key.
+        # Resampled intervals change exactly when their base series does.
+        generation = (BarStore().read_meta(symbol, source_interval(interval, period)) or {}).get('generation')
+        df = MarketService.get_bars(symbol, period=period, interval=interval)
+        if df is None or df.empty:
+            return None
+
+        prefix = f"study_{symbol}_{interval}_{period}_{generation}_{df.index.asi8[-1]}_{len(df)}"
+        keys = {study: f"{prefix}_{study_key(study)}" for study in studies}
+        cached = peek_many(list(keys.values()))
+        missing = [study for study in studies if keys[study] not in cached]
+        if missing:
+            graph = IndicatorGraph.from_frame(df)
+            fresh = {
+                keys[study]: {name: rounded_list(values) for name, values in graph.study(study).items()}
+                for study in missing
+            }
+            store_many(fresh, STUDY_TTL)
+            cached.update(fresh)
+
+        result = {}
+        for study in studies:
+            result.update(cached[keys[study]])
+        return result
+
+    @staticmethod
+    def calculate_custom_indicators(symbol, studies, period="60d", interval="1d"):
+        """Latest value of each requested study, e.g. {"symbol": "AAPL", "ema_50": ..., "rsi_7": ...}."""
+        values = IndicatorService.calculate_studies(symbol, studies, period, interval)
+        if values is None:
             return None
+        return {"symbol": symbol.upper(), **{name: series[-1] for name, series in values.items()}}
 
-        # SMA
-        df['SMA_14'] = df['Close'].rolling(window=14).mean()
-        df['SMA_50'] = df['Close'].rolling(window=50).mean()
-        
-        # EMA
-        df['EMA_14'] = df['Close'].ewm(span=14, adjust=False).mean()
-        df['EMA_20'] = df['Close'].ewm(span=20, adjust=False).mean()
-        
-        # RSI
-        delta = df['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
-        
-        # MACD
-        exp1 = df['Close'].ewm(span=12, adjust=False).mean()
-        exp2 = df['Close'].ewm(span=26, adjust=False).mean()
-        df['MACD'] = exp1 - exp2
-        df['Signal_Line'] = df['MACD'].ewm(span=9, adjust=False).mean()
-        df['MACD_Histogram'] = df['MACD'] - df['Signal_Line']
-        
-        # Bollinger Bands
-        df['BB_Middle'] = df['Close'].rolling(window=20).mean()
-        bb_std = df['Close'].rolling(window=20).std()
-        df['BB_Upper'] = df['BB_Middle'] + (bb_std * 2)
-        df['BB_Lower'] = df['BB_Middle'] - (bb_std * 2)
-
-        # ATR (Average True Range)
-        high_low = df['High'] - df['Low']
-        high_close = (df['High'] - df['Close'].shift()).abs()
-        low_close = (df['Low'] - df['Close'].shift()).abs()
+    @staticmethod
+    def load_matrices(symbols, period="60d", min_rows=20, max_workers=8):
+        """
+        (symbols, close, high, low) for the symbols with at least `min_rows`
+        bars: (time × symbol) float matrices, each history right-aligned on its
+        own last bar and left-padded with NaN, so every column is exactly that
+        symbol's series and the last row is its latest bar.
+        """
         import numpy as np
-        tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-        df['ATR'] = tr.rolling(window=14).mean()
-
-        latest = df.iloc[-1]
-        prev = df.iloc[-2] if len(df) > 1 else latest
-
-        # Signal Logic
-        rsi_val = round(float(latest['RSI']), 2) if not pd.isna(latest['RSI']) else None
-        macd_val = round(float(latest['MACD']), 2) if not pd.isna(latest['MACD']) else None
-        signal_val = round(float(latest['Signal_Line']), 2) if not pd.isna(latest['Signal_Line']) else None
-
-        # Determine overall signal
-        signal = "NEUTRAL"
-        if rsi_val:
-            if rsi_val < 30:
-                signal = "OVERSOLD"
-            elif rsi_val > 70:
-                signal = "OVERBOUGHT"
-            elif rsi_val < 45 and macd_val and macd_val > 0:
-                signal = "BULLISH"
-            elif rsi_val > 55 and macd_val and macd_val < 0:
-                signal = "BEARISH"
-        
-        return {
-            "symbol": symbol.upper(),
-            "RSI": rsi_val,
-            "MACD": macd_val,
-            "Signal_Line": signal_val,
-            "MACD_Histogram": round(float(latest['MACD_Histogram']), 2) if not pd.isna(latest.get('MACD_Histogram', float('nan'))) else None,
-            "SMA_14": round(float(latest['SMA_14']), 2) if not pd.isna(latest['SMA_14']) else None,
-            "SMA_50": round(float(latest['SMA_50']), 2) if not pd.isna(latest.get('SMA_50', float('nan'))) else None,
-            "EMA_14": round(float(latest['EMA_14']), 2) if not pd.isna(latest['EMA_14']) else None,
-            "EMA_20": round(float(latest['EMA_20']), 2) if not pd.isna(latest.get('EMA_20', float('nan'))) else None,
-            "BB_Upper": round(float(latest['BB_Upper']), 2) if not pd.isna(latest.get('BB_Upper', float('nan'))) else None,
-            "BB_Middle": round(float(latest['BB_Middle']), 2) if not pd.isna(latest.get('BB_Middle', float('nan'))) else None,
-            "BB_Lower": round(float(latest['BB_Lower']), 2) if not pd.isna(latest.get('BB_Lower', float('nan'))) else None,
-            "ATR": round(float(latest['ATR']), 2) if not pd.isna(latest.get('ATR', float('nan'))) else None,
-            "signal": signal,
-            "price_vs_ema20": "ABOVE" if latest['Close'] > latest['EMA_20'] else "BELOW",
-        }
+        from .market_service import MarketService
+
+        frames = MarketService.get_bars_many(symbols, period=period, max_workers=max_workers)
+        frames = {s: df for s, df in frames.items() if df is not None and len(df) >= min_rows}
+        if not frames:
+            return [], None, None, None
+
+        names = list(frames)
+        depth = max(len(df) for df in frames.values())
+        close, high, low = (np.full((depth, len(names)), np.nan) for _ in range(3))
+        for j, symbol in enumerate(names):
+            df = frames[symbol]
+            close[depth - len(df):, j] = df['Close'].to_numpy(dtype='float64')
+            high[depth - len(df):, j] = df['High'].to_numpy(dtype='float64')
+            low[depth - len(df):, j] = df['Low'].to_numpy(dtype='float64')
+        return names, close, high, low
+
+    @staticmethod
+    def indicator_panel(symbols, max_workers=8):
+        """
+        (symbols, panel) for the symbols with enough data: their 60d bars run
+        through the NumPy panel engine in one pass (see panel_indicators).
+        panel is None if none qualify.
+        """
+        from . import panel_indicators
+
+        names, close, high, low = IndicatorService.load_matrices(symbols, max_workers=max_workers)
+        if not names:
+            return [], None
+        return names, panel_indicators.compute_panel(close, high, low)
+
+    @staticmethod
+    def calculate_indicators_batch(symbols, max_workers=8):
+        """calculate_indicators() for many symbols at once; symbols without enough data are omitted."""
+        from . import panel_indicators
+
+        names, panel = IndicatorService.indicator_panel(symbols, max_workers)
+        if panel is None:
+            return {}
+        return panel_indicators.latest_table(names, panel_indicators.latest_values(panel))
+
+    @staticmethod
+    def calculate_streaming_indicators(symbol, interval="1d"):
+        """
+        calculate_indicators() kept current by a cached IndicatorState: only the
+        stored bars at or after the state's last bar are read and applied (the
+        last one is revised in place), so a refresh costs O(new bars) in both I/O
+        and compute. The state is seeded from the trailing seed window and only
+        re-seeded when it is missing or the stored history was rewritten
+        (re-adjusted upstream); from then on the EMAs carry their whole history
+        rather than restarting at the window's first bar.
+        """
+        from .market_service import MarketService
+        from .cache_service import process_lock
+        from .streaming_indicators import IndicatorState, load_state, save_state
+
+        symbol = symbol.upper()
+        period = STREAM_SEED_PERIOD.get(interval, "5d")
+        with process_lock(f"indicator_state_{symbol}_{interval}"):
+            state, df = load_state(symbol, interval), None
+            if state is not None and state.time is not None:
+                df, base = MarketService.get_bar_tail(symbol, state.time, period, interval)
+                if base != state.base or df is None or df.index.asi8[0] != state.time:
+                    df = None  # history rewritten under the state: re-seed
+            if df is None:
+                df, base = MarketService.get_bar_tail(symbol, None, period, interval)
+                if df is None:
+                    return None
+                state = IndicatorState(base)
+            bars = zip(df.index.asi8, df['High'].to_numpy(), df['Low'].to_numpy(), df['Close'].to_numpy())
+            for t, high, low, close in bars:
+                state.update(int(t), float(high), float(low), float(close))
+            save_state(symbol, interval, state)
+
+        if state.bars < 20:
+            return None
+        values = state.values()
+        result = {"symbol": symbol}
+        for name, value in values.items():
+            if name != 'Close':
+                result[name] = round(value, 2) if value is not None else None
+        result["signal"] = overall_signal(result["RSI"], result["MACD"])
+        result["price_vs_ema20"] = "ABOVE" if values['Close'] > values['EMA_20'] else "BELOW"
+        result["interval"] = interval
+        result["as_of"] = df.index[-1].isoformat()
+        return result
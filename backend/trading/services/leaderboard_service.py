@@ -0,0 +1,78 @@
+"""
+Cross-user portfolio leaderboard, rebuilt in bulk by refresh_leaderboard.
+
+One Portfolio query streams every (user, symbol, quantity, average price)
+row. The distinct symbols are priced in one get_price_batch call, and the
+join back onto the rows is an index lookup: np.unique's inverse gives each
+row its symbol's price. np.bincount then sums value and cost per user. No
+per-user or per-holding work, so 100k users × ~10 holdings is a few arrays
+of a million floats. Holdings without a quote are valued at cost, as in
+/portfolio/analytics/.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+WRITE_BATCH = 5000
+FETCH_CHUNK = 20000
+
+
+def rank_portfolios(user_ids, symbols, quantities, avg_prices, prices):
+    """
+    (users, value, cost, p_l, p_l_pct, rank) arrays, one entry per distinct
+    user, from parallel per-holding arrays and a {symbol: price} map. Ranked
+    by P/L %, then absolute P/L; rank 1 is best.
+    """
+    import numpy as np
+
+    users, user_idx = np.unique(np.asarray(user_ids, dtype=np.int64), return_inverse=True)
+    symbol_set, symbol_idx = np.unique(np.asarray(symbols, dtype=str), return_inverse=True)
+    quantities = np.asarray(quantities, dtype='float64')
+    avg_prices = np.asarray(avg_prices, dtype='float64')
+
+    price_table = np.array([prices.get(s, np.nan) for s in symbol_set.tolist()], dtype='float64')
+    price = price_table[symbol_idx]
+    price = np.where(np.isnan(price), avg_prices, price)
+
+    value = np.bincount(user_idx, weights=quantities * price, minlength=len(users))
+    cost = np.bincount(user_idx, weights=quantities * avg_prices, minlength=len(users))
+    p_l = value - cost
+    p_l_pct = np.divide(p_l * 100, cost, out=np.zeros_like(p_l), where=cost > 0)
+
+    order = np.lexsort((-p_l, -p_l_pct))
+    rank = np.empty(len(users), dtype=np.int64)
+    rank[order] = np.arange(1, len(users) + 1)
+    return users, value, cost, p_l, p_l_pct, rank
+
+
+class LeaderboardService:
+    @staticmethod
+    def refresh():
+        """Recompute and replace the whole leaderboard; returns the number of ranked users."""
+        from portfolio.models import LeaderboardEntry, Portfolio
+        from .market_service import MarketService
+
+        rows = Portfolio.objects.filter(quantity__gt=0).values_list(
+            'user_id', 'stock_symbol', 'quantity', 'average_buy_price')
+        columns = list(zip(*rows.iterator(chunk_size=FETCH_CHUNK)))
+        if not columns:
+            LeaderboardEntry.objects.all().delete()
+            return 0
+        user_ids, symbols, quantities, avg_prices = columns
+        symbols = [s.upper() for s in symbols]
+
+        quotes = MarketService.get_price_batch(set(symbols))
+        prices = {s: q['price'] for s, q in quotes.items() if q.get('price')}
+        users, value, cost, p_l, p_l_pct, rank = rank_portfolios(user_ids, symbols, quantities, avg_prices, prices)
+
+        now = timezone.now()
+        entries = [
+            LeaderboardEntry(user_id=u, rank=r, value=round(v, 2), cost_basis=round(c, 2),
+                             p_l=round(pl, 2), p_l_pct=round(pct, 2), updated_at=now)
+            for u, r, v, c, pl, pct in zip(users.tolist(), rank.tolist(), value.tolist(), cost.tolist(),
+                                           p_l.tolist(), p_l_pct.tolist())
+        ]
+        # Readers see either the previous board or the new one, never a mix
+        with transaction.atomic():
+            LeaderboardEntry.objects.all().delete()
+            LeaderboardEntry.objects.bulk_create(entries, batch_size=WRITE_BATCH)
+        return len(entries)
@@ -0,0 +1,233 @@
+"""
+Portfolio value history from the transaction ledger.
+
+Holdings over time are a step function per symbol: the cumulative signed
+quantity of a user's portfolio.Transaction rows (one query). An as-of join
+onto the bar timestamps (searchsorted over the step times) gives a
+(time × symbol) quantity matrix. Its row-wise product with the close matrix
+gives the value per bar, so a position only counts from the bar in which it
+was bought and stops counting once it is sold.
+
+Holdings the ledger can't explain (rows that predate transaction logging,
+manual edits) are reconciled as an opening position: current quantity minus
+the ledger's net quantity, held from the start. The curve therefore always
+ends on today's holdings. Cost basis follows the same steps, using average
+cost like the buy/sell endpoints.
+
+build_portfolio_snapshots materializes the daily values for every user
+into PortfolioSnapshot. The 1M/1Y charts read those back and only add a
+live point for now.
+"""
+from collections import defaultdict, namedtuple
+
+from .bar_store import period_days
+from .market_service import MarketService
+
+INT64_MIN = -2 ** 63
+MARKET_TZ = 'America/New_York'
+SNAPSHOT_MAX_LAG_DAYS = 4   # older than this (builder not running) → compute from the ledger instead
+
+# symbols: sorted list; times: (K,) int64 step starts; quantities: (K, S); cost_basis: (K,)
+Ledger = namedtuple('Ledger', 'symbols times quantities cost_basis')
+
+
+def position_steps(symbols, trade_symbols, trade_qty, trade_ns, opening):
+    """
+    (times, quantities): quantities[k] is the (S,) position vector held from
+    times[k] on. Row 0, at the start of time, is the `opening` position;
+    every distinct trade timestamp adds one row.
+    """
+    import numpy as np
+
+    times, t_idx = np.unique(np.asarray(trade_ns, dtype=np.int64), return_inverse=True)
+    column = {s: j for j, s in enumerate(symbols)}
+    s_idx = np.fromiter((column[s] for s in trade_symbols), dtype=np.int64, count=len(trade_symbols))
+    deltas = np.zeros((len(times) + 1, len(symbols)))
+    deltas[0] = opening
+    np.add.at(deltas, (t_idx + 1, s_idx), trade_qty)
+    return np.concatenate([[INT64_MIN], times]).astype(np.int64), np.cumsum(deltas, axis=0)
+
+
+def cost_basis_steps(times, symbols, trades, opening, avg_price):
+    """
+    Total average-cost basis from each step on (aligned with position_steps).
+    `trades` is [(symbol, signed qty, price, time ns)] in time order. Sequential
+    by nature (a sell removes basis at the running average), so a plain loop.
+    """
+    import numpy as np
+
+    held = dict(zip(symbols, opening.tolist()))
+    basis = {s: max(q, 0.0) * avg_price.get(s, 0.0) for s, q in held.items()}
+    out = np.empty(len(times))
+    out[0] = total = sum(basis.values())
+    rows = np.searchsorted(times, [t[3] for t in trades]).tolist()
+    for (symbol, qty, price, _), row in zip(trades, rows):
+        quantity, cost = held[symbol], basis[symbol]
+        if qty > 0:
+            cost += qty * price
+        elif quantity > 0:
+            cost -= cost * min(-qty, quantity) / quantity
+        quantity += qty
+        if quantity <= 0:
+            cost = 0.0
+        total += cost - basis[symbol]
+        held[symbol], basis[symbol] = quantity, cost
+        out[row] = total
+    return out
+
+
+def build_ledger(trades, holdings):
+    """
+    Ledger from `trades` [(symbol, kind, quantity, price, timestamp)] in time
+    order and current `holdings` {symbol: (quantity, average_buy_price)};
+    None if there is nothing to chart.
+    """
+    import numpy as np
+    import pandas as pd
+
+    holdings = {s.upper(): h for s, h in holdings.items()}
+    trade_symbols = [t[0].upper() for t in trades]
+    symbols = sorted(set(trade_symbols) | {s for s, (q, _) in holdings.items() if q})
+    if not symbols:
+        return None
+
+    signed = np.array([q if kind == 'BUY' else -q for _, kind, q, _, _ in trades], dtype='float64')
+    trade_ns = pd.to_datetime([t[4] for t in trades], utc=True).asi8 if trades else np.array([], dtype=np.int64)
+    net = dict.fromkeys(symbols, 0.0)
+    for symbol, qty in zip(trade_symbols, signed.tolist()):
+        net[symbol] += qty
+    opening = np.array([holdings.get(s, (0, 0.0))[0] - net[s] for s in symbols], dtype='float64')
+
+    times, quantities = position_steps(symbols, trade_symbols, signed, trade_ns, opening)
+    cost_basis = cost_basis_steps(
+        times, symbols, list(zip(trade_symbols, signed.tolist(), [t[3] for t in trades], trade_ns.tolist())),
+        opening, {s: avg for s, (_, avg) in holdings.items()},
+    )
+    return Ledger(symbols, times, quantities, cost_basis)
+
+
+def ledger_values(ledger, close_df, interval):
+    """(value, cost_basis) arrays per row of a forward-filled (time × symbol) close frame."""
+    import numpy as np
+
+    as_of = bar_close_ns(close_df.index, interval)
+    step = np.searchsorted(ledger.times, as_of, side='right') - 1
+    symbols = [s for s in ledger.symbols if s in close_df.columns]
+    held = ledger.quantities[step][:, [ledger.symbols.index(s) for s in symbols]]
+    close = np.nan_to_num(close_df[symbols].to_numpy(dtype='float64'))
+    return np.einsum('ts,ts->t', held, close), ledger.cost_basis[step]
+
+
+def close_frame(symbols, period, interval):
+    """Forward-filled (time × symbol) closes from the bar store, one read per symbol."""
+    import pandas as pd
+
+    frames = MarketService.get_bars_many(symbols, period=period, interval=interval)
+    close_df = pd.DataFrame({s: df['Close'] for s, df in frames.items() if df is not None})
+    # Forward-fill gaps (weekends / holidays, symbols listed on other calendars)
+    return close_df.ffill()
+
+
+def holdings_at(times, quantities, as_of):
+    """(T, S) positions held at each `as_of` instant (UTC epoch ns)."""
+    import numpy as np
+
+    return quantities[np.searchsorted(times, as_of, side='right') - 1]
+
+
+def bar_close_ns(index, interval):
+    """
+    UTC epoch ns at which each bar closes: 16:00 New York for daily bars (so
+    after-hours trades count from the next session), start + bar length intraday.
+    Early-close sessions are ignored.
+    """
+    import pandas as pd
+
+    if interval == '1d':
+        return (index.tz_convert(MARKET_TZ).normalize() + pd.Timedelta(hours=16)).asi8
+    return index.asi8 + bar_span_ns(interval)
+
+
+def bar_span_ns(interval):
+    """Length of one bar, so positions are taken as of each bar's close."""
+    import pandas as pd
+
+    return pd.Timedelta(interval[:-1] + 'min' if interval.endswith('m') else interval).value
+
+
+class LedgerService:
+    @staticmethod
+    def load_ledgers(user_ids=None):
+        """{user_id: Ledger} for every user (or `user_ids`) with trades or holdings – two queries in total."""
+        from portfolio.models import Portfolio, Transaction
+
+        transactions, portfolios = Transaction.objects.all(), Portfolio.objects.all()
+        if user_ids is not None:
+            transactions = transactions.filter(user_id__in=user_ids)
+            portfolios = portfolios.filter(user_id__in=user_ids)
+
+        trades, holdings = defaultdict(list), defaultdict(dict)
+        for user_id, *trade in transactions.order_by('timestamp', 'id').values_list(
+                'user_id', 'stock_symbol', 'transaction_type', 'quantity', 'price', 'timestamp'):
+            trades[user_id].append(trade)
+        for user_id, symbol, quantity, average in portfolios.values_list(
+                'user_id', 'stock_symbol', 'quantity', 'average_buy_price'):
+            holdings[user_id][symbol] = (quantity, average)
+
+        ledgers = {}
+        for user_id in trades.keys() | holdings.keys():
+            ledger = build_ledger(trades[user_id], holdings[user_id])
+            if ledger:
+                ledgers[user_id] = ledger
+        return ledgers
+
+    @staticmethod
+    def value_history(user, period="1mo", interval="1d"):
+        """
+        pandas Series of portfolio value per bar over the trailing `period`,
+        holding exactly what the ledger says was held at each bar's close.
+        None if the user never held anything in the window or no bars are available.
+        """
+        import numpy as np
+        import pandas as pd
+
+        ledger = LedgerService.load_ledgers([user.pk]).get(user.pk)
+        if ledger is None:
+            return None
+
+        # Only symbols held at some point in the window need bars
+        start = pd.Timestamp.now(tz='UTC').value - int(period_days(period) * 86400e9)
+        first = np.searchsorted(ledger.times, start, side='right') - 1
+        held = np.any(ledger.quantities[first:] != 0, axis=0)
+        close_df = close_frame([s for s, h in zip(ledger.symbols, held) if h], period, interval)
+        if close_df.empty:
+            return None
+        values, _ = ledger_values(ledger, close_df, interval)
+        return pd.Series(values, index=close_df.index)
+
+    @staticmethod
+    def snapshot_history(user, period="1y"):
+        """
+        Daily values from PortfolioSnapshot (one indexed range query) plus a
+        live point for now, valued from cached quotes. None when there are no
+        recent snapshots (the builder hasn't run), so callers fall back to
+        value_history().
+        """
+        import pandas as pd
+        from datetime import timedelta
+        from portfolio.models import Portfolio, PortfolioSnapshot
+
+        now = pd.Timestamp.now(tz=MARKET_TZ)
+        today = now.date()
+        rows = list(PortfolioSnapshot.objects.filter(
+            user=user, date__gte=today - timedelta(days=period_days(period)),
+        ).order_by('date').values_list('date', 'value'))
+        if not rows or (today - rows[-1][0]).days > SNAPSHOT_MAX_LAG_DAYS:
+            return None
+
+        rows = [(pd.Timestamp(d).tz_localize(MARKET_TZ), v) for d, v in rows if d < today]
+        holdings = list(Portfolio.objects.filter(user=user, quantity__gt=0).values_list('stock_symbol', 'quantity'))
+        quotes = MarketService.get_price_batch([s for s, _ in holdings])
+        if all(s.upper() in quotes for s, _ in holdings):
+            rows.append((now, sum(q * quotes[s.upper()]['price'] for s, q in holdings)))
+        return pd.Series([v for _, v in rows], index=pd.DatetimeIndex([t for t, _ in rows]), dtype='float64')
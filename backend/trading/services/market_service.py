@@ -1,4 +1,66 @@
-from django.core.cache import cache
+import time
+
+from django.conf import settings
+
+from .bar_store import BarStore, period_days, slice_period
+from .cache_service import (
+    LocalLRU, cluster_lock, get_cached, peek_many, process_lock, single_flight, store_many,
+)
+from .providers import get_provider
+from . import snapshot_service
+
+# Daily bars are always fetched at least this far back, so one download serves
+# sparklines (1mo), indicators (60d), charts (3mo) and raw history alike. 5m bars
+# (the intraday base) are fetched as deep as yfinance serves them.
+MIN_FETCH_PERIOD = {'1d': '1y', '5m': '60d'}
+# yfinance only serves this much intraday history; longer requests get what there is
+# (flagged `truncated` on charts)
+MAX_FETCH_PERIOD = {'1m': '5d', '2m': '60d', '5m': '60d', '60m': '730d', '1h': '730d'}
+# Intervals derived by resampling a finer stored series instead of their own download.
+# Hourly bars reach back further natively, so periods beyond the 5m base are fetched as 1h.
+DERIVED_FROM = {'15m': '5m', '30m': '5m', '60m': '5m', '1h': '5m', '90m': '5m', '1wk': '1d', '1mo': '1d'}
+RESAMPLE_RULES = {'15m': '15min', '30m': '30min', '60m': '60min', '1h': '60min', '90m': '90min',
+                  '1wk': 'W-MON', '1mo': 'MS'}
+OHLCV_AGG = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+SESSION_OPEN_MINUTES = 9 * 60 + 30  # intraday bins start at the 09:30 open, like yfinance's
+# Seconds a stored series counts as current before it is re-synced upstream
+BAR_TTL = {'1d': 600}
+INTRADAY_BAR_TTL = 120
+# Relative change in an already-stored, complete bar's close that means upstream re-adjusted
+# the history (split, dividend) and the stored series must be rewritten, not appended to
+ADJUSTMENT_TOLERANCE = 1e-4
+SYNC_LOCK_TIMEOUT = 120  # seconds before a crashed worker's bar-sync lock expires
+# Bar sizes the chart endpoint serves; only 5m and 1d are ever downloaded
+CHART_INTERVALS = ('5m', '15m', '30m', '1h', '1d', '1wk', '1mo')
+# (soft, hard) TTLs of the quote and sparkline tiers; anything served older than the hard
+# TTL is a last-known-good fallback and is flagged stale. There is one quote entry per
+# symbol (`price_only_<SYM>`), written by single fetches, batches and the cache warmer alike.
+QUOTE_TTL = (30, 120)
+SPARKLINE_TTL = (600, 21600)
+# Chart studies when none are requested (indicator_graph set syntax)
+DEFAULT_CHART_SET = "ema:20,rsi:14"
+
+# (response field, ticker.info key, default) for the fundamentals tier
+FUNDAMENTAL_FIELDS = (
+    ('logo_url', 'logo_url', ''),
+    ('long_name', 'longName', ''),
+    ('short_name', 'shortName', ''),
+    ('summary', 'longBusinessSummary', ''),
+    ('sector', 'sector', ''),
+    ('industry', 'industry', ''),
+    ('market_cap', 'marketCap', None),
+    ('pe_ratio', 'trailingPE', None),
+    ('eps', 'trailingEps', None),
+    ('dividend_yield', 'dividendYield', None),
+    ('beta', 'beta', None),
+    ('target_mean_price', 'targetMeanPrice', None),
+    ('target_high_price', 'targetHighPrice', None),
+    ('target_low_price', 'targetLowPrice', None),
+    ('recommendation', 'recommendationKey', ''),
+    ('number_of_analysts', 'numberOfAnalystOpinions', None),
+    ('fifty_two_week_high', 'fiftyTwoWeekHigh', None),
+    ('fifty_two_week_low', 'fiftyTwoWeekLow', None),
+)
 
 
 # ── News helpers ─────────────────────────────────────────────────────────────
@@ -63,357 +125,534 @@ def _parse_yf_news(raw_items):
     return [r for r in result if r.get('title')]
 
 
-def _fetch_rss_news(symbol, max_items=8):
+def _quote_from_history(symbol, hist):
+    """Build a price-only quote dict from a daily OHLCV frame (last row = latest)."""
+    if hist is None or hist.empty:
+        return None
+    row = hist.iloc[-1]
+    price = float(row['Close'])
+    prev = float(hist.iloc[-2]['Close']) if len(hist) > 1 else price
+    change = price - prev
+    change_pct = (change / prev * 100) if prev else 0
+    return {
+        "symbol": symbol, "price": round(price, 2),
+        "change": round(change, 2), "change_pct": round(change_pct, 2),
+        "volume": int(row['Volume']), "high": round(float(row['High']), 2),
+        "low": round(float(row['Low']), 2), "open": round(float(row['Open']), 2),
+        "logo_url": "", "long_name": "", "short_name": "", "news": [],
+    }
+
+
+_derived_frames = None
+
+
+def _get_derived_frames():
+    """Per-process LRU of resampled frames, versioned by their base series' generation."""
+    global _derived_frames
+    if _derived_frames is None:
+        _derived_frames = LocalLRU(maxsize=getattr(settings, 'MARKET_DERIVED_MAXSIZE', 256), ttl=3600)
+    return _derived_frames
+
+
+def resample_bars(df, interval):
     """
-    Pull real-time financial news for `symbol` using free RSS feeds.
-    Sources: Yahoo Finance RSS, Seeking Alpha RSS, MarketWatch RSS.
-    Uses stdlib only (requests already in venv, xml.etree built-in).
+    Aggregate OHLCV bars into `interval` (first/max/min/last/sum). Intraday
+    bins are anchored on the 09:30 open and weeks start on Monday, matching
+    the bars yfinance returns for those intervals.
     """
-    import requests
-    import xml.etree.ElementTree as ET
-    from datetime import datetime, timezone
-    import time as _time
-    from email.utils import parsedate_to_datetime
-
-    FEEDS = [
-        # Yahoo Finance RSS (symbol-specific)
-        f"https://feeds.finance.yahoo.com/rss/2.0/headline?s={symbol}&region=US&lang=en-US",
-        # Seeking Alpha RSS
-        f"https://seekingalpha.com/api/sa/combined/{symbol}.xml",
-        # MarketWatch (general market news – good fallback)
-        "https://feeds.content.dowjones.io/public/rss/mw_realtimeheadlines",
-    ]
-
-    ns = {'atom': 'http://www.w3.org/2005/Atom'}
-    articles = []
-
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (compatible; StockPulseBot/1.0)',
-        'Accept': 'application/rss+xml,application/xml,text/xml;q=0.9,*/*;q=0.8',
-    }
+    import pandas as pd
 
-    for feed_url in FEEDS:
-        if len(articles) >= max_items:
-            break
-        try:
-            resp = requests.get(feed_url, headers=headers, timeout=3)
-            if resp.status_code != 200:
-                continue
-
-            root = ET.fromstring(resp.content)
-
-            # RSS 2.0: channel/item
-            items = root.findall('.//item')
-            for item in items[:6]:
-                def _text(tag):
-                    el = item.find(tag)
-                    return el.text.strip() if el is not None and el.text else ''
-
-                title     = _text('title')
-                link      = _text('link') or _text('guid')
-                pub_date  = _text('pubDate')
-                publisher = _text('source') or feed_url.split('/')[2].replace('feeds.', '').replace('www.', '')
-                summary   = _text('description')
-
-                # Strip HTML from summary
-                if summary:
-                    import re
-                    summary = re.sub(r'<[^>]+>', '', summary).strip()[:300]
-
-                # Parse timestamp
-                ts = None
-                if pub_date:
-                    try:
-                        dt = parsedate_to_datetime(pub_date)
-                        ts = int(dt.timestamp())
-                    except Exception:
-                        ts = None
-                if not ts:
-                    ts = int(_time.time())
-
-                if title and link:
-                    articles.append({
-                        'title':               title,
-                        'summary':             summary,
-                        'publisher':           publisher,
-                        'link':                link,
-                        'providerPublishTime': ts,
-                        'thumbnail':           None,
-                        'source':              'rss',
-                    })
+    rule = RESAMPLE_RULES[interval]
+    anchor = {}
+    if rule.endswith('min'):
+        minutes = int(rule[:-3])
+        anchor = {'origin': 'start_day', 'offset': pd.Timedelta(minutes=SESSION_OPEN_MINUTES % minutes)}
+    out = df.resample(rule, label='left', closed='left', **anchor).agg(OHLCV_AGG)
+    return out.dropna(subset=['Close'])
 
-        except Exception:
-            continue
 
-    # Sort by timestamp descending
-    articles.sort(key=lambda x: x.get('providerPublishTime') or 0, reverse=True)
-    return articles[:max_items]
+def source_interval(interval, period):
+    """Stored series that serves `interval` bars over `period`: its resampling base, or itself."""
+    base = DERIVED_FROM.get(interval)
+    if base is None:
+        return interval
+    base_cap = period_days(MAX_FETCH_PERIOD.get(base, 'max'))
+    if period_days(period) > base_cap and period_days(MAX_FETCH_PERIOD.get(interval, '1d')) > base_cap:
+        return interval  # deeper natively than the base can reach
+    return base
+
+
+def is_truncated(interval, period):
+    """True if upstream can't serve `interval` bars as far back as `period`."""
+    cap = MAX_FETCH_PERIOD.get(source_interval(interval, period))
+    return cap is not None and period_days(period) > period_days(cap)
+
+
+def _adjusted_since(stored, fetched, anchor):
+    """True if `fetched` re-prices the stored `anchor` bar, i.e. the history was re-adjusted."""
+    if anchor not in fetched.index:
+        return False
+    old = float(stored.at[anchor, 'Close'])
+    new = float(fetched.at[anchor, 'Close'])
+    return old != new and (not old or abs(new / old - 1) > ADJUSTMENT_TOLERANCE)
+
+
+def _bars_current(meta, period, interval):
+    if not meta or period_days(meta.get('period')) < period_days(period):
+        return False
+    return time.time() - meta['synced_at'] < BAR_TTL.get(interval, INTRADAY_BAR_TTL)
 
 
 class MarketService:
+    @staticmethod
+    def tracked_symbols():
+        """Distinct symbols anyone holds (quantity > 0) or watches – one UNION query."""
+        from portfolio.models import Portfolio
+        from trading.models import Watchlist
+
+        held = Portfolio.objects.filter(quantity__gt=0).values_list('stock_symbol', flat=True)
+        watched = Watchlist.objects.values_list('symbol', flat=True)
+        return sorted({s.upper() for s in held.union(watched)})
+
     @staticmethod
     def get_branding(symbol):
-        """Get logo_url and longName for a symbol, cached for 24h."""
-        import yfinance as yf
+        """Get logo_url and longName for a symbol (from the 24h fundamentals tier)."""
+        fundamentals = MarketService.get_fundamentals(symbol)
+        return {
+            "logo_url": fundamentals.get('logo_url', ''),
+            "long_name": fundamentals.get('long_name', ''),
+            "short_name": fundamentals.get('short_name', ''),
+        }
+
+    @staticmethod
+    def get_price_only(symbol):
+        """
+        Price/OHLC only (no ticker.info, no news), from the quote tier. Used by analytics.
+        When upstream is failing, the last-known-good quote comes back with stale/data_age.
+        """
+        quote, age = MarketService.get_quote_with_age(symbol)
+        if quote is None or not quote.get("stale"):
+            return quote
+        return {**quote, "data_age": round(age, 1)}
+
+    @staticmethod
+    def get_price_batch(symbols, refresh=False):
+        """
+        Price-only quotes for many symbols, keyed by symbol.
+        Cache hits come from the per-symbol `price_only_*` keys; every miss is
+        fetched in a single multi-ticker download and written back.
+        `refresh=True` ignores the cache and re-fetches everything (cache warmer).
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols if s))
+        if not symbols:
+            return {}
+
+        cached = {} if refresh else peek_many([f"price_only_{s}" for s in symbols])
+        quotes = {s: cached[f"price_only_{s}"] for s in symbols if f"price_only_{s}" in cached}
+        missing = [s for s in symbols if s not in quotes]
+
+        if missing:
+            try:
+                # 5 sessions so the previous close is always available for change %
+                raw = get_provider().download(missing, period="5d", interval="1d")
+            except Exception:
+                raw = None
+
+            fresh = {}
+            if raw is not None and not raw.empty:
+                for sym in missing:
+                    try:
+                        quote = _quote_from_history(sym, raw[sym].dropna(subset=['Close']))
+                    except Exception:
+                        continue
+                    if quote:
+                        quotes[sym] = fresh[sym] = quote
+            if fresh:
+                store_many({f"price_only_{sym}": quote for sym, quote in fresh.items()}, QUOTE_TTL[1])
+                snapshot_service.record_quotes(fresh)
+
+            # Upstream failed for the rest: last-known-good quotes, flagged stale
+            failed = [s for s in missing if s not in quotes]
+            if failed:
+                for sym, (quote, age) in snapshot_service.last_quotes(failed).items():
+                    quotes[sym] = {**quote, "data_age": round(age, 1)}
+
+        return {s: quotes[s] for s in symbols if s in quotes}
+
+    @staticmethod
+    def get_quote(symbol):
+        """
+        Latest price/OHLC/change only (no ticker.info, no news).
+        Fresh for 30 s, then served stale (max 2 min) while it refreshes.
+        """
+        return MarketService.get_quote_with_age(symbol)[0]
+
+    @staticmethod
+    def get_quote_with_age(symbol):
+        """
+        (quote, age_seconds). If upstream fails past the hard TTL, the
+        last-known-good quote is returned with "stale": True; (None, None)
+        only if the symbol was never fetched successfully.
+        """
         symbol = symbol.upper()
-        cache_key = f"branding_{symbol}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
+        soft_ttl, hard_ttl = QUOTE_TTL
+        quote, age = get_cached(
+            f"price_only_{symbol}",
+            lambda: MarketService._fetch_quote(symbol),
+            soft_ttl=soft_ttl, hard_ttl=hard_ttl,
+        )
+        if quote is None:
+            return snapshot_service.last_quote(symbol)
+        if age >= hard_ttl:
+            quote = {**quote, "stale": True}
+        return quote, age
 
+    @staticmethod
+    def _fetch_quote(symbol):
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info or {}
-            result = {
-                "logo_url": info.get('logo_url', ''),
-                "long_name": info.get('longName', ''),
-                "short_name": info.get('shortName', ''),
-            }
+            # Same 5 daily sessions get_price_batch downloads, so both writers of the
+            # quote tier agree (and the previous close is always there for change %)
+            quote = _quote_from_history(symbol, get_provider().history(symbol, period="5d"))
         except Exception:
-            result = {"logo_url": "", "long_name": "", "short_name": ""}
-
-        cache.set(cache_key, result, 86400)  # Cache 24 hours
-        return result
+            return None
+        if quote:
+            snapshot_service.record_quotes({symbol: quote})
+        return quote
 
     @staticmethod
-    def get_price_only(symbol):
-        """Fast method: only fetches price/OHLC. No ticker.info, no news. Used by analytics."""
-        import yfinance as yf
+    def get_fundamentals(symbol):
+        """Company profile and valuation fields from the slow ticker.info blob, cached for 24h."""
         symbol = symbol.upper()
-        cache_key = f"price_only_{symbol}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
+        return single_flight(f"fundamentals_{symbol}", lambda: MarketService._fetch_fundamentals(symbol), 86400) or {}
 
+    @staticmethod
+    def _fetch_fundamentals(symbol):
         try:
-            ticker = yf.Ticker(symbol)
-            data = ticker.fast_info  # fast_info is much faster than ticker.info
-            price = getattr(data, 'last_price', None) or getattr(data, 'previous_close', None)
-            if not price:
-                # fallback to history
-                hist = ticker.history(period="1d")
-                if hist.empty:
-                    return None
-                row = hist.iloc[-1]
-                price = float(row['Close'])
-                prev = float(hist.iloc[-2]['Close']) if len(hist) > 1 else price
-                change = price - prev
-                change_pct = (change / prev * 100) if prev else 0
-                result = {
-                    "symbol": symbol, "price": round(price, 2),
-                    "change": round(change, 2), "change_pct": round(change_pct, 2),
-                    "volume": int(row['Volume']), "high": round(float(row['High']), 2),
-                    "low": round(float(row['Low']), 2), "open": round(float(row['Open']), 2),
-                    "logo_url": "", "long_name": "", "short_name": "", "news": [],
-                }
-            else:
-                prev_close = getattr(data, 'previous_close', price) or price
-                change = price - prev_close
-                change_pct = (change / prev_close * 100) if prev_close else 0
-                result = {
-                    "symbol": symbol, "price": round(float(price), 2),
-                    "change": round(float(change), 2), "change_pct": round(float(change_pct), 2),
-                    "volume": int(getattr(data, 'three_month_average_volume', 0) or 0),
-                    "high": round(float(getattr(data, 'day_high', price) or price), 2),
-                    "low": round(float(getattr(data, 'day_low', price) or price), 2),
-                    "open": round(float(getattr(data, 'open', price) or price), 2),
-                    "logo_url": "", "long_name": "", "short_name": "", "news": [],
-                }
-            cache.set(cache_key, result, 120)  # 2 min cache
-            return result
+            info = get_provider().info(symbol)
         except Exception:
             return None
+        if not info:
+            return None
+        return {field: info.get(key, default) for field, key, default in FUNDAMENTAL_FIELDS}
+
+    @staticmethod
+    def get_news(symbol):
+        """Merged yfinance + RSS headlines, newest first. Cached 3 min."""
+        symbol = symbol.upper()
+        return get_cached(f"news_{symbol}", lambda: MarketService._fetch_news(symbol), soft_ttl=180, hard_ttl=900)[0] or []
+
+    @staticmethod
+    def _fetch_news(symbol, max_items=15):
+        provider = get_provider()
+        try:
+            yf_news = _parse_yf_news(provider.news(symbol)[:10])
+        except Exception:
+            yf_news = []
+        try:
+            rss_news = provider.rss_news(symbol, max_items=10)
+        except Exception:
+            rss_news = []
+
+        seen_titles, merged = set(), []
+        for article in (yf_news + rss_news):
+            key = article.get('title', '')[:60].lower().strip()
+            if key and key not in seen_titles:
+                seen_titles.add(key)
+                merged.append(article)
+            if len(merged) >= max_items:
+                break
+        merged.sort(key=lambda x: x.get('providerPublishTime') or 0, reverse=True)
+        return merged
 
     @staticmethod
     def get_live_data(symbol, fetch_news=True):
-        import yfinance as yf
+        """
+        Quote + fundamentals (+ news) assembled at response time. Each tier has
+        its own cache entry and TTL, so a price refresh never pays for
+        ticker.info or the RSS feeds. `data_age` is the age of the quote.
+        """
+        symbol = symbol.upper()
+        quote, age = MarketService.get_quote_with_age(symbol)
+        if not quote:
+            return None
+        return {
+            **quote,
+            **MarketService.get_fundamentals(symbol),
+            "news": MarketService.get_news(symbol)[:12] if fetch_news else [],
+            "data_age": round(age, 1),
+            "stale": quote.get("stale", False),
+        }
+
+    @staticmethod
+    def get_bars(symbol, period="1mo", interval="1d"):
+        """
+        OHLCV DataFrame (yfinance history() shape) for the trailing `period`,
+        read from the local bar store and re-synced from the provider when stale.
+        Intervals in DERIVED_FROM are resampled from their base series, so e.g.
+        15m and 1h charts share a single 5m download (see source_interval).
+        """
         symbol = symbol.upper()
-        # Always use the same cache key – news is just extra data layered on top
-        cache_key = f"live_price_{symbol}"
-        cached_data = cache.get(cache_key)
+        store = BarStore()
+        if source_interval(interval, period) != interval:
+            return MarketService._derived_bars(store, symbol, period, interval)
 
-        if cached_data:
-            return cached_data
+        MarketService._ensure_bars(store, symbol, period, interval)
+        df = store.read(symbol, interval, period)
+        return df if df is not None and not df.empty else None
 
-        try:
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period="1d")
+    @staticmethod
+    def get_bar_tail(symbol, since, period="1mo", interval="1d"):
+        """
+        (bars, base): the bars get_bars() would end with from `since` (UTC epoch ns)
+        on, read without loading the rest of the stored series, or get_bars() itself
+        when `since` is None. `base` names the stored series' last full rewrite;
+        it changes when upstream re-adjusts the history.
+        """
+        symbol = symbol.upper()
+        store = BarStore()
+        source = source_interval(interval, period)
+        MarketService._ensure_bars(store, symbol, period, source)
+        # meta before bars: a rewrite in between then shows up as a changed base next time
+        base = (store.read_meta(symbol, source) or {}).get('base')
+        if since is None:
+            df = MarketService.get_bars(symbol, period=period, interval=interval)
+        else:
+            df = store.read(symbol, source, since=since)
+            if df is not None and source != interval:
+                df = resample_bars(df, interval)  # `since` is a bin start, so bins line up
+        return (df if df is not None and not df.empty else None), base
 
-            if data.empty:
+    @staticmethod
+    def get_bars_many(symbols, period="1mo", interval="1d", max_workers=8):
+        """{symbol: get_bars(...)} for several symbols, syncing cold ones concurrently."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        if not symbols:
+            return {}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(symbols)))) as executor:
+            frames = executor.map(lambda s: MarketService.get_bars(s, period=period, interval=interval), symbols)
+            return dict(zip(symbols, frames))
+
+    @staticmethod
+    def _ensure_bars(store, symbol, period, interval):
+        period = min(period, MAX_FETCH_PERIOD.get(interval, period), key=period_days)
+        if not _bars_current(store.read_meta(symbol, interval), period, interval):
+            key = f"bars:{symbol}:{interval}"
+            # Threads of this process queue on the process lock; other workers (and the
+            # cache warmer) on the cluster lock, so one writer syncs a series at a time
+            with process_lock(key), cluster_lock(key, timeout=SYNC_LOCK_TIMEOUT) as acquired:
+                # Re-check: another worker may have synced while we waited
+                meta = store.read_meta(symbol, interval)
+                if acquired and not _bars_current(meta, period, interval):
+                    MarketService._sync_bars(store, symbol, period, interval, meta)
+
+    @staticmethod
+    def _derived_bars(store, symbol, period, interval):
+        base = DERIVED_FROM[interval]
+        MarketService._ensure_bars(store, symbol, period, base)
+        meta = store.read_meta(symbol, base)
+        if not meta:
+            return None
+
+        # Resample the whole stored base once per generation; every period is a slice of it
+        frames = _get_derived_frames()
+        key = f"{symbol}:{interval}"
+        df = frames.get(key, meta['generation'])
+        if df is None:
+            base_df = store.read(symbol, base)
+            if base_df is None:
                 return None
+            df = resample_bars(base_df, interval)
+            frames.set(key, df, meta['generation'])
+        df = slice_period(df, period)
+        return df.copy() if not df.empty else None
 
-            latest = data.iloc[-1]
-            info = ticker.info or {}
-            prev_close = info.get('previousClose', float(latest['Close']))
-            change = float(latest['Close']) - prev_close
-            change_pct = (change / prev_close) * 100 if prev_close else 0
-
-            merged_news = []
-            if fetch_news:
-                yf_news = _parse_yf_news(ticker.news[:8] if ticker.news else [])
-                rss_news = _fetch_rss_news(symbol, max_items=8)
-                seen_titles = set()
-                for article in (yf_news + rss_news):
-                    key = article.get('title', '')[:60].lower().strip()
-                    if key and key not in seen_titles:
-                        seen_titles.add(key)
-                        merged_news.append(article)
-                    if len(merged_news) >= 12:
-                        break
-                merged_news.sort(key=lambda x: x.get('providerPublishTime') or 0, reverse=True)
-
-            result = {
-                "symbol": symbol,
-                "price": round(float(latest['Close']), 2),
-                "change": round(float(change), 2),
-                "change_pct": round(float(change_pct), 2),
-                "volume": int(latest['Volume']),
-                "high": round(float(latest['High']), 2),
-                "low": round(float(latest['Low']), 2),
-                "open": round(float(latest['Open']), 2),
-                "logo_url": info.get('logo_url', ''),
-                "long_name": info.get('longName', ''),
-                "short_name": info.get('shortName', ''),
-                "summary": info.get('longBusinessSummary', ''),
-                "sector": info.get('sector', ''),
-                "industry": info.get('industry', ''),
-                "market_cap": info.get('marketCap'),
-                "pe_ratio": info.get('trailingPE'),
-                "eps": info.get('trailingEps'),
-                "dividend_yield": info.get('dividendYield'),
-                "beta": info.get('beta'),
-                "target_mean_price": info.get('targetMeanPrice'),
-                "target_high_price": info.get('targetHighPrice'),
-                "target_low_price": info.get('targetLowPrice'),
-                "recommendation": info.get('recommendationKey', ''),
-                "number_of_analysts": info.get('numberOfAnalystOpinions'),
-                "news": merged_news,
-            }
+    @staticmethod
+    def _sync_bars(store, symbol, period, interval, meta):
+        import pandas as pd
 
-            cache.set(cache_key, result, 300)  # 5 min cache
-            return result
+        provider = get_provider()
+        try:
+            if meta and meta.get('hwm') and period_days(meta.get('period')) >= period_days(period):
+                # Incremental: only fetch from the bar before the high-water mark onwards. The
+                # last stored bar may have been a partial one, so the overlap is replaced; the
+                # one before it is complete, so a different close there means upstream has
+                # re-adjusted the history (split, dividend) and everything is refetched.
+                hwm = pd.Timestamp(meta['hwm'], unit='ns', tz='UTC').tz_convert(meta['tz'])
+                recent = store.read(symbol, interval, '5d')
+                anchor = recent.index[-2] if recent is not None and len(recent) > 1 else hwm
+                df = provider.history(symbol, start=anchor.strftime('%Y-%m-%d'), interval=interval)
+                if df.empty:
+                    store.touch(symbol, interval)  # nothing new (weekend, holiday)
+                    return
+                df = df.tz_convert(meta['tz'])
+                if recent is None or not _adjusted_since(recent, df, anchor):
+                    store.append(symbol, interval, df)
+                    return
+
+            # Full fetch: never shrink what is stored, and fetch at least the per-interval minimum
+            candidates = [period, MIN_FETCH_PERIOD.get(interval, period), (meta or {}).get('period', period)]
+            fetch_period = max(candidates, key=period_days)
+            df = provider.history(symbol, period=fetch_period, interval=interval)
+            if not df.empty:
+                store.write(symbol, interval, df, period=fetch_period)
         except Exception:
-            return None
+            return  # keep serving whatever is stored
 
+    @staticmethod
+    def get_historical_data(symbol, period="1mo", interval="1d", max_points=None):
+        """
+        OHLCV records for the trailing `period`. With `max_points`, runs of bars
+        are merged into at most that many OHLC buckets (see downsample), cached
+        per (symbol, period, interval, max_points).
+        """
+        if max_points:
+            symbol = symbol.upper()
+            data, _ = get_cached(
+                f"history_{symbol}_{period}_{interval}_{max_points}",
+                lambda: MarketService._build_historical_data(symbol, period, interval, max_points),
+                soft_ttl=600, hard_ttl=21600,
+            )
+            return data
+        return MarketService._build_historical_data(symbol, period, interval)
 
     @staticmethod
-    def get_historical_data(symbol, period="1mo", interval="1d"):
-        import yfinance as yf
-        ticker = yf.Ticker(symbol.upper())
-        data = ticker.history(period=period, interval=interval)
-        
-        if data.empty:
+    def _build_historical_data(symbol, period, interval, max_points=None):
+        data = MarketService.get_bars(symbol, period=period, interval=interval)
+        if data is None:
             return None
-            
+        if max_points:
+            from .downsample import downsample_bars
+
+            data = downsample_bars(data, max_points)
+
         return data.reset_index().to_dict(orient='records')
 
     @staticmethod
-    def get_ohlc_with_indicators(symbol, period="3mo", interval="1d"):
-        """Return OHLC data with EMA(20) and RSI(14) time-series for charting."""
-        import yfinance as yf
-        import pandas as pd
-        
+    def get_ohlc_with_indicators(symbol, period="3mo", interval="1d", columnar=False, studies=None, max_points=None):
+        """
+        Return OHLC data with indicator time-series for charting: EMA(20) and
+        RSI(14) by default, or any parsed study set (see indicator_graph).
+        `columnar=True` returns parallel arrays ({"t": [...], "o": [...], ...})
+        instead of one {"x", "y"} object per point – a much smaller payload.
+        `max_points` merges bars into at most that many OHLC buckets (see downsample).
+        """
+        from .indicator_graph import parse_set, set_key
+
         symbol = symbol.upper()
-        cache_key = f"ohlc_indicators_{symbol}_{period}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-
-        ticker = yf.Ticker(symbol)
-        df = ticker.history(period=period, interval=interval)
-        
-        if df.empty or len(df) < 20:
+        studies = studies or parse_set(DEFAULT_CHART_SET)
+        suffix = "_columnar" if columnar else ""
+        if interval != "1d":
+            suffix += f"_{interval}"
+        if set_key(studies) != DEFAULT_CHART_SET:
+            suffix += f"_{set_key(studies)}"
+        if max_points:
+            suffix += f"_{max_points}pts"
+        # Fresh for 10 min, then served stale (max 6 h) while it refreshes
+        data, age = get_cached(
+            f"ohlc_indicators_{symbol}_{period}{suffix}",
+            lambda: MarketService._build_ohlc_with_indicators(symbol, period, interval, columnar, studies, max_points),
+            soft_ttl=600, hard_ttl=21600,
+        )
+        return {**data, "data_age": round(age, 1)} if data else None
+
+    @staticmethod
+    def _build_ohlc_with_indicators(symbol, period, interval, columnar=False, studies=(), max_points=None):
+        import numpy as np
+        from .downsample import bucket_starts, downsample_bars, sample_series
+        from .indicator_service import IndicatorService
+
+        df = MarketService.get_bars(symbol, period=period, interval=interval)
+        if df is None or len(df) < 20:
             return None
 
-        # EMA 20
-        df['EMA_20'] = df['Close'].ewm(span=20, adjust=False).mean()
-        
-        # RSI 14
-        delta = df['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI_14'] = 100 - (100 / (1 + rs))
-
-        # OHLC for candlestick
-        ohlc = []
-        ema_series = []
-        rsi_series = []
-
-        for idx, row in df.iterrows():
-            ts = int(idx.timestamp() * 1000)  # millisecond timestamp
-            ohlc.append({
-                "x": ts,
-                "y": [
-                    round(float(row['Open']), 2),
-                    round(float(row['High']), 2),
-                    round(float(row['Low']), 2),
-                    round(float(row['Close']), 2),
-                ]
-            })
-            ema_val = round(float(row['EMA_20']), 2) if not pd.isna(row['EMA_20']) else None
-            ema_series.append({"x": ts, "y": ema_val})
-
-            rsi_val = round(float(row['RSI_14']), 2) if not pd.isna(row['RSI_14']) else None
-            rsi_series.append({"x": ts, "y": rsi_val})
-
-        # Volume series
-        volume_series = []
-        for idx, row in df.iterrows():
-            ts = int(idx.timestamp() * 1000)
-            volume_series.append({
-                "x": ts,
-                "y": int(row['Volume']),
-                "fillColor": '#10b981' if row['Close'] >= row['Open'] else '#ef4444'
-            })
-
-        # Fundamentals
-        info = ticker.info or {}
+        # Indicator series from the shared compute graph (cached per study), computed on
+        # every bar and then read at each bucket's close when downsampling
+        indicators = IndicatorService.calculate_studies(symbol, studies, period, interval)
+        starts = bucket_starts(len(df), max_points)
+        indicators = {name: sample_series(values, starts, len(df)) for name, values in indicators.items()}
+        df = downsample_bars(df, max_points)
+
+        # Column-wise conversion: one NumPy op per column instead of per-row Python work
+        ts = (df.index.asi8 // 1_000_000).tolist()  # UTC ns → ms timestamps
+        opens, highs, lows, closes = (
+            np.round(df[col].to_numpy(dtype='float64'), 2).tolist() for col in ('Open', 'High', 'Low', 'Close')
+        )
+        volumes = df['Volume'].to_numpy(dtype='int64').tolist()
+
+        if columnar:
+            series = {
+                "format": "columnar",
+                "t": ts, "o": opens, "h": highs, "l": lows, "c": closes, "v": volumes,
+                **indicators,
+            }
+        else:
+            colors = np.where(df['Close'].to_numpy() >= df['Open'].to_numpy(), '#10b981', '#ef4444').tolist()
+            series = {
+                # OHLC for candlestick
+                "ohlc": [{"x": t, "y": [o, h, l, c]} for t, o, h, l, c in zip(ts, opens, highs, lows, closes)],
+                **{name: [{"x": t, "y": v} for t, v in zip(ts, values)] for name, values in indicators.items()},
+                # Volume series
+                "volume": [{"x": t, "y": v, "fillColor": c} for t, v, c in zip(ts, volumes, colors)],
+            }
+
+        # Fundamentals (24h tier, shared with live data)
+        info = MarketService.get_fundamentals(symbol)
 
         result = {
             "symbol": symbol,
-            "ohlc": ohlc,
-            "ema_20": ema_series,
-            "rsi_14": rsi_series,
-            "volume": volume_series,
+            **series,
+            # Upstream keeps less history at this bar size than `period` asks for
+            "truncated": is_truncated(interval, period),
             "current_price": round(float(df.iloc[-1]['Close']), 2),
             # Branding
             "logo_url": info.get('logo_url', ''),
-            "long_name": info.get('longName', ''),
-            "short_name": info.get('shortName', ''),
+            "long_name": info.get('long_name', ''),
+            "short_name": info.get('short_name', ''),
             # Fundamentals
-            "target_mean_price": info.get('targetMeanPrice'),
-            "target_high_price": info.get('targetHighPrice'),
-            "target_low_price": info.get('targetLowPrice'),
-            "dividend_yield": info.get('dividendYield'),
+            "target_mean_price": info.get('target_mean_price'),
+            "target_high_price": info.get('target_high_price'),
+            "target_low_price": info.get('target_low_price'),
+            "dividend_yield": info.get('dividend_yield'),
             "beta": info.get('beta'),
-            "pe_ratio": info.get('trailingPE'),
-            "market_cap": info.get('marketCap'),
-            "fifty_two_week_high": info.get('fiftyTwoWeekHigh'),
-            "fifty_two_week_low": info.get('fiftyTwoWeekLow'),
-            "recommendation": info.get('recommendationKey'),
+            "pe_ratio": info.get('pe_ratio'),
+            "market_cap": info.get('market_cap'),
+            "fifty_two_week_high": info.get('fifty_two_week_high'),
+            "fifty_two_week_low": info.get('fifty_two_week_low'),
+            "recommendation": info.get('recommendation'),
         }
-
-        cache.set(cache_key, result, 600)  # Cache 10 min
         return result
 
     @staticmethod
     def get_sparkline(symbol, period="1mo"):
         """Return simple close price series for sparklines."""
-        import yfinance as yf
-        
+        return MarketService.get_sparkline_with_age(symbol, period)[0]
+
+    @staticmethod
+    def get_sparkline_with_age(symbol, period="1mo", refresh=False):
+        """
+        (prices, data_age_seconds) – fresh for 10 min, served stale (max 6 h) while it
+        refreshes. Ages past the hard TTL (SPARKLINE_TTL[1]) are last-known-good data.
+        """
         symbol = symbol.upper()
-        cache_key = f"sparkline_{symbol}_{period}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
+        soft_ttl, hard_ttl = SPARKLINE_TTL
+        prices, age = get_cached(
+            f"sparkline_{symbol}_{period}",
+            lambda: MarketService._fetch_sparkline(symbol, period),
+            soft_ttl=soft_ttl, hard_ttl=hard_ttl, force=refresh,
+        )
+        if not prices and period == snapshot_service.SPARKLINE_PERIOD:
+            return snapshot_service.last_sparkline(symbol)
+        return (prices or []), age
 
-        ticker = yf.Ticker(symbol)
-        df = ticker.history(period=period)
-        
-        if df.empty:
-            return []
+    @staticmethod
+    def _fetch_sparkline(symbol, period):
+        df = MarketService.get_bars(symbol, period=period)
+        if df is None:
+            return None
 
         prices = [round(float(c), 2) for c in df['Close'].tolist()]
-        cache.set(cache_key, prices, 600)
+        if period == snapshot_service.SPARKLINE_PERIOD:
+            snapshot_service.record_sparkline(symbol, prices)
         return prices
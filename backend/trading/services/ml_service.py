@@ -1,47 +1,242 @@
-import random
+"""
+Trend model: features, versioned artifacts, a per-process registry and
+batch inference.
+
+train_trend_model fits a gradient-boosted classifier offline, on CPU and
+from the local bar store, that predicts whether a symbol closes higher
+HORIZON bars out. Each run writes trend-<version>.joblib plus a JSON manifest
+to settings.ML_MODEL_DIR. It then atomically swaps latest.json to point at
+them, the same way the bar store swaps meta.json. Each worker process loads
+the model once through the registry and picks up a newer version within
+CHECK_INTERVAL seconds.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from .cache_service import peek_many, store_many
 from .indicator_service import IndicatorService
-from django.core.cache import cache
+
+HORIZON = 7
+FEATURES = (
+    'rsi_14', 'macd_hist_pct', 'ema_20_gap', 'sma_50_gap', 'bb_pct_b',
+    'atr_pct', 'return_5', 'return_20', 'volatility_20',
+)
+FEATURE_SET = "rsi:14,macd:12:26:9,ema:20,sma:50,bb:20:2,atr:14"
+INFERENCE_PERIOD = "1y"  # long enough for the EMAs to settle as they do in training
+PREDICTION_TTL = 3600
+CHECK_INTERVAL = 60      # seconds between latest.json checks per process
+BULLISH_ABOVE = 0.55     # P(higher) thresholds for the trend label
+BEARISH_BELOW = 0.45
+
+
+def build_features(graph):
+    """
+    Feature tensor for every bar of an IndicatorGraph: shape (T, F) for a
+    single series or (T, N, F) for a panel, in FEATURES order. NaN where a
+    window isn't filled yet (the model handles missing values).
+    """
+    import numpy as np
+    from .indicator_graph import parse_set, rolling_std
+
+    close = graph.inputs['close']
+    out = graph.evaluate(parse_set(FEATURE_SET))
+
+    def lagged(x, n):
+        return np.concatenate([np.full((n,) + x.shape[1:], np.nan), x[:-n]])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        band = out['bb_upper_20_2'] - out['bb_lower_20_2']
+        columns = [
+            out['rsi_14'] / 100,
+            out['macd_hist_12_26_9'] / close,
+            close / out['ema_20'] - 1,
+            close / out['sma_50'] - 1,
+            np.where(band > 0, (close - out['bb_lower_20_2']) / band, 0.5),
+            out['atr_14'] / close,
+            close / lagged(close, 5) - 1,
+            close / lagged(close, 20) - 1,
+            rolling_std(close / lagged(close, 1) - 1, 20),
+        ]
+    return np.stack(columns, axis=-1)
+
+
+def forward_labels(close, horizon=HORIZON):
+    """1.0 where the close `horizon` bars later is higher, 0.0 if not, NaN where unknown."""
+    import numpy as np
+
+    future = np.concatenate([close[horizon:], np.full((horizon,) + close.shape[1:], np.nan)])
+    with np.errstate(invalid='ignore'):
+        return np.where(np.isnan(future) | np.isnan(close), np.nan, (future > close).astype(float))
+
+
+def holdout_split(dates, holdout, horizon=HORIZON):
+    """
+    (train, test) boolean masks over epoch-ns `dates`: test is the most recent
+    `holdout` fraction. The `horizon` sessions before it are dropped from
+    train (an embargo), since their forward labels look into the test period.
+    """
+    import numpy as np
+
+    sessions = np.unique(dates)
+    first_test = int(np.searchsorted(sessions, np.quantile(dates, 1 - holdout)))
+    if first_test >= len(sessions):
+        return np.zeros(len(dates), dtype=bool), np.zeros(len(dates), dtype=bool)
+    test = dates >= sessions[first_test]
+    train = dates < sessions[max(0, first_test - horizon)]
+    return train, test
+
+
+def save_model(model, manifest, root=None):
+    """Write a versioned artifact + manifest, then point latest.json at it."""
+    import joblib
+
+    root = Path(root or settings.ML_MODEL_DIR)
+    root.mkdir(parents=True, exist_ok=True)
+    version = manifest['version']
+    manifest = {**manifest, 'artifact': f'trend-{version}.joblib'}
+    joblib.dump(model, root / manifest['artifact'])
+    with open(root / f'trend-{version}.json', 'w') as fh:
+        json.dump(manifest, fh, indent=2)
+    tmp = root / f'latest.json.{version}.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp, root / 'latest.json')
+    return manifest
+
+
+class ModelRegistry:
+    """Per-process holder of the latest trained model; loads each version once."""
+
+    def __init__(self, root=None):
+        self.root = Path(root or settings.ML_MODEL_DIR)
+        self._lock = threading.Lock()
+        self._model = None
+        self._manifest = None
+        self._checked_at = float('-inf')
+
+    def get(self):
+        """(model, manifest), or (None, None) if nothing has been trained yet."""
+        if time.monotonic() - self._checked_at >= CHECK_INTERVAL:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= CHECK_INTERVAL:
+                    self._reload()
+                    self._checked_at = time.monotonic()
+        return self._model, self._manifest
+
+    def _reload(self):
+        import joblib
+
+        try:
+            with open(self.root / 'latest.json') as fh:
+                manifest = json.load(fh)
+        except (OSError, ValueError):
+            return
+        if self._manifest and manifest.get('version') == self._manifest.get('version'):
+            return
+        try:
+            model = joblib.load(self.root / manifest['artifact'])
+        except (OSError, KeyError, ValueError):
+            return  # keep serving the previous version
+        self._model, self._manifest = model, manifest
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+
+def _label(probability):
+    if probability >= BULLISH_ABOVE:
+        return "Bullish"
+    if probability <= BEARISH_BELOW:
+        return "Bearish"
+    return "Neutral"
+
+
+def _forecast(trend):
+    return "Higher" if trend == "Bullish" else ("Lower" if trend == "Bearish" else "Stable")
+
+
+def _rule_based(indicators):
+    """RSI/MACD heuristic used until a model has been trained."""
+    rsi, macd = indicators['RSI'], indicators['MACD']
+    trend = "Neutral"
+    if rsi and rsi < 40:
+        trend = "Bullish"
+    elif rsi and rsi > 60:
+        trend = "Bearish"
+    if macd and macd > 0:
+        trend = "Bullish" if trend != "Bearish" else "Neutral"
+    return {
+        "symbol": indicators["symbol"],
+        "trend": trend,
+        "confidence_score": None,
+        "forecast_7d": _forecast(trend),
+        "model_type": "Rule-based (no trained model)",
+        "accuracy": None,
+    }
+
 
 class MLService:
     @staticmethod
     def predict_trend(symbol):
-        symbol = symbol.upper()
-        cache_key = f"prediction_{symbol}"
-        cached_pred = cache.get(cache_key)
-        
-        if cached_pred:
-            return cached_pred
-
-        indicators = IndicatorService.calculate_indicators(symbol)
-        if not indicators:
-            return None
-            
-        # Mock ML logic based on indicators
-        rsi = indicators['RSI']
-        macd = indicators['MACD']
-        
-        trend = "Neutral"
-        confidence = random.uniform(60, 85)
-        
-        if rsi and rsi < 40:
-            trend = "Bullish"
-        elif rsi and rsi > 60:
-            trend = "Bearish"
-            
-        if macd and macd > 0:
-            trend = "Bullish" if trend != "Bearish" else "Neutral"
-            
-        # Mock 7-day forecast
-        # In a real app, this would use a saved .pkl model (LSTM/Regression)
-        result = {
-            "symbol": symbol.upper(),
-            "trend": trend,
-            "confidence_score": round(confidence, 2),
-            "forecast_7d": "Higher" if trend == "Bullish" else ("Lower" if trend == "Bearish" else "Stable"),
-            "model_type": "RandomForestRegressor (Mock)",
-            "accuracy": "82.4%"
-        }
-        
-        # Cache prediction for 1 hour
-        cache.set(cache_key, result, 3600)
-        return result
+        return MLService.predict_batch([symbol]).get(symbol.upper())
+
+    @staticmethod
+    def predict_batch(symbols):
+        """
+        {symbol: prediction} for a whole watchlist: cache hits are served
+        as-is, and every miss is scored in one vectorized predict_proba call.
+        Symbols without enough history are omitted.
+        """
+        from .indicator_graph import IndicatorGraph
+
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        model, manifest = get_registry().get()
+        version = manifest['version'] if manifest else 'rules'
+        keys = {s: f"prediction_{s}_{version}" for s in symbols}
+        cached = peek_many(list(keys.values()))
+        results = {s: cached[keys[s]] for s in symbols if keys[s] in cached}
+        missing = [s for s in symbols if s not in results]
+        if not missing:
+            return results
+
+        fresh = {}
+        if model is None:
+            for symbol, indicators in IndicatorService.calculate_indicators_batch(missing).items():
+                fresh[symbol] = _rule_based(indicators)
+        else:
+            names, close, high, low = IndicatorService.load_matrices(missing, period=INFERENCE_PERIOD)
+            if names:
+                latest = build_features(IndicatorGraph(close, high, low))[-1]  # (N, F)
+                up = model.predict_proba(latest)[:, list(model.classes_).index(1.0)]
+                accuracy = manifest.get('holdout_accuracy')
+                for symbol, probability in zip(names, up.tolist()):
+                    trend = _label(probability)
+                    fresh[symbol] = {
+                        "symbol": symbol,
+                        "trend": trend,
+                        "confidence_score": round(max(probability, 1 - probability) * 100, 2),
+                        "probability_up": round(probability, 4),
+                        "forecast_7d": _forecast(trend),
+                        "model_type": manifest['model_type'],
+                        "model_version": version,
+                        "accuracy": f"{accuracy * 100:.1f}%" if accuracy is not None else None,
+                    }
+
+        store_many({keys[s]: value for s, value in fresh.items()}, PREDICTION_TTL)
+        results.update(fresh)
+        return results
@@ -0,0 +1,88 @@
+"""
+Panel-wide indicator engine.
+
+Computes every indicator IndicatorService.calculate_indicators reports for a
+whole universe in one pass: inputs are (time × symbol) close/high/low
+matrices, evaluated along axis 0 by the shared IndicatorGraph. Symbols with
+a shorter history are left-padded with NaN. A single symbol is just a
+one-column panel.
+"""
+import numpy as np
+
+from .indicator_graph import IndicatorGraph, parse_set
+
+# The fixed study set behind calculate_indicators(), and its output names
+STANDARD_SET = parse_set("sma:14,sma:50,ema:14,ema:20,rsi:14,macd:12:26:9,bb:20:2,atr:14")
+STANDARD_FIELDS = {
+    'RSI': 'rsi_14',
+    'MACD': 'macd_12_26_9',
+    'Signal_Line': 'macd_signal_12_26_9',
+    'MACD_Histogram': 'macd_hist_12_26_9',
+    'SMA_14': 'sma_14',
+    'SMA_50': 'sma_50',
+    'EMA_14': 'ema_14',
+    'EMA_20': 'ema_20',
+    'BB_Upper': 'bb_upper_20_2',
+    'BB_Middle': 'bb_middle_20_2',
+    'BB_Lower': 'bb_lower_20_2',
+    'ATR': 'atr_14',
+}
+# Latest-value fields, in calculate_indicators() order
+INDICATOR_FIELDS = tuple(STANDARD_FIELDS)
+
+
+def compute_panel(close, high, low):
+    """
+    Full indicator time series for a panel. Returns {name: (T × N) array}
+    with the INDICATOR_FIELDS plus 'Close'.
+    """
+    graph = IndicatorGraph(close, high, low)
+    outputs = graph.evaluate(STANDARD_SET)
+    return {'Close': graph.inputs['close'], **{name: outputs[key] for name, key in STANDARD_FIELDS.items()}}
+
+
+def latest_values(panel, row=-1):
+    """{name: (N,) array} of one row (default: the last bar) of compute_panel() output."""
+    return {name: series[row] for name, series in panel.items()}
+
+
+def signals(rsi, macd):
+    """Vectorised calculate_indicators() signal rule over rounded RSI/MACD arrays."""
+    with np.errstate(invalid='ignore'):
+        has_rsi = ~np.isnan(rsi) & (rsi != 0)
+        return np.select(
+            [
+                has_rsi & (rsi < 30),
+                has_rsi & (rsi > 70),
+                has_rsi & (rsi < 45) & (macd > 0),
+                has_rsi & (rsi > 55) & (macd < 0),
+            ],
+            ['OVERSOLD', 'OVERBOUGHT', 'BULLISH', 'BEARISH'],
+            default='NEUTRAL',
+        )
+
+
+def latest_table(symbols, latest):
+    """
+    Per-symbol dicts shaped exactly like calculate_indicators() output,
+    built from latest_values(): values rounded to 2dp, NaN → None.
+    """
+    rounded = {name: np.round(latest[name], 2) for name in INDICATOR_FIELDS}
+    signal = signals(rounded['RSI'], rounded['MACD'])
+    with np.errstate(invalid='ignore'):
+        above = latest['Close'] > latest['EMA_20']
+
+    columns = {}
+    for name, values in rounded.items():
+        column = values.astype(object)
+        column[np.isnan(values)] = None
+        columns[name] = column.tolist()
+
+    table = {}
+    for i, symbol in enumerate(symbols):
+        row = {"symbol": symbol}
+        row.update({name: columns[name][i] for name in INDICATOR_FIELDS})
+        row["signal"] = str(signal[i])
+        row["price_vs_ema20"] = "ABOVE" if above[i] else "BELOW"
+        table[symbol] = row
+    return table
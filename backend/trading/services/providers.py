@@ -0,0 +1,372 @@
+"""
+Pluggable market data providers.
+
+Every upstream call MarketService makes goes through the provider named by
+settings.MARKET_DATA_PROVIDER (constructed with MARKET_DATA_PROVIDER_OPTIONS):
+
+* YFinanceProvider – live data from Yahoo Finance (default).
+* ReplayProvider   – recorded history/info/news fixtures from local files, or
+  deterministic GBM bars when a symbol has no recording, with optional
+  injected latency. Lets the API be benchmarked and load-tested repeatably
+  on a machine with no network (see `manage.py record_market_fixtures`).
+
+YFinanceProvider's network calls, and the RSS feed requests, go through
+upstream.call() (shared rate limit + per-host circuit breaker).
+
+All history frames use the yfinance history() shape: Open/High/Low/Close/
+Volume columns on a tz-aware DatetimeIndex named Date or Datetime.
+"""
+import json
+import random
+import time
+import zlib
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import upstream
+from .upstream import YAHOO, guarded
+
+FAST_INFO_FIELDS = ('last_price', 'previous_close', 'open', 'day_high', 'day_low', 'three_month_average_volume')
+
+_provider = None
+
+
+class EmptyDownload(Exception):
+    """yf.download returned no bars for any requested symbol."""
+
+
+def get_provider():
+    """The configured provider instance (one per process)."""
+    global _provider
+    if _provider is None:
+        provider_class = import_string(getattr(settings, 'MARKET_DATA_PROVIDER', 'trading.services.providers.YFinanceProvider'))
+        _provider = provider_class(**getattr(settings, 'MARKET_DATA_PROVIDER_OPTIONS', {}))
+    return _provider
+
+
+def _fetch_rss_news(symbol, max_items=8):
+    """
+    Pull real-time financial news for `symbol` using free RSS feeds.
+    Sources: Yahoo Finance RSS, Seeking Alpha RSS, MarketWatch RSS.
+    Uses stdlib only (requests already in venv, xml.etree built-in).
+    """
+    import requests
+    import xml.etree.ElementTree as ET
+    from datetime import datetime, timezone
+    import time as _time
+    from email.utils import parsedate_to_datetime
+    from urllib.parse import urlsplit
+
+    FEEDS = [
+        # Yahoo Finance RSS (symbol-specific)
+        f"https://feeds.finance.yahoo.com/rss/2.0/headline?s={symbol}&region=US&lang=en-US",
+        # Seeking Alpha RSS
+        f"https://seekingalpha.com/api/sa/combined/{symbol}.xml",
+        # MarketWatch (general market news – good fallback)
+        "https://feeds.content.dowjones.io/public/rss/mw_realtimeheadlines",
+    ]
+
+    ns = {'atom': 'http://www.w3.org/2005/Atom'}
+    articles = []
+
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (compatible; StockPulseBot/1.0)',
+        'Accept': 'application/rss+xml,application/xml,text/xml;q=0.9,*/*;q=0.8',
+    }
+
+    def _get(url):
+        resp = requests.get(url, headers=headers, timeout=3)
+        if resp.status_code == 429 or resp.status_code >= 500:
+            resp.raise_for_status()  # throttled / down: counts against the host's breaker
+        return resp
+
+    for feed_url in FEEDS:
+        if len(articles) >= max_items:
+            break
+        try:
+            resp = upstream.call(urlsplit(feed_url).hostname, _get, feed_url)
+            if resp.status_code != 200:
+                continue
+
+            root = ET.fromstring(resp.content)
+
+            # RSS 2.0: channel/item
+            items = root.findall('.//item')
+            for item in items[:6]:
+                def _text(tag):
+                    el = item.find(tag)
+                    return el.text.strip() if el is not None and el.text else ''
+
+                title     = _text('title')
+                link      = _text('link') or _text('guid')
+                pub_date  = _text('pubDate')
+                publisher = _text('source') or feed_url.split('/')[2].replace('feeds.', '').replace('www.', '')
+                summary   = _text('description')
+
+                # Strip HTML from summary
+                if summary:
+                    import re
+                    summary = re.sub(r'<[^>]+>', '', summary).strip()[:300]
+
+                # Parse timestamp
+                ts = None
+                if pub_date:
+                    try:
+                        dt = parsedate_to_datetime(pub_date)
+                        ts = int(dt.timestamp())
+                    except Exception:
+                        ts = None
+                if not ts:
+                    ts = int(_time.time())
+
+                if title and link:
+                    articles.append({
+                        'title':               title,
+                        'summary':             summary,
+                        'publisher':           publisher,
+                        'link':                link,
+                        'providerPublishTime': ts,
+                        'thumbnail':           None,
+                        'source':              'rss',
+                    })
+
+        except Exception:
+            continue
+
+    # Sort by timestamp descending
+    articles.sort(key=lambda x: x.get('providerPublishTime') or 0, reverse=True)
+    return articles[:max_items]
+
+
+class MarketDataProvider:
+    """Interface every market data source implements."""
+
+    def history(self, symbol, period=None, interval='1d', start=None):
+        """OHLCV frame for `period` (or from `start` onwards) at `interval`."""
+        raise NotImplementedError
+
+    def download(self, symbols, period, interval='1d'):
+        """Several symbols at once: columns are a (symbol, field) MultiIndex."""
+        raise NotImplementedError
+
+    def fast_info(self, symbol):
+        """Dict with the FAST_INFO_FIELDS keys (values may be None)."""
+        raise NotImplementedError
+
+    def info(self, symbol):
+        """The ticker.info dict (company profile, valuation, analyst targets)."""
+        raise NotImplementedError
+
+    def news(self, symbol):
+        """Raw yfinance news items (see market_service._parse_yf_news)."""
+        raise NotImplementedError
+
+    def rss_news(self, symbol, max_items=8):
+        """Already-normalised RSS articles."""
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    @guarded(YAHOO)
+    def history(self, symbol, period=None, interval='1d', start=None):
+        import pandas as pd
+        import yfinance as yf
+        from yfinance.exceptions import YFTickerMissingError
+
+        # raise_errors: by default yfinance turns network errors and outages into an empty
+        # frame, which the circuit breaker would count as a success. An unknown or delisted
+        # symbol is still just "no data", not an upstream failure.
+        try:
+            if start is not None:
+                return yf.Ticker(symbol).history(start=start, interval=interval, raise_errors=True)
+            return yf.Ticker(symbol).history(period=period, interval=interval, raise_errors=True)
+        except YFTickerMissingError:
+            return pd.DataFrame()
+
+    @guarded(YAHOO)
+    def download(self, symbols, period, interval='1d'):
+        import yfinance as yf
+        import pandas as pd
+
+        symbols = list(symbols)
+        kwargs = {'period': period, 'interval': interval, 'group_by': 'ticker', 'progress': False, 'threads': False}
+        # For newer yfinance, auto_adjust might not be supported. Use kwargs.
+        try:
+            raw = yf.download(symbols, auto_adjust=True, **kwargs)
+        except TypeError:
+            raw = yf.download(symbols, **kwargs)
+        # yf.download never raises: errors and throttling come back as an empty (or all-NaN)
+        # frame. Raise so the circuit breaker counts it; one missing symbol is just NaN columns.
+        if symbols and (raw is None or raw.dropna(how='all').empty):
+            raise EmptyDownload(f"no bars for {len(symbols)} symbols")
+        if not isinstance(raw.columns, pd.MultiIndex):
+            raw = pd.concat({symbols[0]: raw}, axis=1)
+        return raw
+
+    @guarded(YAHOO)
+    def fast_info(self, symbol):
+        # Fields that fail come back as None, so an outage isn't a failure here; callers
+        # fall back to history(), which raises and so reaches the circuit breaker.
+        import yfinance as yf
+        data = yf.Ticker(symbol).fast_info  # fast_info is much faster than ticker.info
+        result = {}
+        for field in FAST_INFO_FIELDS:
+            try:
+                result[field] = getattr(data, field, None)
+            except Exception:
+                result[field] = None
+        return result
+
+    @guarded(YAHOO)
+    def info(self, symbol):
+        import yfinance as yf
+        return yf.Ticker(symbol).info or {}
+
+    @guarded(YAHOO)
+    def news(self, symbol):
+        import yfinance as yf
+        return yf.Ticker(symbol).news or []
+
+    def rss_news(self, symbol, max_items=8):
+        return _fetch_rss_news(symbol, max_items=max_items)
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Serves recorded responses from `fixtures_dir`:
+
+        <fixtures_dir>/<SYMBOL>/history_<interval>.csv   (Date/Datetime index + OHLCV)
+        <fixtures_dir>/<SYMBOL>/info.json
+        <fixtures_dir>/<SYMBOL>/news.json
+        <fixtures_dir>/<SYMBOL>/rss.json
+
+    Missing history is generated as geometric Brownian motion seeded from the
+    symbol and interval (plus `seed`), ending on `anchor` (ISO date, default
+    today), so every run sees the same bars. Each call first sleeps
+    `latency_ms` ± `jitter_ms` to mimic upstream round trips.
+    """
+
+    GBM_YEARS = 10            # daily bars generated per symbol
+    GBM_INTRADAY_DAYS = 60    # sessions generated for intraday intervals
+
+    def __init__(self, fixtures_dir=None, latency_ms=0, jitter_ms=0, seed=0, anchor=None):
+        self.fixtures_dir = Path(fixtures_dir) if fixtures_dir else None
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.seed = seed
+        self.anchor = anchor
+        self._frames = {}
+
+    def _sleep(self):
+        delay = self.latency_ms + (random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _fixture(self, symbol, name):
+        if self.fixtures_dir is None:
+            return None
+        path = self.fixtures_dir / symbol.upper() / name
+        return path if path.exists() else None
+
+    def _load_json(self, symbol, name, default):
+        path = self._fixture(symbol, name)
+        if path is None:
+            return default
+        with open(path) as fh:
+            return json.load(fh)
+
+    def _frame(self, symbol, interval):
+        import pandas as pd
+
+        key = (symbol.upper(), interval)
+        if key not in self._frames:
+            path = self._fixture(symbol, f'history_{interval}.csv')
+            if path is not None:
+                df = pd.read_csv(path, index_col=0)
+                df.index = pd.to_datetime(df.index, utc=True).tz_convert('America/New_York')
+                df.index.name = 'Date' if interval.endswith(('d', 'wk', 'mo')) else 'Datetime'
+            else:
+                df = self._generate_gbm(symbol.upper(), interval)
+            self._frames[key] = df
+        return self._frames[key]
+
+    def _generate_gbm(self, symbol, interval):
+        import numpy as np
+        import pandas as pd
+
+        rng = np.random.default_rng(zlib.crc32(f"{symbol}:{interval}:{self.seed}".encode()))
+        anchor = pd.Timestamp(self.anchor or pd.Timestamp.now(tz='America/New_York').date())
+        if interval.endswith(('d', 'wk', 'mo')):
+            days = pd.bdate_range(end=anchor, periods=self.GBM_YEARS * 252)
+            index = days.tz_localize('America/New_York')
+            steps_per_year = 252
+            name = 'Date'
+        else:
+            minutes = int(pd.Timedelta(interval.replace('m', 'min') if interval.endswith('m') else interval).total_seconds() // 60)
+            offsets = pd.to_timedelta(np.arange(9 * 60 + 30, 16 * 60, minutes), unit='min')
+            days = pd.bdate_range(end=anchor, periods=self.GBM_INTRADAY_DAYS)
+            stamps = (days.values[:, None] + offsets.values[None, :]).ravel()
+            index = pd.DatetimeIndex(stamps).tz_localize('America/New_York')
+            steps_per_year = 252 * len(offsets)
+            name = 'Datetime'
+
+        n = len(index)
+        mu, sigma, dt = 0.08, 0.30, 1 / steps_per_year
+        start_price = 20 + zlib.crc32(symbol.encode()) % 480
+        log_returns = (mu - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * rng.standard_normal(n)
+        close = start_price * np.exp(np.cumsum(log_returns))
+        open_ = np.concatenate([[start_price], close[:-1]])
+        spread = np.abs(rng.normal(0, sigma * np.sqrt(dt), n)) * close
+        df = pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) + spread,
+            'Low': np.minimum(open_, close) - spread,
+            'Close': close,
+            'Volume': rng.lognormal(13, 0.5, n).astype('int64'),
+        }, index=index)
+        df.index.name = name
+        return df
+
+    def history(self, symbol, period=None, interval='1d', start=None):
+        import pandas as pd
+        from .bar_store import slice_period
+
+        self._sleep()
+        df = self._frame(symbol, interval)
+        if start is not None:
+            return df[df.index >= pd.Timestamp(start, tz=df.index.tz)].copy()
+        return slice_period(df, period or '1mo').copy()
+
+    def download(self, symbols, period, interval='1d'):
+        import pandas as pd
+        from .bar_store import slice_period
+
+        self._sleep()
+        return pd.concat({s: slice_period(self._frame(s, interval), period) for s in symbols}, axis=1)
+
+    def fast_info(self, symbol):
+        self._sleep()
+        df = self._frame(symbol, '1d')
+        last, prev = df.iloc[-1], df.iloc[-2]
+        return {
+            'last_price': float(last['Close']),
+            'previous_close': float(prev['Close']),
+            'open': float(last['Open']),
+            'day_high': float(last['High']),
+            'day_low': float(last['Low']),
+            'three_month_average_volume': int(df['Volume'].iloc[-63:].mean()),
+        }
+
+    def info(self, symbol):
+        self._sleep()
+        return self._load_json(symbol, 'info.json', {'shortName': symbol.upper(), 'longName': symbol.upper()})
+
+    def news(self, symbol):
+        self._sleep()
+        return self._load_json(symbol, 'news.json', [])
+
+    def rss_news(self, symbol, max_items=8):
+        self._sleep()
+        return self._load_json(symbol, 'rss.json', [])[:max_items]
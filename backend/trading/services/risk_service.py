@@ -0,0 +1,143 @@
+"""
+Portfolio risk from a year of stored daily bars.
+
+One (day × symbol) returns matrix for the holdings plus the benchmark, one
+covariance matrix, and every metric from those with NumPy: portfolio
+variance is w'Σw, each holding's beta is its covariance with the benchmark
+over the benchmark's variance. Weights are the holdings' values at the last
+close, so the result depends only on the holdings and the date. It is cached
+under (holdings hash, date) and shared by every user holding the same
+positions.
+"""
+import hashlib
+from statistics import NormalDist
+
+from django.conf import settings
+
+from .analytics_service import TRADING_DAYS, annualize_volatility, daily_returns
+from .cache_service import get_cached
+from .market_service import MarketService
+
+RISK_PERIOD = "1y"
+CONFIDENCE = 0.95
+RISK_TTL = (3600, 86400)  # daily bars only move intraday through today's bar
+
+
+def value_at_risk(portfolio, mean, sigma, confidence=CONFIDENCE):
+    """One-day historical and parametric (normal) VaR / CVaR, as positive loss fractions."""
+    import numpy as np
+
+    cutoff = np.quantile(portfolio, 1 - confidence)
+    z = NormalDist().inv_cdf(confidence)
+    return {
+        "historical_var": float(-cutoff),
+        "historical_cvar": float(-portfolio[portfolio <= cutoff].mean()),
+        "parametric_var": float(z * sigma - mean),
+        "parametric_cvar": float(sigma * NormalDist().pdf(z) / (1 - confidence) - mean),
+    }
+
+
+def risk_metrics(returns, weights, benchmark=None, risk_free=0.0, confidence=CONFIDENCE):
+    """
+    Metrics for a (T, S) daily `returns` matrix held at `weights` (S,), with an
+    optional (T,) `benchmark` return series. Rates and volatility are annualized.
+    """
+    import numpy as np
+
+    weights = np.asarray(weights, dtype='float64')
+    columns = returns if benchmark is None else np.column_stack([returns, benchmark])
+    cov = np.atleast_2d(np.cov(columns, rowvar=False))
+    asset_cov = cov[:len(weights), :len(weights)]
+
+    portfolio = returns @ weights
+    mean = float(portfolio.mean())
+    sigma = float(np.sqrt(weights @ asset_cov @ weights))
+    excess = portfolio - risk_free / TRADING_DAYS
+    downside = float(np.sqrt(np.mean(np.minimum(excess, 0) ** 2)))
+    wealth = np.cumprod(1 + portfolio)
+    drawdown = 1 - wealth / np.maximum.accumulate(np.maximum(wealth, 1))
+
+    sd = np.sqrt(np.diag(asset_cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = np.nan_to_num(asset_cov / np.outer(sd, sd))
+
+    metrics = {
+        "volatility": annualize_volatility(sigma),
+        "annual_return": mean * TRADING_DAYS,
+        "sharpe": float(excess.mean() / sigma * np.sqrt(TRADING_DAYS)) if sigma else None,
+        "sortino": float(excess.mean() / downside * np.sqrt(TRADING_DAYS)) if downside else None,
+        "max_drawdown": float(drawdown.max()),
+        **value_at_risk(portfolio, mean, sigma, confidence),
+        "beta": None,
+        "betas": None,
+        "correlation": correlation.round(4).tolist(),
+    }
+    if benchmark is not None and cov[-1, -1] > 0:
+        betas = cov[:len(weights), -1] / cov[-1, -1]
+        metrics["beta"] = float(weights @ betas)
+        metrics["betas"] = betas.tolist()
+    return metrics
+
+
+def holdings_key(holdings):
+    """Order-independent hash of [(symbol, quantity)]."""
+    canonical = ",".join(f"{s.upper()}:{q}" for s, q in sorted(holdings, key=lambda h: h[0].upper()))
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+class RiskService:
+    @staticmethod
+    def get_portfolio_risk(holdings):
+        """Risk metrics for [(symbol, quantity)], cached per (holdings, date); None without history."""
+        import pandas as pd
+
+        holdings = [(s.upper(), q) for s, q in holdings if q]
+        if not holdings:
+            return None
+        today = pd.Timestamp.now(tz='America/New_York').date().isoformat()
+        key = f"risk_{holdings_key(holdings)}_{today}"
+        return get_cached(key, lambda: RiskService._compute(holdings), *RISK_TTL)[0]
+
+    @staticmethod
+    def _compute(holdings):
+        import numpy as np
+        import pandas as pd
+
+        benchmark = getattr(settings, 'RISK_BENCHMARK', 'SPY').upper()
+        quantities = {}
+        for symbol, quantity in holdings:
+            quantities[symbol] = quantities.get(symbol, 0) + quantity
+
+        frames = MarketService.get_bars_many([*quantities, benchmark], period=RISK_PERIOD, interval="1d")
+        close_df = pd.DataFrame({s: df['Close'] for s, df in frames.items() if df is not None and not df.empty})
+        symbols = [s for s in quantities if s in close_df.columns]
+        if not symbols:
+            return None
+        has_benchmark = benchmark in close_df.columns
+        close_df = close_df[symbols + [benchmark]] if has_benchmark else close_df[symbols]
+
+        returns = daily_returns(close_df)
+        if len(returns) < 2:
+            return None
+        last_close = close_df[symbols].ffill().iloc[-1].to_numpy(dtype='float64')
+        values = last_close * np.array([quantities[s] for s in symbols], dtype='float64')
+        weights = values / values.sum()
+
+        metrics = risk_metrics(
+            returns[:, :len(symbols)], weights,
+            benchmark=returns[:, -1] if has_benchmark else None,
+            risk_free=getattr(settings, 'RISK_FREE_RATE', 0.0),
+        )
+        betas = metrics.pop("betas")
+        correlation = metrics.pop("correlation")
+        return {
+            **{k: round(v, 4) if v is not None else None for k, v in metrics.items()},
+            "benchmark": benchmark if has_benchmark else None,
+            "confidence": CONFIDENCE,
+            "observations": len(returns),
+            "holdings": [
+                {"symbol": s, "weight": round(float(w), 4), "beta": round(b, 4) if betas else None}
+                for s, w, b in zip(symbols, weights, betas or [None] * len(symbols))
+            ],
+            "correlation": {"symbols": symbols, "matrix": correlation},
+        }
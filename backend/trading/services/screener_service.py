@@ -0,0 +1,149 @@
+"""
+Technical screener over a precomputed indicator table.
+
+The table holds one NumPy column per indicator for the whole universe
+(SCREENER_UNIVERSE plus every held or watched symbol), built in bulk by the
+panel engine and cached like any other market key. Only the refresh_screener
+command (cron) builds it; requests just read the cached table, so a query is
+a few boolean masks and one argsort over those columns whatever the size of
+the universe, and never calls upstream or loops over symbols.
+"""
+import time
+
+from django.conf import settings
+
+from .cache_service import peek_many, store_many
+
+TABLE_KEY = "screener_table"
+SCREENER_MAX_AGE = 86400    # seconds a table is served if refresh_screener stops running
+
+# Query-parameter name → table column; each supports <name>_lt / <name>_gt and ordering
+FIELDS = {
+    'price': 'Close',
+    'rsi': 'RSI',
+    'macd': 'MACD',
+    'macd_signal': 'Signal_Line',
+    'macd_hist': 'MACD_Histogram',
+    'sma_14': 'SMA_14',
+    'sma_50': 'SMA_50',
+    'ema_14': 'EMA_14',
+    'ema_20': 'EMA_20',
+    'bb_upper': 'BB_Upper',
+    'bb_middle': 'BB_Middle',
+    'bb_lower': 'BB_Lower',
+    'atr': 'ATR',
+}
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+class ScreenerService:
+    @staticmethod
+    def universe():
+        from .market_service import MarketService
+
+        configured = [s.strip().upper() for s in getattr(settings, 'SCREENER_UNIVERSE', []) if s.strip()]
+        return sorted(set(configured) | set(MarketService.tracked_symbols()))
+
+    @staticmethod
+    def build_table(symbols=None):
+        """Latest (and previous-bar MACD histogram) indicator columns for the universe, sorted by symbol."""
+        import numpy as np
+        from .indicator_service import IndicatorService
+        from . import panel_indicators
+
+        names, panel = IndicatorService.indicator_panel(ScreenerService.universe() if symbols is None else symbols)
+        if panel is None:
+            return {"symbols": np.array([], dtype=str), "columns": {}, "signal": np.array([], dtype=str),
+                    "built_at": time.time()}
+
+        order = np.argsort(names)
+        latest = panel_indicators.latest_values(panel)
+        columns = {name: values[order] for name, values in latest.items()}
+        columns['MACD_Histogram_prev'] = panel['MACD_Histogram'][-2][order]
+        rounded_rsi, rounded_macd = np.round(columns['RSI'], 2), np.round(columns['MACD'], 2)
+        return {
+            "symbols": np.array(names)[order],
+            "columns": columns,
+            "signal": panel_indicators.signals(rounded_rsi, rounded_macd),
+            "built_at": time.time(),
+        }
+
+    @staticmethod
+    def get_table():
+        """The cached table, or None until refresh_screener has built one (never built here)."""
+        return peek_many([TABLE_KEY]).get(TABLE_KEY)
+
+    @staticmethod
+    def refresh_table():
+        """Rebuild the table for the whole universe and cache it."""
+        table = ScreenerService.build_table()
+        store_many({TABLE_KEY: table}, SCREENER_MAX_AGE)
+        return table
+
+    @staticmethod
+    def screen(table, params):
+        """
+        Indices into `table` matching the query filters, in the requested order.
+        Raises ValueError for malformed values.
+
+        Filters: <field>_lt / <field>_gt (see FIELDS), price_vs_ema20=ABOVE|BELOW,
+        macd_hist_rising=true|false, signal=BULLISH[,OVERSOLD...].
+        Ordering: ordering=<field> or -<field> (default symbol); NaNs sort last.
+        """
+        import numpy as np
+
+        columns = table["columns"]
+        mask = np.ones(len(table["symbols"]), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            for field, column in FIELDS.items():
+                for suffix, compare in (('_lt', np.less), ('_gt', np.greater)):
+                    raw = params.get(field + suffix)
+                    if raw not in (None, ''):
+                        mask &= compare(columns[column], float(raw))
+
+            position = params.get('price_vs_ema20', '').upper()
+            if position:
+                if position not in ('ABOVE', 'BELOW'):
+                    raise ValueError("price_vs_ema20 must be ABOVE or BELOW")
+                above = columns['Close'] > columns['EMA_20']
+                mask &= above if position == 'ABOVE' else ~above
+
+            rising = params.get('macd_hist_rising', '').lower()
+            if rising:
+                is_rising = columns['MACD_Histogram'] > columns['MACD_Histogram_prev']
+                mask &= is_rising if rising in TRUE_VALUES else ~is_rising
+
+        signals = [s.strip().upper() for s in params.get('signal', '').split(',') if s.strip()]
+        if signals:
+            mask &= np.isin(table["signal"], signals)
+
+        matched = np.flatnonzero(mask)
+        ordering = params.get('ordering', 'symbol')
+        field = ordering.lstrip('-')
+        if field == 'symbol':
+            return matched[::-1] if ordering.startswith('-') else matched
+        if field not in FIELDS:
+            raise ValueError(f"Unknown ordering field: {field}")
+        values = columns[FIELDS[field]][matched]
+        keys = -values if ordering.startswith('-') else values
+        # lexsort: last key is primary – NaNs last, then value, then symbol (already sorted)
+        return matched[np.lexsort((matched, keys, np.isnan(values)))]
+
+    @staticmethod
+    def rows(table, indices):
+        """calculate_indicators()-shaped rows (plus price and macd_hist_rising) for `indices`."""
+        import numpy as np
+        from . import panel_indicators
+
+        indices = np.asarray(indices, dtype=int)
+        latest = {name: values[indices] for name, values in table["columns"].items()}
+        rows = panel_indicators.latest_table(table["symbols"][indices].tolist(), latest)
+        with np.errstate(invalid='ignore'):
+            rising = latest['MACD_Histogram'] > latest['MACD_Histogram_prev']
+        result = []
+        for i, (symbol, row) in enumerate(rows.items()):
+            price = latest['Close'][i]
+            row["price"] = None if np.isnan(price) else round(float(price), 2)
+            row["macd_hist_rising"] = bool(rising[i])
+            result.append(row)
+        return result
@@ -0,0 +1,69 @@
+"""
+Last-known-good market data, persisted per symbol (trading.MarketSnapshot).
+
+Every successful quote fetch and 1mo sparkline build is upserted here, so a
+value survives cache expiry and restarts. When upstream fails and the cache
+has nothing left to serve, MarketService answers from the snapshot with
+`stale: true` and the snapshot's age, instead of an error. One upsert query
+per write and one SELECT per fallback, neither of which touches the network.
+"""
+from django.utils import timezone
+
+SPARKLINE_PERIOD = "1mo"  # the period dashboards and the portfolio list show
+
+
+def _upsert(rows, fields):
+    from trading.models import MarketSnapshot
+
+    try:
+        MarketSnapshot.objects.bulk_create(
+            [MarketSnapshot(**row) for row in rows],
+            update_conflicts=True, unique_fields=['symbol'], update_fields=fields,
+        )
+    except Exception:
+        pass  # a missed snapshot only means an older fallback
+
+
+def record_quotes(quotes):
+    """Persist {symbol: quote} from a successful fetch."""
+    if quotes:
+        now = timezone.now()
+        _upsert([{'symbol': s, 'quote': q, 'quote_at': now} for s, q in quotes.items()], ['quote', 'quote_at'])
+
+
+def record_sparkline(symbol, prices):
+    if prices:
+        _upsert([{'symbol': symbol, 'sparkline': prices, 'sparkline_at': timezone.now()}],
+                ['sparkline', 'sparkline_at'])
+
+
+def last_quotes(symbols):
+    """{symbol: (quote marked stale, age_seconds)} for the symbols with a stored quote."""
+    from trading.models import MarketSnapshot
+
+    now = timezone.now()
+    try:
+        rows = list(MarketSnapshot.objects.filter(symbol__in=symbols, quote__isnull=False).values_list(
+            'symbol', 'quote', 'quote_at'))
+    except Exception:
+        return {}  # the fallback must never turn a miss into an error
+    return {symbol: ({**quote, "stale": True}, (now - at).total_seconds()) for symbol, quote, at in rows}
+
+
+def last_quote(symbol):
+    """(quote, age_seconds), or (None, None) if none was ever stored."""
+    return last_quotes([symbol]).get(symbol, (None, None))
+
+
+def last_sparkline(symbol):
+    """(prices, age_seconds), or ([], None)."""
+    from trading.models import MarketSnapshot
+
+    try:
+        row = MarketSnapshot.objects.filter(symbol=symbol, sparkline_at__isnull=False).values_list(
+            'sparkline', 'sparkline_at').first()
+    except Exception:
+        row = None
+    if not row:
+        return [], None
+    return row[0], (timezone.now() - row[1]).total_seconds()
@@ -0,0 +1,229 @@
+"""
+Constant-size indicator state that advances one bar at a time.
+
+IndicatorState holds everything calculate_indicators() reports for one
+(symbol, interval) series in a few floats and short ring buffers: EMAs,
+MACD/signal, RSI, ATR, and the SMA/Bollinger windows. Applying a new bar, or
+a tick that revises the still-forming bar, is O(1) instead of a recompute
+over the whole window. Fed the same bars, it reproduces the pandas formulas.
+
+States round-trip through to_dict()/from_dict() and are kept in the Django
+cache under `indicator_state_<SYMBOL>_<interval>`.
+"""
+import math
+from collections import deque
+
+from django.core.cache import cache
+
+STATE_TIMEOUT = 7 * 86400  # dropped states are simply re-seeded from the bar store
+
+
+class EMA:
+    """ewm(span, adjust=False).mean(), seeded with the first value."""
+    __slots__ = ('alpha', 'value')
+
+    def __init__(self, span, value=None):
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = value
+
+    def update(self, x):
+        self.value = x if self.value is None else self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+
+class Window:
+    """Ring buffer of the last `size` values with pandas-style rolling mean/std over its tail."""
+    __slots__ = ('values',)
+
+    def __init__(self, size, values=()):
+        self.values = deque(values, maxlen=size)
+
+    def push(self, x):
+        self.values.append(x)
+
+    def _tail(self, n):
+        if len(self.values) < n:
+            return None
+        return list(self.values)[-n:]
+
+    def mean(self, n):
+        tail = self._tail(n)
+        return math.fsum(tail) / n if tail else None
+
+    def std(self, n):
+        """Sample standard deviation (ddof=1), like rolling().std()."""
+        tail = self._tail(n)
+        if not tail:
+            return None
+        mean = math.fsum(tail) / n
+        return math.sqrt(math.fsum((x - mean) ** 2 for x in tail) / (n - 1))
+
+
+class RSI:
+    """Simple-mean RSI: rolling means of gains and losses over `period` diffs."""
+    __slots__ = ('period', 'gains', 'losses', 'prev_close')
+
+    def __init__(self, period=14, gains=(), losses=(), prev_close=None):
+        self.period = period
+        self.gains = Window(period, gains)
+        self.losses = Window(period, losses)
+        self.prev_close = prev_close
+
+    def update(self, close):
+        # pandas: the first diff is NaN, and delta.where(delta > 0, 0) turns it into 0
+        delta = close - self.prev_close if self.prev_close is not None else 0.0
+        self.gains.push(delta if delta > 0 else 0.0)
+        self.losses.push(-delta if delta < 0 else 0.0)
+        self.prev_close = close
+
+    @property
+    def value(self):
+        gain, loss = self.gains.mean(self.period), self.losses.mean(self.period)
+        if gain is None or loss is None:
+            return None
+        if loss == 0:
+            return 100.0 if gain > 0 else None  # gain / 0 → inf → 100; 0 / 0 → NaN
+        return 100 - (100 / (1 + gain / loss))
+
+
+class MACD:
+    __slots__ = ('fast', 'slow', 'signal')
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, close):
+        self.signal.update(self.fast.update(close) - self.slow.update(close))
+
+    @property
+    def value(self):
+        return None if self.fast.value is None else self.fast.value - self.slow.value
+
+
+class ATR:
+    """Simple mean of the true range; the first bar's range is high - low."""
+    __slots__ = ('period', 'ranges', 'prev_close')
+
+    def __init__(self, period=14, ranges=(), prev_close=None):
+        self.period = period
+        self.ranges = Window(period, ranges)
+        self.prev_close = prev_close
+
+    def update(self, high, low, close):
+        tr = high - low
+        if self.prev_close is not None:
+            tr = max(tr, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.ranges.push(tr)
+        self.prev_close = close
+
+    @property
+    def value(self):
+        return self.ranges.mean(self.period)
+
+
+class IndicatorState:
+    """
+    Latest indicator values for one series. update() takes bars in time
+    order; a bar with the same timestamp as the last one (a tick on the
+    forming bar) replaces it instead of advancing.
+    """
+    __slots__ = ('base', 'time', 'bars', 'closes', 'ema14', 'ema20', 'macd', 'rsi', 'atr', '_prev')
+
+    def __init__(self, base=None):
+        self.base = base  # bar store generation it was seeded from (see BarStore `base`)
+        self.time = None   # last bar timestamp, UTC epoch ns
+        self.bars = 0
+        self.closes = Window(50)
+        self.ema14 = EMA(14)
+        self.ema20 = EMA(20)
+        self.macd = MACD()
+        self.rsi = RSI()
+        self.atr = ATR()
+        self._prev = None  # components before the last bar, so it can be revised
+
+    def update(self, t, high, low, close):
+        """Apply one bar stamped `t`. Returns False for bars older than the last one."""
+        if self.time is not None and t < self.time:
+            return False
+        if self.time is not None and t == self.time:
+            self._load_components(self._prev)
+        else:
+            self._prev = self._dump_components()
+
+        self.closes.push(close)
+        self.ema14.update(close)
+        self.ema20.update(close)
+        self.macd.update(close)
+        self.rsi.update(close)
+        self.atr.update(high, low, close)
+        self.bars += 1
+        self.time = t
+        return True
+
+    def values(self):
+        """Unrounded latest values keyed like calculate_indicators(); None where not yet defined."""
+        middle, std = self.closes.mean(20), self.closes.std(20)
+        macd = self.macd.value
+        return {
+            'Close': self.closes.values[-1] if self.bars else None,
+            'RSI': self.rsi.value,
+            'MACD': macd,
+            'Signal_Line': self.macd.signal.value,
+            'MACD_Histogram': None if macd is None else macd - self.macd.signal.value,
+            'SMA_14': self.closes.mean(14),
+            'SMA_50': self.closes.mean(50),
+            'EMA_14': self.ema14.value,
+            'EMA_20': self.ema20.value,
+            'BB_Upper': None if middle is None else middle + std * 2,
+            'BB_Middle': middle,
+            'BB_Lower': None if middle is None else middle - std * 2,
+            'ATR': self.atr.value,
+        }
+
+    def _dump_components(self):
+        return {
+            'bars': self.bars,
+            'closes': list(self.closes.values),
+            'ema': [self.ema14.value, self.ema20.value],
+            'macd': [self.macd.fast.value, self.macd.slow.value, self.macd.signal.value],
+            'rsi': [list(self.rsi.gains.values), list(self.rsi.losses.values), self.rsi.prev_close],
+            'atr': [list(self.atr.ranges.values), self.atr.prev_close],
+        }
+
+    def _load_components(self, data):
+        self.bars = data['bars']
+        self.closes = Window(50, data['closes'])
+        self.ema14, self.ema20 = EMA(14, data['ema'][0]), EMA(20, data['ema'][1])
+        self.macd = MACD()
+        self.macd.fast.value, self.macd.slow.value, self.macd.signal.value = data['macd']
+        self.rsi = RSI(14, *data['rsi'])
+        self.atr = ATR(14, *data['atr'])
+
+    def to_dict(self):
+        return {'base': self.base, 'time': self.time, 'prev': self._prev, **self._dump_components()}
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(data['base'])
+        state._load_components(data)
+        state.time = data['time']
+        state._prev = data['prev']
+        return state
+
+
+def _state_key(symbol, interval):
+    return f"indicator_state_{symbol.upper()}_{interval}"
+
+
+def load_state(symbol, interval):
+    data = cache.get(_state_key(symbol, interval))
+    try:
+        return IndicatorState.from_dict(data) if data else None
+    except (KeyError, TypeError, ValueError):
+        return None  # written by an older layout – re-seed
+
+
+def save_state(symbol, interval, state):
+    cache.set(_state_key(symbol, interval), state.to_dict(), STATE_TIMEOUT)
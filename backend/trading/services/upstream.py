@@ -0,0 +1,162 @@
+"""
+Shared budget and failure isolation for upstream calls (Yahoo, RSS feeds).
+
+Every network call the providers make goes through call(host, fn, ...):
+
+* A token bucket per host, kept in the Django cache so the whole cluster
+  shares one budget: UPSTREAM_RATE tokens/s up to UPSTREAM_BURST. A caller
+  waits at most UPSTREAM_MAX_WAIT for a token, then gets RateLimited.
+* A circuit breaker per host: UPSTREAM_BREAKER_FAILURES failures within
+  FAILURE_WINDOW open it for UPSTREAM_BREAKER_RESET seconds, during which
+  calls fail at once with CircuitOpen instead of waiting out timeouts. After
+  that one probe call at a time is let through (half-open): a success closes
+  the breaker, a failure re-opens it.
+
+Both errors subclass UpstreamUnavailable. The fetch helpers already treat
+any exception as a failed fetch, and get_cached() then serves the
+last-known-good entry.
+"""
+import functools
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+YAHOO = "yahoo"           # host key for every yfinance call
+FAILURE_WINDOW = 60       # seconds failures are counted over
+PROBE_TIMEOUT = 30        # seconds before an unanswered half-open probe may be retried
+BUCKET_LOCK_TIMEOUT = 1
+STATE_TTL = 3600
+
+
+class UpstreamUnavailable(Exception):
+    """The call was not made: the host is over budget or its breaker is open."""
+
+
+class RateLimited(UpstreamUnavailable):
+    pass
+
+
+class CircuitOpen(UpstreamUnavailable):
+    pass
+
+
+class TokenBucket:
+    """Cluster-wide token bucket; state is (tokens, updated_at) under one cache key."""
+
+    def __init__(self, host, rate, burst):
+        self.key = f"upstream:bucket:{host}"
+        self.rate = rate
+        self.burst = burst
+
+    def take(self, max_wait):
+        """Take one token, sleeping up to `max_wait` seconds for it. Returns False on timeout."""
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self._try_take()
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def _try_take(self):
+        """0 if a token was taken, else the seconds until one is expected."""
+        lock_key = f"{self.key}:lock"
+        if not cache.add(lock_key, 1, BUCKET_LOCK_TIMEOUT):
+            return 0.01  # another worker is updating the bucket
+        try:
+            now = time.time()
+            tokens, updated_at = cache.get(self.key) or (self.burst, now)
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens >= 1:
+                cache.set(self.key, (tokens - 1, now), STATE_TTL)
+                return 0
+            cache.set(self.key, (tokens, now), STATE_TTL)
+            return (1 - tokens) / self.rate
+        finally:
+            cache.delete(lock_key)
+
+
+class CircuitBreaker:
+    """Closed → open after `failures` errors → half-open probe after `reset_after` seconds."""
+
+    def __init__(self, host, failures, reset_after):
+        self.key = f"upstream:breaker:{host}"
+        self.failures = failures
+        self.reset_after = reset_after
+
+    def state(self):
+        opened_at = cache.get(f"{self.key}:open")
+        if opened_at is None:
+            return "closed"
+        return "open" if time.time() - opened_at < self.reset_after else "half_open"
+
+    def before_call(self):
+        """Raise CircuitOpen unless the call may go ahead; returns True for a half-open probe."""
+        state = self.state()
+        if state == "closed":
+            return False
+        if state == "half_open" and cache.add(f"{self.key}:probe", 1, PROBE_TIMEOUT):
+            return True
+        raise CircuitOpen(f"{self.key} is open")
+
+    def record_success(self, probe):
+        if probe:
+            cache.delete_many([f"{self.key}:open", f"{self.key}:failures", f"{self.key}:probe"])
+
+    def record_failure(self, probe):
+        if probe:
+            cache.set(f"{self.key}:open", time.time(), STATE_TTL)
+            cache.delete(f"{self.key}:probe")
+            return
+        failures_key = f"{self.key}:failures"
+        cache.add(failures_key, 0, FAILURE_WINDOW)
+        try:
+            count = cache.incr(failures_key)
+        except ValueError:  # window expired between add() and incr()
+            cache.set(failures_key, 1, FAILURE_WINDOW)
+            count = 1
+        if count >= self.failures:
+            cache.set(f"{self.key}:open", time.time(), STATE_TTL)
+            cache.delete(failures_key)
+
+
+def _limits(host):
+    return (
+        TokenBucket(host, getattr(settings, 'UPSTREAM_RATE', 10.0), getattr(settings, 'UPSTREAM_BURST', 30)),
+        CircuitBreaker(host, getattr(settings, 'UPSTREAM_BREAKER_FAILURES', 5),
+                       getattr(settings, 'UPSTREAM_BREAKER_RESET', 30)),
+    )
+
+
+def call(host, fn, *args, **kwargs):
+    """fn(*args, **kwargs) under `host`'s breaker and rate limit; raises UpstreamUnavailable if not attempted."""
+    bucket, breaker = _limits(host)
+    probe = breaker.before_call()
+    if not bucket.take(getattr(settings, 'UPSTREAM_MAX_WAIT', 2.0)):
+        if probe:
+            cache.delete(f"{breaker.key}:probe")
+        raise RateLimited(f"{host} is over its request budget")
+    try:
+        result = fn(*args, **kwargs)
+    except Exception:
+        breaker.record_failure(probe)
+        raise
+    breaker.record_success(probe)
+    return result
+
+
+def guarded(host):
+    """Method decorator: route the call through call(host, ...)."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            return call(host, method, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def status(hosts):
+    """{host: breaker state} for the cache_stats endpoint."""
+    return {host: _limits(host)[1].state() for host in hosts}
@@ -1,3 +1,1032 @@
-from django.test import TestCase
+import json
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
 
-# Create your tests here.
+import pandas as pd
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from portfolio.models import Portfolio
+from users.models import User
+from .models import Order
+from .services.bar_store import BarStore
+from .services.market_service import QUOTE_TTL, MarketService
+from .services.cache_service import (
+    cache_stats, clear_local, get_cached, invalidate, peek_many, single_flight, store_many,
+)
+
+
+def reset_caches():
+    cache.clear()
+    clear_local()
+
+
+def make_history(closes, start="2024-01-02", freq="B"):
+    """Small OHLCV frame shaped like yfinance's history() output."""
+    index = pd.date_range(start, periods=len(closes), freq=freq, tz="America/New_York")
+    return pd.DataFrame({
+        "Open": closes,
+        "High": [c + 1 for c in closes],
+        "Low": [c - 1 for c in closes],
+        "Close": closes,
+        "Volume": [1000] * len(closes),
+    }, index=index)
+
+
+def pandas_indicators(df, symbol):
+    """The original pandas calculate_indicators() pipeline, kept as a reference implementation."""
+    from .services.indicator_service import overall_signal
+
+    close = df["Close"]
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    macd = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    signal_line = macd.ewm(span=9, adjust=False).mean()
+    bb_middle = close.rolling(window=20).mean()
+    bb_std = close.rolling(window=20).std()
+    tr = pd.concat([
+        df["High"] - df["Low"], (df["High"] - close.shift()).abs(), (df["Low"] - close.shift()).abs(),
+    ], axis=1).max(axis=1)
+    latest = {
+        "RSI": (100 - (100 / (1 + gain / loss))).iloc[-1],
+        "MACD": macd.iloc[-1],
+        "Signal_Line": signal_line.iloc[-1],
+        "MACD_Histogram": (macd - signal_line).iloc[-1],
+        "SMA_14": close.rolling(window=14).mean().iloc[-1],
+        "SMA_50": close.rolling(window=50).mean().iloc[-1],
+        "EMA_14": close.ewm(span=14, adjust=False).mean().iloc[-1],
+        "EMA_20": close.ewm(span=20, adjust=False).mean().iloc[-1],
+        "BB_Upper": (bb_middle + bb_std * 2).iloc[-1],
+        "BB_Middle": bb_middle.iloc[-1],
+        "BB_Lower": (bb_middle - bb_std * 2).iloc[-1],
+        "ATR": tr.rolling(window=14).mean().iloc[-1],
+    }
+    result = {"symbol": symbol}
+    result.update({name: None if pd.isna(value) else round(float(value), 2) for name, value in latest.items()})
+    result["signal"] = overall_signal(result["RSI"], result["MACD"])
+    result["price_vs_ema20"] = "ABOVE" if close.iloc[-1] > latest["EMA_20"] else "BELOW"
+    return result
+
+
+class BatchQuoteAPITest(TestCase):
+    """GET /trading/live/batch/ serves cache hits and fetches all misses in one call."""
+
+    def setUp(self):
+        reset_caches()
+        self.user = User.objects.create_user(username="trader", email="t@example.com", password="StrongPass123!")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_batch_quotes_single_upstream_call(self):
+        store_many({"price_only_AAPL": {"symbol": "AAPL", "price": 1.0}}, 120)
+        raw = pd.concat({"MSFT": make_history([100.0, 110.0]), "TSLA": make_history([50.0, 45.0])}, axis=1)
+
+        with patch("yfinance.download", return_value=raw) as download:
+            response = self.client.get("/trading/live/batch/?symbols=aapl,MSFT,TSLA")
+
+        self.assertEqual(response.status_code, 200)
+        download.assert_called_once()
+        self.assertEqual(download.call_args[0][0], ["MSFT", "TSLA"])
+        self.assertEqual(response.data["AAPL"]["price"], 1.0)
+        self.assertEqual(response.data["MSFT"]["change_pct"], 10.0)
+        self.assertEqual(peek_many(["price_only_TSLA"])["price_only_TSLA"]["price"], 45.0)
+
+
+class PeriodValidationTest(TestCase):
+    """Unknown ?period= values are rejected before they reach the bar store."""
+
+    def test_malformed_period_is_400(self):
+        user = User.objects.create_user(username="period", email="pv@example.com", password="StrongPass123!")
+        client = APIClient()
+        client.force_authenticate(user)
+        with patch.object(MarketService, "get_bars") as get_bars:
+            for url in ("/trading/history/AAPL/?period=abcd", "/trading/chart/AAPL/?period=xmo",
+                        "/trading/sparkline/AAPL/?period=7q", "/trading/backtest/?symbols=AAPL&period=1"):
+                self.assertEqual(client.get(url).status_code, 400, url)
+        get_bars.assert_not_called()
+
+
+class PerformanceAnalyticsTest(TestCase):
+    """/trading/performance/ prices every holding in one download and measures real volatility."""
+
+    def setUp(self):
+        reset_caches()
+        self.user = User.objects.create_user(username="perf", email="p@example.com", password="StrongPass123!")
+        Portfolio.objects.create(user=self.user, stock_symbol="AAPL", quantity=10, average_buy_price=100.0)
+        Portfolio.objects.create(user=self.user, stock_symbol="MSFT", quantity=5, average_buy_price=200.0)
+
+    def test_batched_prices_and_volatility(self):
+        raw = pd.concat({"AAPL": make_history([100.0, 110.0]), "MSFT": make_history([200.0, 180.0])}, axis=1)
+        bars = {"AAPL": make_history([100.0, 102.0, 99.0, 103.0]), "MSFT": make_history([200.0, 198.0, 204.0, 202.0])}
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with patch("yfinance.download", return_value=raw) as download, \
+                patch.object(MarketService, "get_bars", side_effect=lambda s, period, interval: bars[s]):
+            data = client.get("/trading/performance/").data
+
+        download.assert_called_once()
+        self.assertEqual(data["total_net_gain"], 0.0)  # +100 on AAPL, -100 on MSFT
+        self.assertEqual(data["best_performing"]["symbol"], "AAPL")
+        self.assertEqual(data["worst_performing"]["symbol"], "MSFT")
+        returns = pd.DataFrame({s: df["Close"] for s, df in bars.items()}).pct_change().dropna()
+        expected = (returns["AAPL"] * 1100 / 2000 + returns["MSFT"] * 900 / 2000).std() * 252 ** 0.5
+        self.assertAlmostEqual(data["volatility_pct"], round(expected * 100, 2))
+        self.assertEqual(data["volatility"], "Medium" if expected < 0.30 else "High")
+        self.assertEqual(data["diversification_count"], 2)
+
+
+class LastKnownGoodTest(TestCase):
+    """Successful fetches are snapshotted; failed ones are answered from the snapshot, flagged stale."""
+
+    def setUp(self):
+        reset_caches()
+        self.user = User.objects.create_user(username="trader", email="t@example.com", password="StrongPass123!")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        ticker = MagicMock()
+        ticker.history.return_value = make_history([100.0, 110.0])
+        with patch("yfinance.Ticker", return_value=ticker):
+            MarketService.get_quote("AAPL")
+        reset_caches()  # cache lost (restart, eviction); only the snapshot is left
+
+    def test_live_endpoint_serves_stale_snapshot(self):
+        with patch("yfinance.Ticker", side_effect=ConnectionError("down")):
+            response = self.client.get("/trading/live/AAPL/?fast=true")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["price"], 110.0)
+        self.assertTrue(response.data["stale"])
+
+    def test_orders_accept_stale_quotes_up_to_max_age(self):
+        from users.models import Wallet
+        from .models import MarketSnapshot
+
+        Wallet.objects.update_or_create(user=self.user, defaults={"balance": 1000})
+        with patch("yfinance.Ticker", side_effect=ConnectionError("down")):
+            response = self.client.post("/trading/order/", {"symbol": "AAPL", "type": "BUY", "quantity": 2})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.data["stale_price"])
+
+            MarketSnapshot.objects.filter(symbol="AAPL").update(quote_at=timezone.now() - timedelta(hours=1))
+            response = self.client.post("/trading/order/", {"symbol": "AAPL", "type": "BUY", "quantity": 2})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+
+
+class TrackedSymbolsTest(TestCase):
+    """The cache warmer's universe: held (quantity > 0) plus watched symbols, de-duplicated."""
+
+    def test_tracked_symbols(self):
+        from portfolio.models import Portfolio
+        from .models import Watchlist
+
+        user = User.objects.create_user(username="holder", email="h@example.com", password="StrongPass123!")
+        Portfolio.objects.create(user=user, stock_symbol="AAPL", quantity=3)
+        Portfolio.objects.create(user=user, stock_symbol="SOLD", quantity=0)
+        Watchlist.objects.create(user=user, symbol="AAPL")
+        Watchlist.objects.create(user=user, symbol="MSFT")
+
+        with self.assertNumQueries(1):
+            self.assertEqual(MarketService.tracked_symbols(), ["AAPL", "MSFT"])
+
+
+class SingleFlightTest(SimpleTestCase):
+    """Concurrent misses on one key trigger a single recompute."""
+
+    def setUp(self):
+        reset_caches()
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"price": 42}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(single_flight("live_price_TEST", compute, 60)))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"price": 42}] * 8)
+
+    def test_failed_fetch_is_not_cached(self):
+        self.assertIsNone(single_flight("live_price_FAIL", lambda: None, 60))
+        self.assertEqual(single_flight("live_price_FAIL", lambda: {"price": 1}, 60), {"price": 1})
+
+    def test_process_locks_do_not_accumulate(self):
+        from .services import cache_service
+
+        for i in range(100):
+            single_flight(f"history_TEST_{i}", lambda: [1.0], 60)
+        self.assertFalse(any(k.startswith("history_TEST_") for k in cache_service._process_locks.keys()))
+
+
+class StaleWhileRevalidateTest(SimpleTestCase):
+    """Entries past their soft TTL are served immediately and refreshed in the background."""
+
+    def setUp(self):
+        reset_caches()
+
+    def test_stale_value_served_while_refreshing(self):
+        get_cached("sparkline_TEST_1mo", lambda: [1.0], soft_ttl=60, hard_ttl=600)
+        entry = cache.get("sparkline_TEST_1mo")
+        entry["fetched_at"] -= 120  # pretend it was fetched two minutes ago
+        cache.set("sparkline_TEST_1mo", entry, 600)
+        clear_local()
+
+        refreshed = threading.Event()
+
+        def slow_refresh():
+            time.sleep(0.1)
+            refreshed.set()
+            return [2.0]
+
+        value, age = get_cached("sparkline_TEST_1mo", slow_refresh, soft_ttl=60, hard_ttl=600)
+        self.assertEqual(value, [1.0])
+        self.assertGreaterEqual(age, 120)
+
+        self.assertTrue(refreshed.wait(2))
+        for _ in range(20):
+            if cache.get("sparkline_TEST_1mo")["value"] == [2.0]:
+                break
+            time.sleep(0.05)
+        clear_local()
+        value, age = get_cached("sparkline_TEST_1mo", slow_refresh, soft_ttl=60, hard_ttl=600)
+        self.assertEqual(value, [2.0])
+        self.assertLess(age, 60)
+
+
+@override_settings(UPSTREAM_BREAKER_FAILURES=2, UPSTREAM_BREAKER_RESET=30)
+class UpstreamGuardTest(SimpleTestCase):
+    """Upstream calls share a rate limit and stop while a host's breaker is open."""
+
+    def setUp(self):
+        reset_caches()
+
+    def test_breaker_opens_then_probes(self):
+        from .services import upstream
+
+        ticker = MagicMock()
+        ticker.history.side_effect = ConnectionError("throttled")
+        with patch("yfinance.Ticker", return_value=ticker):
+            self.assertIsNone(MarketService._fetch_quote("AAPL"))
+            self.assertIsNone(MarketService._fetch_quote("AAPL"))
+            self.assertIsNone(MarketService._fetch_quote("MSFT"))  # open: not attempted
+        self.assertEqual(ticker.history.call_count, 2)
+        self.assertEqual(upstream.status([upstream.YAHOO]), {upstream.YAHOO: "open"})
+
+        cache.set(f"upstream:breaker:{upstream.YAHOO}:open", time.time() - 31, 3600)
+        ticker.history.side_effect = None
+        ticker.history.return_value = make_history([100.0, 101.0])
+        with patch("yfinance.Ticker", return_value=ticker):
+            self.assertEqual(MarketService._fetch_quote("AAPL")["price"], 101.0)
+        self.assertEqual(upstream.status([upstream.YAHOO]), {upstream.YAHOO: "closed"})
+
+    def test_outages_count_but_unknown_symbols_do_not(self):
+        from yfinance.exceptions import YFPricesMissingError
+        from .services import upstream
+        from .services.providers import YFinanceProvider
+
+        ticker = MagicMock()
+        ticker.history.side_effect = YFPricesMissingError("NOPE", "")
+        with patch("yfinance.Ticker", return_value=ticker):
+            for _ in range(3):
+                self.assertTrue(YFinanceProvider().history("NOPE", period="1y").empty)
+        self.assertEqual(upstream.status([upstream.YAHOO]), {upstream.YAHOO: "closed"})
+
+        # A timeout used to come back as an empty frame; with raise_errors it trips the breaker
+        ticker.history.side_effect = TimeoutError("read timed out")
+        with patch("yfinance.Ticker", return_value=ticker):
+            self.assertIsNone(MarketService._fetch_quote("AAPL"))
+            self.assertIsNone(MarketService._fetch_quote("MSFT"))
+        self.assertEqual(upstream.status([upstream.YAHOO]), {upstream.YAHOO: "open"})
+        self.assertTrue(ticker.history.call_args.kwargs["raise_errors"])
+
+    def test_failed_downloads_count_towards_the_breaker(self):
+        from .services import upstream
+        from .services.providers import EmptyDownload, YFinanceProvider
+
+        partial = pd.concat({"AAPL": make_history([100.0, 101.0]),
+                             "NOPE": make_history([100.0, 101.0]) * float("nan")}, axis=1)
+        with patch("yfinance.download", return_value=partial):
+            self.assertIn("AAPL", YFinanceProvider().download(["AAPL", "NOPE"], period="5d"))
+        self.assertEqual(upstream.status([upstream.YAHOO]), {upstream.YAHOO: "closed"})
+
+        # Throttled: yf.download swallows the error and returns nothing
+        with patch("yfinance.download", return_value=pd.DataFrame()) as download:
+            with self.assertRaises(EmptyDownload):
+                YFinanceProvider().download(["AAPL", "MSFT"], period="5d")
+            self.assertEqual(MarketService.get_price_batch(["AAPL", "MSFT"]), {})
+            self.assertEqual(MarketService.get_price_batch(["TSLA"]), {})  # open: not attempted
+        self.assertEqual(download.call_count, 2)
+        self.assertEqual(upstream.status([upstream.YAHOO]), {upstream.YAHOO: "open"})
+
+    def test_expired_entry_served_while_upstream_is_down(self):
+        ticker = MagicMock()
+        ticker.history.return_value = make_history([100.0, 110.0])
+        with patch("yfinance.Ticker", return_value=ticker):
+            MarketService.get_quote("AAPL")
+
+        entry = cache.get("price_only_AAPL")
+        entry["fetched_at"] -= 3600
+        entry["expires_at"] -= 3600
+        cache.set("price_only_AAPL", entry, 3600)
+        clear_local()
+
+        ticker.history.side_effect = ConnectionError("throttled")
+        with patch("yfinance.Ticker", return_value=ticker):
+            quote, age = MarketService.get_quote_with_age("AAPL")
+        self.assertEqual(quote["price"], 110.0)
+        self.assertGreaterEqual(age, 3600)
+        self.assertEqual(peek_many(["price_only_AAPL"]), {})  # bulk reads never see expired entries
+
+    @override_settings(UPSTREAM_RATE=0.5, UPSTREAM_BURST=2, UPSTREAM_MAX_WAIT=0.1)
+    def test_bucket_limits_calls(self):
+        from .services import upstream
+
+        upstream.call("example.com", lambda: None)
+        upstream.call("example.com", lambda: None)
+        with self.assertRaises(upstream.RateLimited):
+            upstream.call("example.com", lambda: None)
+
+
+class BarStoreTest(SimpleTestCase):
+    """One download fills the local bar store; every history consumer slices it."""
+
+    def setUp(self):
+        reset_caches()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.settings_override = override_settings(BAR_STORE_DIR=self.tmp.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_round_trip_preserves_frame(self):
+        df = make_history([float(i) for i in range(1, 31)])
+        df.index.name = "Date"
+        BarStore().write("AAPL", "1d", df, period="1y")
+
+        stored = BarStore().read("AAPL", "1d")
+        pd.testing.assert_frame_equal(stored, df, check_freq=False)
+        self.assertEqual(len(BarStore().read("AAPL", "1d", "5d")), 5)
+
+    def test_consumers_share_one_download(self):
+        ticker = MagicMock()
+        ticker.history.return_value = make_history([100.0 + i for i in range(300)])
+        ticker.info = {}
+
+        with patch("yfinance.Ticker", return_value=ticker):
+            self.assertEqual(len(MarketService.get_sparkline("AAPL", "1mo")), 22)
+            self.assertIsNotNone(MarketService.get_ohlc_with_indicators("AAPL", "3mo"))
+            self.assertIsNotNone(MarketService.get_historical_data("AAPL", "1mo"))
+
+        ticker.history.assert_called_once_with(period="1y", interval="1d", raise_errors=True)
+
+    def test_columnar_chart_matches_point_shape(self):
+        ticker = MagicMock()
+        ticker.history.return_value = make_history([100.0 + (i % 7) for i in range(300)])
+        ticker.info = {}
+
+        with patch("yfinance.Ticker", return_value=ticker):
+            points = MarketService.get_ohlc_with_indicators("AAPL", "3mo")
+            columns = MarketService.get_ohlc_with_indicators("AAPL", "3mo", columnar=True)
+
+        self.assertEqual(columns["t"], [p["x"] for p in points["ohlc"]])
+        self.assertEqual(columns["c"], [p["y"][3] for p in points["ohlc"]])
+        self.assertEqual(columns["v"], [p["y"] for p in points["volume"]])
+        self.assertEqual(columns["rsi_14"], [p["y"] for p in points["rsi_14"]])
+        self.assertIsNone(columns["rsi_14"][0])
+
+    def test_incremental_sync_fetches_only_the_gap(self):
+        full = make_history([100.0 + i for i in range(300)])
+        ticker = MagicMock()
+        ticker.history.return_value = full
+        with patch("yfinance.Ticker", return_value=ticker):
+            MarketService.get_bars("AAPL", "1y")
+
+        # Expire the series; upstream now has a revised last (partial) bar plus one new bar
+        meta = BarStore().read_meta("AAPL", "1d")
+        meta["synced_at"] -= 3600
+        with open(BarStore()._series_dir("AAPL", "1d") / "meta.json", "w") as fh:
+            json.dump(meta, fh)
+        gap = make_history([398.0, 500.0, 501.0], start=full.index[-2].strftime("%Y-%m-%d"))
+        ticker.history.reset_mock()
+        ticker.history.return_value = gap
+
+        with patch("yfinance.Ticker", return_value=ticker):
+            df = MarketService.get_bars("AAPL", "1y")
+
+        ticker.history.assert_called_once_with(start=full.index[-2].strftime("%Y-%m-%d"), interval="1d", raise_errors=True)
+        self.assertEqual(len(BarStore().read("AAPL", "1d")), 301)
+        self.assertEqual(list(df["Close"].iloc[-3:]), [398.0, 500.0, 501.0])
+
+    def test_readjusted_history_is_rewritten(self):
+        full = make_history([100.0 + i for i in range(300)])
+        ticker = MagicMock()
+        ticker.history.return_value = full
+        with patch("yfinance.Ticker", return_value=ticker):
+            MarketService.get_bars("AAPL", "1y")
+
+        meta = BarStore().read_meta("AAPL", "1d")
+        meta["synced_at"] -= 3600
+        with open(BarStore()._series_dir("AAPL", "1d") / "meta.json", "w") as fh:
+            json.dump(meta, fh)
+        # A 2:1 split: upstream now serves the whole history halved
+        split = make_history([(100.0 + i) / 2 for i in range(300)] + [200.0])
+        ticker.history.side_effect = lambda **kw: split[split.index >= kw["start"]] if "start" in kw else split
+
+        with patch("yfinance.Ticker", return_value=ticker):
+            df = MarketService.get_bars("AAPL", "1y")
+
+        self.assertEqual(ticker.history.call_args_list[-1].kwargs, {"period": "1y", "interval": "1d", "raise_errors": True})
+        self.assertEqual(list(df["Close"]), list(split["Close"].iloc[-len(df):]))  # no pre-split step
+        self.assertEqual(len(BarStore().read("AAPL", "1d")), 301)
+
+    def test_write_never_prunes_a_newer_generation(self):
+        store = BarStore()
+        df = make_history([1.0, 2.0, 3.0])
+        oldest = store.write("AAPL", "1d", df)["generation"]
+        previous = store.write("AAPL", "1d", df)["generation"]
+        series_dir = store._series_dir("AAPL", "1d")
+        in_flight = series_dir / f"g{time.time_ns() + 10**9}-other"  # another writer, not yet swapped in
+        in_flight.mkdir()
+
+        current = store.write("AAPL", "1d", df)["generation"]
+
+        remaining = {d.name for d in series_dir.iterdir() if d.is_dir()}
+        self.assertEqual(remaining, {previous, current, in_flight.name})
+        self.assertNotIn(oldest, remaining)
+
+    def test_failed_store_write_keeps_request_alive(self):
+        ticker = MagicMock()
+        ticker.history.return_value = make_history([100.0 + i for i in range(30)])
+        with patch("yfinance.Ticker", return_value=ticker), \
+                patch.object(BarStore, "write", side_effect=FileNotFoundError):
+            self.assertIsNone(MarketService.get_bars("AAPL", "1mo"))
+
+
+def make_intraday(days=("2024-03-04", "2024-03-05")):
+    """Regular-session 5m bars (09:30–15:55) with closes counting up from 100."""
+    index = pd.DatetimeIndex([]).tz_localize("America/New_York")
+    for day in days:
+        index = index.append(pd.date_range(f"{day} 09:30", f"{day} 15:55", freq="5min", tz="America/New_York"))
+    df = make_history([100.0 + i for i in range(len(index))])
+    df.index = index
+    return df
+
+
+class ResamplingTest(SimpleTestCase):
+    """Coarser intervals are aggregated from one stored base series, not downloaded."""
+
+    def setUp(self):
+        reset_caches()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.settings_override = override_settings(BAR_STORE_DIR=self.tmp.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_intraday_intervals_share_one_5m_fetch(self):
+        ticker = MagicMock()
+        ticker.history.return_value = make_intraday()
+
+        with patch("yfinance.Ticker", return_value=ticker):
+            quarter = MarketService.get_bars("AAPL", "5d", "15m")
+            hourly = MarketService.get_bars("AAPL", "5d", "1h")
+            MarketService.get_bars("AAPL", "1mo", "30m")
+
+        ticker.history.assert_called_once_with(period="60d", interval="5m", raise_errors=True)
+        self.assertEqual(len(quarter), 2 * 26)
+        first = quarter.iloc[0]
+        self.assertEqual(quarter.index[0], pd.Timestamp("2024-03-04 09:30", tz="America/New_York"))
+        self.assertEqual(
+            [first["Open"], first["High"], first["Low"], first["Close"], first["Volume"]],
+            [100.0, 103.0, 99.0, 102.0, 3000],
+        )
+
+        # Hours are anchored on the open (09:30, 10:30, ... 15:30 with the last half hour)
+        self.assertEqual(len(hourly), 2 * 7)
+        self.assertEqual(hourly.index[1], pd.Timestamp("2024-03-04 10:30", tz="America/New_York"))
+        self.assertEqual(hourly["Volume"].iloc[6], 6000)
+        self.assertEqual(hourly["Close"].iloc[6], 100.0 + 77)
+
+    def test_weekly_bars_come_from_daily(self):
+        ticker = MagicMock()
+        ticker.history.return_value = make_history([100.0 + i for i in range(300)])
+        ticker.info = {}
+
+        with patch("yfinance.Ticker", return_value=ticker):
+            weekly = MarketService.get_bars("AAPL", "3mo", "1wk")
+            chart = MarketService.get_ohlc_with_indicators("AAPL", "1y", interval="1wk", columnar=True)
+
+        ticker.history.assert_called_once_with(period="1y", interval="1d", raise_errors=True)
+        self.assertTrue((weekly.index.dayofweek == 0).all())
+        self.assertEqual(weekly["Volume"].iloc[1], 5000)
+        self.assertEqual(weekly["Open"].iloc[1], weekly["Close"].iloc[0] + 1)
+        self.assertEqual(len(chart["t"]), 53)  # 1y of weeks, sliced from all 60
+
+    def test_long_hourly_periods_are_fetched_natively(self):
+        from .services.market_service import is_truncated, source_interval
+
+        self.assertEqual(source_interval("1h", "1mo"), "5m")
+        self.assertEqual(source_interval("1h", "1y"), "1h")
+        self.assertEqual(source_interval("15m", "1y"), "5m")
+        self.assertTrue(is_truncated("15m", "1y"))
+        self.assertFalse(is_truncated("1h", "1y"))
+        self.assertTrue(is_truncated("1h", "5y"))
+
+        hourly = pd.date_range("2023-06-01 09:30", periods=7 * 250, freq="h", tz="America/New_York")
+        ticker = MagicMock()
+        ticker.history.return_value = pd.DataFrame(
+            {"Open": 1.0, "High": 1.0, "Low": 1.0, "Close": 1.0, "Volume": 10}, index=hourly)
+        ticker.info = {}
+
+        with patch("yfinance.Ticker", return_value=ticker):
+            chart = MarketService.get_ohlc_with_indicators("AAPL", "1y", interval="1h", columnar=True)
+
+        ticker.history.assert_called_once_with(period="1y", interval="1h", raise_errors=True)
+        self.assertFalse(chart["truncated"])
+
+
+class DownsampleTest(SimpleTestCase):
+    """max_points merges runs of bars into OHLC buckets before serialization."""
+
+    def setUp(self):
+        reset_caches()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.settings_override = override_settings(BAR_STORE_DIR=self.tmp.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_buckets_keep_extremes_and_volume(self):
+        from .services.downsample import downsample_bars
+
+        df = make_history([100.0 + (i % 10) * (-1) ** i for i in range(1000)])
+        small = downsample_bars(df, 64)
+
+        self.assertEqual(len(small), 64)
+        self.assertEqual(small.index[0], df.index[0])
+        self.assertEqual(small["High"].max(), df["High"].max())
+        self.assertEqual(small["Low"].min(), df["Low"].min())
+        self.assertEqual(small["Volume"].sum(), df["Volume"].sum())
+        self.assertEqual(small["Close"].iloc[-1], df["Close"].iloc[-1])
+        self.assertIs(downsample_bars(df, 5000), df)
+
+    def test_chart_series_stay_aligned(self):
+        ticker = MagicMock()
+        ticker.history.return_value = make_history([100.0 + (i % 7) for i in range(300)])
+        ticker.info = {}
+
+        with patch("yfinance.Ticker", return_value=ticker):
+            full = MarketService.get_ohlc_with_indicators("AAPL", "1y", columnar=True)
+            small = MarketService.get_ohlc_with_indicators("AAPL", "1y", columnar=True, max_points=50)
+            history = MarketService.get_historical_data("AAPL", "1y", max_points=50)
+
+        self.assertEqual(len(small["t"]), 50)
+        self.assertEqual(len(small["ema_20"]), 50)
+        self.assertEqual(small["ema_20"][-1], full["ema_20"][-1])
+        self.assertEqual(small["c"][-1], full["c"][-1])
+        self.assertEqual(sum(small["v"]), sum(full["v"]))
+        self.assertEqual([row["Close"] for row in history], small["c"])
+
+
+class LiveDataTiersTest(SimpleTestCase):
+    """Quote, fundamentals and news are cached separately and assembled per request."""
+
+    def setUp(self):
+        reset_caches()
+
+    def test_quote_refresh_does_not_refetch_info_or_news(self):
+        ticker = MagicMock()
+        ticker.history.return_value = make_history([100.0, 110.0])
+        ticker.info = {"longName": "Apple Inc.", "trailingPE": 30.0}
+        ticker.news = []
+
+        with patch("yfinance.Ticker", return_value=ticker) as ticker_cls, \
+                patch("trading.services.providers._fetch_rss_news", return_value=[]) as rss:
+            data = MarketService.get_live_data("AAPL")
+            invalidate("price_only_AAPL")  # quote tier expires, the others are still fresh
+            MarketService.get_live_data("aapl")
+
+        self.assertEqual(data["price"], 110.0)
+        self.assertEqual(data["change_pct"], 10.0)
+        self.assertEqual(data["long_name"], "Apple Inc.")
+        self.assertEqual(data["pe_ratio"], 30.0)
+        self.assertEqual(ticker.history.call_count, 2)
+        self.assertEqual(rss.call_count, 1)
+        self.assertEqual(ticker_cls.call_count, 4)  # quote, info, news, quote
+
+    def test_batch_and_single_quotes_share_one_entry(self):
+        raw = pd.concat({"AAPL": make_history([100.0, 110.0])}, axis=1)
+        with patch("yfinance.download", return_value=raw):
+            MarketService.get_price_batch(["AAPL"], refresh=True)  # what the cache warmer runs
+
+        with patch("yfinance.Ticker", side_effect=AssertionError("network call")), \
+                patch("yfinance.download", side_effect=AssertionError("network call")):
+            quote, age = MarketService.get_quote_with_age("AAPL")
+            self.assertEqual(MarketService.get_price_only("aapl"), quote)
+            self.assertEqual(MarketService.get_price_batch(["AAPL"])["AAPL"], quote)
+        self.assertEqual(quote["price"], 110.0)
+        self.assertLess(age, QUOTE_TTL[0])
+
+
+class TwoLevelCacheTest(SimpleTestCase):
+    """Hot keys are served from the in-process L1; invalidate() drops them everywhere."""
+
+    def setUp(self):
+        reset_caches()
+
+    def test_l1_serves_repeat_reads_until_invalidated(self):
+        store_many({"price_only_AAPL": {"price": 1.0}}, 120)
+        before = cache_stats()
+
+        with patch.object(cache, "get_many", wraps=cache.get_many) as l2_get_many:
+            self.assertEqual(peek_many(["price_only_AAPL"]), {"price_only_AAPL": {"price": 1.0}})
+            l2_get_many.assert_not_called()
+
+        self.assertEqual(cache_stats()["l1_hits"], before["l1_hits"] + 1)
+
+        cache.set("price_only_AAPL", {"value": {"price": 2.0}, "fetched_at": time.time()}, 120)
+        invalidate()
+        self.assertEqual(peek_many(["price_only_AAPL"]), {"price_only_AAPL": {"price": 2.0}})
+
+    def test_batch_writes_are_kept_as_last_known_good(self):
+        from .services.cache_service import LAST_GOOD_TTL
+
+        with patch.object(cache, "set_many", wraps=cache.set_many) as set_many:
+            store_many({"price_only_AAPL": {"price": 1.0}}, 120)
+        self.assertEqual(set_many.call_args[0][1], 120 + LAST_GOOD_TTL)
+
+        # Past the hard TTL and upstream down: the batch-written quote is still served
+        entry = cache.get("price_only_AAPL")
+        entry["expires_at"] = time.time() - 1
+        cache.set("price_only_AAPL", entry, LAST_GOOD_TTL)
+        clear_local()
+        value, _ = get_cached("price_only_AAPL", lambda: None, soft_ttl=120)
+        self.assertEqual(value, {"price": 1.0})
+
+
+class ReplayProviderTest(SimpleTestCase):
+    """The offline provider serves deterministic bars with no network access."""
+
+    def test_gbm_bars_are_deterministic(self):
+        from .services.providers import ReplayProvider
+
+        first = ReplayProvider(anchor="2024-06-28").history("AAPL", period="1y")
+        again = ReplayProvider(anchor="2024-06-28").history("AAPL", period="1y")
+        other = ReplayProvider(anchor="2024-06-28").history("MSFT", period="1y")
+
+        pd.testing.assert_frame_equal(first, again)
+        self.assertFalse(first["Close"].equals(other["Close"]))
+        self.assertEqual(first.index[-1].strftime("%Y-%m-%d"), "2024-06-28")
+        self.assertTrue((first["High"] >= first[["Open", "Close"]].max(axis=1)).all())
+
+        intraday = ReplayProvider(anchor="2024-06-28").history("AAPL", period="5d", interval="15m")
+        self.assertEqual(len(intraday), 5 * 26)
+
+    def test_market_service_uses_configured_provider(self):
+        reset_caches()
+        import trading.services.providers as providers
+
+        with override_settings(MARKET_DATA_PROVIDER="trading.services.providers.ReplayProvider",
+                               MARKET_DATA_PROVIDER_OPTIONS={"anchor": "2024-06-28"}), \
+                patch.object(providers, "_provider", None), \
+                patch("yfinance.Ticker", side_effect=AssertionError("network call")):
+            quote = MarketService.get_quote("AAPL")
+            batch = MarketService.get_price_batch(["AAPL", "MSFT"])
+
+        self.assertEqual(batch["AAPL"]["price"], quote["price"])
+        self.assertIn("MSFT", batch)
+
+
+class PanelIndicatorsTest(SimpleTestCase):
+    """The batch engine reproduces the pandas indicator pipeline for every symbol."""
+
+    def test_batch_matches_single_symbol(self):
+        import numpy as np
+        from .services.indicator_service import IndicatorService
+
+        rng = np.random.default_rng(7)
+        frames = {}
+        for symbol, length, start in (("AAPL", 42, "2024-01-02"), ("MSFT", 30, "2024-01-16"), ("RISE", 25, "2024-01-02")):
+            closes = list(100 + np.cumsum(rng.normal(0, 2, length)))
+            if symbol == "RISE":
+                closes[-16:] = [closes[-16] + i for i in range(16)]  # no losses → RSI divides by zero
+            frames[symbol] = make_history(closes, start=start)
+        frames["SHORT"] = make_history([1.0] * 5)
+
+        with patch.object(MarketService, "get_bars", side_effect=lambda s, period, interval="1d": frames[s].copy()):
+            batch = IndicatorService.calculate_indicators_batch(["aapl", "MSFT", "RISE", "SHORT"])
+            single = IndicatorService.calculate_indicators("MSFT")
+
+        self.assertEqual(set(batch), {"AAPL", "MSFT", "RISE"})
+        for symbol in ("AAPL", "MSFT", "RISE"):
+            self.assertEqual(batch[symbol], pandas_indicators(frames[symbol], symbol))
+        self.assertEqual(single, batch["MSFT"])
+        self.assertEqual(batch["RISE"]["RSI"], 100.0)
+
+
+class StreamingIndicatorsTest(SimpleTestCase):
+    """Incremental indicator state gives the same answers as the pandas pipeline."""
+
+    def setUp(self):
+        reset_caches()
+
+    def frame(self, length=45):
+        import numpy as np
+
+        rng = np.random.default_rng(11)
+        df = make_history(list(100 + np.cumsum(rng.normal(0, 2, length))))
+        df["High"] = df["Close"] + rng.uniform(0, 3, length)
+        df["Low"] = df["Close"] - rng.uniform(0, 3, length)
+        return df
+
+    def test_state_matches_pandas_bar_by_bar(self):
+        from .services.streaming_indicators import IndicatorState
+
+        df = self.frame()
+        state = IndicatorState()
+        for i, (t, row) in enumerate(zip(df.index.asi8, df.itertuples())):
+            state.update(int(t), row.High - 5, row.Low, row.Close - 5)  # a tick, revised below
+            state = IndicatorState.from_dict(json.loads(json.dumps(state.to_dict())))
+            state.update(int(t), row.High, row.Low, row.Close)
+            if i + 1 < 20:
+                continue
+            expected = pandas_indicators(df.iloc[:i + 1], "AAPL")
+            values = state.values()
+            for name in ("RSI", "MACD", "Signal_Line", "SMA_14", "SMA_50", "EMA_20", "BB_Upper", "ATR"):
+                self.assertEqual(None if values[name] is None else round(values[name], 2), expected[name])
+
+    def store(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(BAR_STORE_DIR=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        return BarStore()
+
+    def test_service_reads_only_new_bars(self):
+        from .services.indicator_service import IndicatorService
+
+        store, df = self.store(), self.frame(40)  # inside the 60d seed window
+        forming = df.iloc[:-1].copy()
+        forming.iloc[-1, forming.columns.get_loc("Close")] += 3  # partial bar, later revised
+        store.write("AAPL", "1d", forming, period="1y")
+        IndicatorService.calculate_streaming_indicators("AAPL")
+
+        store.append("AAPL", "1d", df.iloc[-2:])
+        with patch.object(BarStore, "read", autospec=True, side_effect=BarStore.read) as read:
+            streamed = IndicatorService.calculate_streaming_indicators("AAPL")
+        self.assertEqual(read.call_count, 1)
+        self.assertEqual(read.call_args.kwargs["since"], df.index.asi8[-2])
+        expected = IndicatorService.calculate_indicators("AAPL")
+
+        self.assertEqual(streamed.pop("interval"), "1d")
+        self.assertEqual(streamed.pop("as_of"), df.index[-1].isoformat())
+        self.assertEqual(streamed, expected)
+
+    def test_reseeds_only_when_history_is_rewritten(self):
+        from .services.indicator_service import IndicatorService
+        from .services.streaming_indicators import load_state
+
+        store, df = self.store(), self.frame(60)
+        store.write("AAPL", "1d", df.iloc[:45], period="1y")
+        IndicatorService.calculate_streaming_indicators("AAPL")
+        seeded = load_state("AAPL", "1d").bars
+        store.append("AAPL", "1d", df.iloc[45:])
+        IndicatorService.calculate_streaming_indicators("AAPL")
+        self.assertEqual(load_state("AAPL", "1d").bars, seeded + 15)  # the window slid, the state carried on
+
+        adjusted = df.copy()
+        adjusted[["Open", "High", "Low", "Close"]] /= 2  # a 2:1 split, rewritten by the sync
+        store.write("AAPL", "1d", adjusted, period="1y")
+        streamed = IndicatorService.calculate_streaming_indicators("AAPL")
+        expected = IndicatorService.calculate_indicators("AAPL")
+
+        streamed.pop("interval"), streamed.pop("as_of")
+        self.assertEqual(streamed, expected)
+
+
+@override_settings(SCREENER_UNIVERSE=["AAPL", "MSFT", "TSLA", "DOWN"])
+class ScreenerAPITest(TestCase):
+    """GET /trading/screener/ filters and sorts the precomputed indicator table."""
+
+    def setUp(self):
+        import numpy as np
+
+        reset_caches()
+        self.user = User.objects.create_user(username="screener", email="s@example.com", password="StrongPass123!")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        rng = np.random.default_rng(3)
+        self.frames = {s: make_history(list(100 + np.cumsum(rng.normal(0, 2, 45)))) for s in ("AAPL", "MSFT", "TSLA")}
+        self.frames["DOWN"] = make_history([200.0 - i for i in range(45)])
+
+    def get(self, query):
+        with patch.object(MarketService, "get_bars", side_effect=AssertionError("built in a request")):
+            return self.client.get(f"/trading/screener/?{query}")
+
+    def test_requests_never_build_the_table(self):
+        self.assertEqual(self.get("ordering=-rsi").status_code, 503)
+
+    def test_filters_and_ordering(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .services.indicator_service import IndicatorService
+
+        with patch.object(MarketService, "get_bars", side_effect=lambda s, period, interval="1d": self.frames[s].copy()):
+            expected = IndicatorService.calculate_indicators_batch(list(self.frames))
+            call_command("refresh_screener", stdout=StringIO())
+
+        response = self.get("ordering=-rsi&page_size=2")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 4)
+        by_rsi = sorted(expected.values(), key=lambda row: -row["RSI"])
+        self.assertEqual([row["symbol"] for row in response.data["results"]], [r["symbol"] for r in by_rsi[:2]])
+        self.assertEqual(response.data["results"][0]["MACD"], by_rsi[0]["MACD"])
+
+        response = self.get("rsi_lt=30&price_vs_ema20=BELOW")
+        self.assertEqual([row["symbol"] for row in response.data["results"]], ["DOWN"])
+        rising = response.data["results"][0]["macd_hist_rising"]
+        self.assertEqual(self.get(f"macd_hist_rising={rising}&rsi_lt=30").data["count"], 1)
+        self.assertEqual(self.get(f"macd_hist_rising={not rising}&rsi_lt=30").data["count"], 0)
+        self.assertEqual(self.get("signal=NEUTRAL").data["count"], sum(r["signal"] == "NEUTRAL" for r in expected.values()))
+        self.assertEqual(self.get("rsi_lt=abc").status_code, 400)
+
+
+class IndicatorGraphTest(SimpleTestCase):
+    """Parameterized studies share intermediates and are cached per study."""
+
+    def setUp(self):
+        reset_caches()
+
+    def test_parse_set(self):
+        from .services.indicator_graph import parse_set, set_key
+
+        studies = parse_set("EMA:50, rsi:7,bb:20:2.5,macd,ema:50")
+        self.assertEqual(studies, [("ema", (50,)), ("rsi", (7,)), ("bb", (20, 2.5)), ("macd", (12, 26, 9))])
+        self.assertEqual(set_key(studies), "ema:50,rsi:7,bb:20:2.5,macd:12:26:9")
+        for bad in ("vwap:10", "ema:abc", "rsi:0", "bb:20:2:1", "sma:100000"):
+            with self.assertRaises(ValueError):
+                parse_set(bad)
+
+    def test_shared_nodes_computed_once(self):
+        from .services.indicator_graph import IndicatorGraph, parse_set
+
+        df = make_history([100.0 + (i % 9) for i in range(60)])
+        graph = IndicatorGraph.from_frame(df)
+        outputs = graph.evaluate(parse_set("rsi:7,rsi:14,sma:20,bb:20:2.5,ema:12,macd"))
+
+        close = ("input", "close")
+        for key in (("diff", "close"), ("gain",), ("sma", close, 20), ("ema", close, 12)):
+            self.assertEqual(graph.computed.count(key), 1)
+        expected_ema = df["Close"].ewm(span=12, adjust=False).mean().to_numpy()
+        self.assertTrue((abs(outputs["ema_12"] - expected_ema) < 1e-9).all())
+        self.assertTrue((outputs["bb_middle_20_2.5"][19:] == outputs["sma_20"][19:]).all())
+
+    def test_chart_studies_cached_per_parameter_key(self):
+        from .services.indicator_graph import IndicatorGraph, parse_set
+        from .services.indicator_service import IndicatorService
+
+        df = make_history([100.0 + (i % 9) for i in range(80)])
+        with patch.object(MarketService, "get_bars", return_value=df), \
+                patch.object(MarketService, "get_fundamentals", return_value={}):
+            MarketService.get_ohlc_with_indicators("AAPL", columnar=True, studies=parse_set("ema:50"))
+            with patch.object(IndicatorGraph, "study", autospec=True, side_effect=IndicatorGraph.study) as study:
+                chart = MarketService.get_ohlc_with_indicators(
+                    "AAPL", columnar=True, studies=parse_set("ema:50,rsi:7,bb:20:2.5"))
+            latest = IndicatorService.calculate_custom_indicators("AAPL", parse_set("rsi:7"), period="3mo")
+
+        self.assertEqual([call.args[1] for call in study.call_args_list], [("rsi", (7,)), ("bb", (20, 2.5))])
+        self.assertEqual(len(chart["ema_50"]), len(chart["t"]))
+        self.assertIn("bb_lower_20_2.5", chart)
+        self.assertNotIn("ema_20", chart)
+        self.assertEqual(latest, {"symbol": "AAPL", "rsi_7": chart["rsi_7"][-1]})
+
+
+class TrendModelTest(SimpleTestCase):
+    """train_trend_model publishes a versioned artifact; workers load it once and score batches."""
+
+    def setUp(self):
+        import trading.services.ml_service as ml_service
+        import trading.services.providers as providers
+
+        reset_caches()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(
+            BAR_STORE_DIR=f"{tmp.name}/bars", ML_MODEL_DIR=f"{tmp.name}/models",
+            MARKET_DATA_PROVIDER="trading.services.providers.ReplayProvider",
+            MARKET_DATA_PROVIDER_OPTIONS={"anchor": "2024-06-28"},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for patcher in (patch.object(providers, "_provider", None), patch.object(ml_service, "_registry", None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.model_dir = f"{tmp.name}/models"
+
+    def test_rule_based_until_trained(self):
+        from .services.ml_service import MLService
+
+        prediction = MLService.predict_trend("AAPL")
+        self.assertEqual(prediction["model_type"], "Rule-based (no trained model)")
+        self.assertIsNone(prediction["confidence_score"])
+
+    def test_holdout_is_embargoed_by_the_label_horizon(self):
+        import numpy as np
+        from .services.ml_service import HORIZON, holdout_split
+
+        sessions = pd.bdate_range("2024-01-01", periods=100).asi8
+        dates = np.concatenate([sessions, sessions])  # two symbols, pooled
+        train, test = holdout_split(dates, 0.2)
+
+        self.assertEqual(len(np.unique(dates[test])), 20)
+        last_train, first_test = np.unique(dates[train])[-1], np.unique(dates[test])[0]
+        self.assertEqual(np.searchsorted(sessions, first_test) - np.searchsorted(sessions, last_train), HORIZON + 1)
+
+    def test_train_then_batch_predict(self):
+        import joblib
+        from io import StringIO
+        from django.core.management import call_command
+        from .services.ml_service import MLService
+
+        out = StringIO()
+        call_command("train_trend_model", "AAPL", "MSFT", "NVDA", "--sync", "--period=5y", "--max-iter=20", stdout=out)
+        with open(f"{self.model_dir}/latest.json") as fh:
+            manifest = json.load(fh)
+        self.assertEqual(manifest["symbols"], ["AAPL", "MSFT", "NVDA"])
+        self.assertIsNotNone(manifest["holdout_accuracy"])
+
+        with patch("joblib.load", wraps=joblib.load) as load:
+            batch = MLService.predict_batch(["AAPL", "msft", "TSLA"])
+            single = MLService.predict_trend("NVDA")
+            again = MLService.predict_batch(["AAPL"])
+        load.assert_called_once()
+
+        self.assertEqual(set(batch), {"AAPL", "MSFT", "TSLA"})
+        self.assertEqual(batch["AAPL"]["model_version"], manifest["version"])
+        self.assertEqual(batch["AAPL"]["model_type"], "HistGradientBoostingClassifier")
+        self.assertGreaterEqual(batch["AAPL"]["confidence_score"], 50)
+        self.assertEqual(single["symbol"], "NVDA")
+        self.assertEqual(again["AAPL"], batch["AAPL"])
+
+
+class BacktestTest(TestCase):
+    """Signals → positions → equity curve, per symbol, in or out of the process pool."""
+
+    def test_positions_and_metrics(self):
+        import numpy as np
+        from .services.backtest_service import signal_positions, simulate
+
+        positions = signal_positions(np.array(["NEUTRAL", "BULLISH", "NEUTRAL", "OVERBOUGHT", "OVERSOLD"]))
+        self.assertEqual(positions.tolist(), [0.0, 1.0, 1.0, 0.0, 1.0])
+        self.assertEqual(signal_positions(np.array(["BEARISH", "NEUTRAL"]), "long_short").tolist(), [-1.0, -1.0])
+
+        # Long for bars 1–2 (+10%, then -10%), flat for the final +10% bar
+        metrics = simulate(np.array([100.0, 110.0, 99.0, 99.0, 108.9]), np.array([1.0, 1.0, 0.0, 0.0, 0.0]))
+        self.assertAlmostEqual(metrics["total_return"], -0.01)
+        self.assertAlmostEqual(metrics["max_drawdown"], -0.1)
+        self.assertEqual((metrics["trades"], metrics["hit_rate"]), (1, 0.0))
+        self.assertAlmostEqual(metrics["exposure"], 0.4)
+
+    def test_endpoint_matches_process_pool(self):
+        import trading.services.providers as providers
+        from .services.backtest_service import BacktestService
+
+        reset_caches()
+        user = User.objects.create_user(username="quant", email="q@example.com", password="StrongPass123!")
+        client = APIClient()
+        client.force_authenticate(user)
+        with tempfile.TemporaryDirectory() as tmp, \
+                override_settings(BAR_STORE_DIR=tmp,
+                                  MARKET_DATA_PROVIDER="trading.services.providers.ReplayProvider",
+                                  MARKET_DATA_PROVIDER_OPTIONS={"anchor": "2024-06-28"}), \
+                patch.object(providers, "_provider", None):
+            with patch.object(BacktestService, "run", wraps=BacktestService.run) as run:
+                response = client.get("/trading/backtest/?symbols=AAPL,MSFT&period=2y&curve=true")
+            self.assertEqual(run.call_args.kwargs["max_workers"], 1)  # no process pool per request
+            pooled = BacktestService.run(["AAPL", "MSFT"], period="2y", curve=True, max_workers=2)
+            bad = client.get("/trading/backtest/?symbols=AAPL&strategy=magic")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"], pooled["results"])
+        aapl = response.data["results"]["AAPL"]
+        self.assertEqual(len(aapl["curve"]["equity"]), aapl["bars"])
+        self.assertAlmostEqual(aapl["curve"]["equity"][-1] - 1, aapl["total_return"], places=3)
+        self.assertEqual(bad.status_code, 400)
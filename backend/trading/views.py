@@ -3,19 +3,91 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Watchlist, Order
 from .serializers import WatchlistSerializer, OrderSerializer
-from .services.market_service import MarketService
-from .services.indicator_service import IndicatorService
+from .services.market_service import MarketService, CHART_INTERVALS, SPARKLINE_TTL
+from .services.indicator_service import IndicatorService, STREAM_INTERVALS
 from .services.ml_service import MLService
 from .services.analytics_service import AnalyticsService
+from .services.backtest_service import BacktestService
+from .services.screener_service import ScreenerService
+from .services import cache_service, upstream
 from portfolio.models import Portfolio, Transaction
+from portfolio.views import StandardResultsSetPagination
 from users.models import Wallet, WalletTransaction
+from django.conf import settings
 from django.db import transaction
 from decimal import Decimal
 import uuid
 
+MAX_BATCH_SYMBOLS = 100
+
+
+def _parse_symbols(request):
+    """Split a `?symbols=AAPL,MSFT` query param into a de-duplicated upper-case list."""
+    raw = request.query_params.get('symbols', '')
+    return list(dict.fromkeys(s.strip().upper() for s in raw.split(',') if s.strip()))
+
+
+def _parse_period(request, default):
+    """`?period=` (yfinance period string, `default` if absent); raises ValueError for unknown ones."""
+    from .services.bar_store import PERIOD_DAYS
+
+    period = request.query_params.get('period', default)
+    if period not in PERIOD_DAYS:
+        raise ValueError(f"period must be one of {', '.join(PERIOD_DAYS)}")
+    return period
+
+
+def _parse_max_points(request):
+    """`?max_points=` as an int (None if absent); raises ValueError when out of range."""
+    from .services.downsample import MAX_POINTS, MIN_POINTS
+
+    raw = request.query_params.get('max_points')
+    if raw in (None, ''):
+        return None
+    try:
+        max_points = int(raw)
+    except ValueError:
+        max_points = 0
+    if not MIN_POINTS <= max_points <= MAX_POINTS:
+        raise ValueError(f"max_points must be an integer between {MIN_POINTS} and {MAX_POINTS}")
+    return max_points
+
+
 class TradingViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
+    # NOTE: batch actions are named `batch_*` so DRF registers their routes
+    # before `live/<symbol>` etc. (extra actions are ordered by method name).
+    @action(detail=False, methods=['get'], url_path='live/batch')
+    def batch_quotes(self, request):
+        """Price-only quotes for a whole watchlist in one call: ?symbols=AAPL,MSFT,..."""
+        symbols = _parse_symbols(request)
+        if not symbols:
+            return Response({"error": "symbols query parameter required"}, status=400)
+        if len(symbols) > MAX_BATCH_SYMBOLS:
+            return Response({"error": f"At most {MAX_BATCH_SYMBOLS} symbols per request"}, status=400)
+        return Response(MarketService.get_price_batch(symbols))
+
+    @action(detail=False, methods=['get'], url_path='indicators/batch')
+    def batch_indicators(self, request):
+        """Latest indicators for many symbols in one pass: ?symbols=AAPL,MSFT,..."""
+        symbols = _parse_symbols(request)
+        if not symbols:
+            return Response({"error": "symbols query parameter required"}, status=400)
+        if len(symbols) > MAX_BATCH_SYMBOLS:
+            return Response({"error": f"At most {MAX_BATCH_SYMBOLS} symbols per request"}, status=400)
+        return Response(IndicatorService.calculate_indicators_batch(symbols))
+
+    @action(detail=False, methods=['get'], url_path='predict/batch')
+    def batch_predict(self, request):
+        """Trend predictions for a whole watchlist in one model call: ?symbols=AAPL,MSFT,..."""
+        symbols = _parse_symbols(request)
+        if not symbols:
+            return Response({"error": "symbols query parameter required"}, status=400)
+        if len(symbols) > MAX_BATCH_SYMBOLS:
+            return Response({"error": f"At most {MAX_BATCH_SYMBOLS} symbols per request"}, status=400)
+        return Response(MLService.predict_batch(symbols))
+
     @action(detail=False, methods=['get'], url_path='live/(?P<symbol>[^/.]+)')
     def live_price(self, request, symbol=None):
         # fast=true skips news fetching (used by watchlist sidebar for speed)
@@ -33,53 +105,48 @@ class TradingViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], url_path='news/(?P<symbol>[^/.]+)')
     def news(self, request, symbol=None):
         """Real-time news endpoint — yfinance + RSS, cached 3 min."""
-        from django.core.cache import cache
-        from .services.market_service import _parse_yf_news, _fetch_rss_news
-        import yfinance as yf
-
         symbol = (symbol or '').upper()
         if not symbol:
             return Response({"error": "Symbol required"}, status=400)
-
-        cache_key = f"news_{symbol}"
-        cached = cache.get(cache_key)
-        if cached:
-            return Response({"symbol": symbol, "news": cached})
-
-        try:
-            ticker = yf.Ticker(symbol)
-            yf_news = _parse_yf_news(ticker.news[:10] if ticker.news else [])
-            rss_news = _fetch_rss_news(symbol, max_items=10)
-
-            seen, merged = set(), []
-            for article in (yf_news + rss_news):
-                key = article.get('title', '')[:60].lower().strip()
-                if key and key not in seen:
-                    seen.add(key)
-                    merged.append(article)
-                if len(merged) >= 15:
-                    break
-            merged.sort(key=lambda x: x.get('providerPublishTime') or 0, reverse=True)
-
-            cache.set(cache_key, merged, 180)  # 3 min cache
-            return Response({"symbol": symbol, "news": merged})
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
-
+        return Response({"symbol": symbol, "news": MarketService.get_news(symbol)})
 
     @action(detail=False, methods=['get'], url_path='history/(?P<symbol>[^/.]+)')
     def history(self, request, symbol=None):
-        period = request.query_params.get('period', '1mo')
-        data = MarketService.get_historical_data(symbol, period=period)
+        """OHLCV records; ?max_points=500 merges bars into at most that many OHLC buckets."""
+        try:
+            period = _parse_period(request, '1mo')
+            max_points = _parse_max_points(request)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+        data = MarketService.get_historical_data(symbol, period=period, max_points=max_points)
         if not data:
             return Response({"error": "Invalid symbol or data not available"}, status=400)
         return Response(data)
 
     @action(detail=False, methods=['get'], url_path='chart/(?P<symbol>[^/.]+)')
     def chart_data(self, request, symbol=None):
-        """Full chart data: OHLC + EMA(20) + RSI(14) + Volume + Fundamentals."""
-        period = request.query_params.get('period', '3mo')
-        data = MarketService.get_ohlc_with_indicators(symbol, period=period)
+        """
+        Full chart data: OHLC + EMA(20) + RSI(14) + Volume + Fundamentals.
+        ?shape=columnar returns parallel t/o/h/l/c/v arrays instead of per-point objects.
+        ?set=ema:50,rsi:7,bb:20:2.5 replaces the default EMA(20)/RSI(14) studies.
+        ?interval=15m (default 1d) – intraday and weekly/monthly bars are resampled
+        from stored 5m/1d series, so switching timeframes doesn't refetch upstream.
+        ?max_points=500 merges bars into at most that many OHLC buckets.
+        """
+        from .services.indicator_graph import parse_set  # lazy – keeps NumPy out of startup
+
+        interval = request.query_params.get('interval', '1d')
+        if interval not in CHART_INTERVALS:
+            return Response({"error": f"interval must be one of {', '.join(CHART_INTERVALS)}"}, status=400)
+        columnar = request.query_params.get('shape', '').lower() == 'columnar'
+        try:
+            period = _parse_period(request, '3mo')
+            studies = parse_set(request.query_params.get('set', ''))
+            max_points = _parse_max_points(request)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+        data = MarketService.get_ohlc_with_indicators(symbol, period=period, interval=interval, columnar=columnar,
+                                                      studies=studies, max_points=max_points)
         if not data:
             return Response({"error": "Invalid symbol or chart data not available"}, status=400)
         return Response(data)
@@ -87,15 +154,42 @@ class TradingViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], url_path='sparkline/(?P<symbol>[^/.]+)')
     def sparkline(self, request, symbol=None):
         """Simple close-price time series for sparkline charts."""
-        period = request.query_params.get('period', '1mo')
-        prices = MarketService.get_sparkline(symbol, period=period)
+        try:
+            period = _parse_period(request, '1mo')
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+        prices, age = MarketService.get_sparkline_with_age(symbol, period=period)
         if not prices:
             return Response({"error": "No data"}, status=400)
-        return Response({"symbol": symbol.upper(), "prices": prices})
+        return Response({
+            "symbol": symbol.upper(), "prices": prices, "data_age": round(age, 1),
+            "stale": age >= SPARKLINE_TTL[1],  # past the hard TTL: last-known-good data
+        })
 
     @action(detail=False, methods=['get'], url_path='indicators/(?P<symbol>[^/.]+)')
     def indicators(self, request, symbol=None):
-        data = IndicatorService.calculate_indicators(symbol)
+        """Standard indicator snapshot, or the latest value of each ?set=ema:50,rsi:7,... study."""
+        if request.query_params.get('set'):
+            from .services.indicator_graph import parse_set  # lazy – keeps NumPy out of startup
+
+            try:
+                studies = parse_set(request.query_params['set'])
+            except ValueError as exc:
+                return Response({"error": str(exc)}, status=400)
+            data = IndicatorService.calculate_custom_indicators(symbol, studies)
+        else:
+            data = IndicatorService.calculate_indicators(symbol)
+        if not data:
+            return Response({"error": "Could not calculate indicators"}, status=400)
+        return Response(data)
+
+    @action(detail=False, methods=['get'], url_path='indicators/stream/(?P<symbol>[^/.]+)')
+    def stream_indicators(self, request, symbol=None):
+        """Incrementally updated indicators for intraday use: ?interval=5m (default 1d)."""
+        interval = request.query_params.get('interval', '1d')
+        if interval not in STREAM_INTERVALS:
+            return Response({"error": f"interval must be one of {', '.join(STREAM_INTERVALS)}"}, status=400)
+        data = IndicatorService.calculate_streaming_indicators(symbol, interval)
         if not data:
             return Response({"error": "Could not calculate indicators"}, status=400)
         return Response(data)
@@ -112,6 +206,56 @@ class TradingViewSet(viewsets.ViewSet):
         data = AnalyticsService.get_performance_analytics(request.user)
         return Response(data)
 
+    @action(detail=False, methods=['get'])
+    def screener(self, request):
+        """
+        Filter the precomputed indicator table, e.g.
+        ?rsi_lt=30&price_vs_ema20=ABOVE&macd_hist_rising=true&ordering=-rsi
+        """
+        table = ScreenerService.get_table()
+        if table is None:
+            return Response({"error": "Screener table not built yet"}, status=503)
+        try:
+            indices = ScreenerService.screen(table, request.query_params)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+
+        paginator = StandardResultsSetPagination()
+        page = paginator.paginate_queryset(indices, request, view=self)
+        return paginator.get_paginated_response(ScreenerService.rows(table, page))
+
+    @action(detail=False, methods=['get'])
+    def backtest(self, request):
+        """
+        Replay the signal rules over stored daily history:
+        ?symbols=AAPL,MSFT&strategy=signals|model&period=5y&mode=long|long_short&cost_bps=5&curve=true
+        """
+        symbols = _parse_symbols(request)
+        if not symbols:
+            return Response({"error": "symbols query parameter required"}, status=400)
+        if len(symbols) > MAX_BATCH_SYMBOLS:
+            return Response({"error": f"At most {MAX_BATCH_SYMBOLS} symbols per request"}, status=400)
+        params = request.query_params
+        try:
+            period = _parse_period(request, '5y')
+            cost_bps = float(params.get('cost_bps', 5))
+            # Make sure the history is in the local store before the backtest reads it
+            MarketService.get_bars_many(symbols, period=period)
+            # In-process: a process pool per web request is for the backtest_signals command
+            data = BacktestService.run(
+                symbols, strategy=params.get('strategy', 'signals'), period=period,
+                mode=params.get('mode', 'long'), cost_bps=cost_bps,
+                curve=params.get('curve', '').lower() in ('1', 'true', 'yes'), max_workers=1,
+            )
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+        return Response(data)
+
+    @action(detail=False, methods=['get'], url_path='cache/stats', permission_classes=[permissions.IsAdminUser])
+    def cache_stats(self, request):
+        """L1 (in-process LRU) / L2 (Django cache) hit-miss counters for the worker that answers."""
+        return Response({**cache_service.cache_stats(), "upstream": upstream.status([upstream.YAHOO])})
+
     @action(detail=False, methods=['post'])
     def order(self, request):
         symbol = request.data.get('symbol', '').upper()
@@ -121,10 +265,15 @@ class TradingViewSet(viewsets.ViewSet):
         if not symbol or order_type not in ['BUY', 'SELL'] or quantity <= 0:
             return Response({"error": "Invalid order details"}, status=400)
 
-        live_data = MarketService.get_live_data(symbol)
+        # Quote tier only – an order never needs fundamentals or news. During an upstream
+        # outage a last-known-good quote is accepted up to ORDER_MAX_QUOTE_AGE seconds old.
+        live_data, quote_age = MarketService.get_quote_with_age(symbol)
         if not live_data:
             return Response({"error": "Could not fetch live price"}, status=400)
-            
+        if live_data.get('stale') and quote_age > settings.ORDER_MAX_QUOTE_AGE:
+            return Response({"error": f"Last price is {int(quote_age)}s old; trading in {symbol} resumes "
+                                      f"when live quotes are back"}, status=503)
+
         price = live_data['price']
         total_value = Decimal(str(price)) * Decimal(str(quantity))
 
@@ -206,7 +355,8 @@ class TradingViewSet(viewsets.ViewSet):
         return Response({
             "status": "Order Executed Successfully",
             "order_id": order.id,
-            "executed_price": price
+            "executed_price": price,
+            "stale_price": live_data.get('stale', False),
         })
 
 class WatchlistViewSet(viewsets.ModelViewSet):
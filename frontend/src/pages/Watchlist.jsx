@@ -157,16 +157,15 @@ export default function Watchlist() {
             if (list.length > 0 && !selectedSymbolRef.current) {
                 setSelectedSymbol(list[0].symbol);
             }
-            const liveResults = {};
-            await Promise.allSettled(
-                list.map(async (item) => {
-                    try {
-                        // fast=true: skips news/info for speed – just price data
-                        const res = await api.get(`/trading/live/${item.symbol}/?fast=true`);
-                        if (res.data?.price !== undefined) liveResults[item.symbol] = res.data;
-                    } catch { }
-                })
-            );
+            let liveResults = {};
+            if (list.length > 0) {
+                try {
+                    // One batched price-only request for the whole watchlist
+                    const symbols = list.map(item => item.symbol).join(',');
+                    const res = await api.get(`/trading/live/batch/?symbols=${encodeURIComponent(symbols)}`);
+                    liveResults = res.data || {};
+                } catch { }
+            }
             setLiveMap(liveResults);
         } catch { }
         setLoading(false);